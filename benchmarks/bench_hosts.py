@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Host table memory benchmark for host_table.py
+
+Fills the scanner's host records as a fully populated /16 sweep would
+(every address alive, some with open ports, some identified devices),
+once as the old list of address strings plus dicts and once as
+HostTable plus DeviceRecord, and compares the memory they hold and what
+pickling them for a shard result costs:
+
+    python benchmarks/bench_hosts.py [--prefix 16] [--with-ports 0.1] [--devices 2000]
+"""
+
+import ipaddress
+import pickle
+import time
+
+from harness import arguments, measure, run, verdict
+
+from host_table import DeviceRecord, HostTable
+
+PORTS = [80, 443, 554, 1935, 8080, 8554, 5004, 5005, 1234]
+
+
+def device(ip):
+    return {'ip': ip, 'type': 'IP Camera', 'manufacturer': 'HikVision', 'model': 'DS-2CD2143',
+            'confidence': 90, 'mac': 'c0:56:e3:00:00:01', 'services': []}
+
+
+def legacy(hosts, ported, identified):
+    active_hosts = []
+    open_ports = {}
+    devices = {}
+    for ip in hosts:
+        active_hosts.append(str(ip))
+    for ip in ported:
+        open_ports[ip] = [80, 554]
+    for ip in identified:
+        devices[ip] = device(ip)
+    return active_hosts, open_ports, devices
+
+
+def compact(hosts, ported, identified):
+    table = HostTable(PORTS)
+    devices = {}
+    for ip in hosts:
+        table.add(str(ip))
+    for ip in ported:
+        table.set_ports(ip, [80, 554])
+    for ip in identified:
+        devices[ip] = DeviceRecord.from_dict(device(ip))
+    return table, devices
+
+
+def build_and_pickle(build, *args):
+    """(records, bytes they hold, pickled size, seconds to pickle)"""
+    result, _, held, _ = measure(build, *args)
+    started = time.perf_counter()
+    data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+    elapsed = time.perf_counter() - started
+    return result, held, len(data), elapsed
+
+
+def main():
+    parser = arguments(__doc__)
+    parser.add_argument('--prefix', type=int, default=16)
+    parser.add_argument('--with-ports', type=float, default=0.1, help='share of hosts with open ports')
+    parser.add_argument('--devices', type=int, default=2000)
+    args = parser.parse_args()
+
+    network = ipaddress.IPv4Network(f'10.20.0.0/{args.prefix}')
+    hosts = list(network.hosts())  # each builder makes its own address strings, as the sweep does
+    ported = [str(ip) for ip in hosts[::max(1, round(1 / args.with_ports))]] if args.with_ports else []
+    identified = ported[:args.devices]
+
+    (old_hosts, _, _), old_bytes, old_pickle, old_time = build_and_pickle(legacy, hosts, ported, identified)
+    (table, _), new_bytes, new_pickle, new_time = build_and_pickle(compact, hosts, ported, identified)
+
+    print(f"{len(hosts)} hosts, {len(ported)} with open ports, {len(identified)} identified")
+    print(f"list + dicts:            {old_bytes / 2**20:7.2f} MiB held, "
+          f"pickle {old_pickle / 2**20:6.2f} MiB in {old_time * 1000:.1f} ms")
+    print(f"HostTable + DeviceRecord:{new_bytes / 2**20:7.2f} MiB held, "
+          f"pickle {new_pickle / 2**20:6.2f} MiB in {new_time * 1000:.1f} ms")
+    ok = (list(table) == old_hosts and len(table) == len(hosts)
+          and all(table.get_ports(ip) == [80, 554] for ip in ported[:100]))
+    return verdict(ok, "Host tables agree", "Host tables differ")
+
+
+if __name__ == '__main__':
+    run(main)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for network_scanner.py
+
+Imports the scanner in fresh interpreters and fails if the median import
+time exceeds the budget:
+
+    python benchmarks/bench_import.py [--runs 5] [--budget 0.5]
+"""
+
+import statistics
+import subprocess
+import sys
+import time
+
+from harness import ROOT, arguments, run, verdict
+
+# Modules that must not be pulled in just by importing the scanner
+HEAVY_MODULES = ['scapy', 'requests', 'urllib3', 'netifaces', 'numpy']
+
+PROBE = (
+    "import sys, time\n"
+    "t = time.perf_counter()\n"
+    "import network_scanner\n"
+    "elapsed = time.perf_counter() - t\n"
+    "heavy = sorted({m.split('.')[0] for m in sys.modules} & set(%r))\n"
+    "print(elapsed, len(sys.modules), ','.join(heavy))\n"
+) % (HEAVY_MODULES,)
+
+
+def measure_once():
+    """Import the scanner in a fresh interpreter, return (import, wall, modules, heavy)"""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - start
+    fields = result.stdout.split()
+    heavy = fields[2].split(',') if len(fields) > 2 else []
+    return float(fields[0]), wall, int(fields[1]), heavy
+
+
+def main():
+    parser = arguments(__doc__)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=0.5,
+                        help='Maximum median wall time of a cold start, in seconds')
+    args = parser.parse_args()
+
+    samples = [measure_once() for _ in range(args.runs)]
+    import_median = statistics.median(s[0] for s in samples)
+    wall_median = statistics.median(s[1] for s in samples)
+    modules = samples[-1][2]
+    heavy = samples[-1][3]
+
+    print(f"import network_scanner: {import_median * 1000:.1f} ms (median of {args.runs})")
+    print(f"interpreter cold start: {wall_median * 1000:.1f} ms")
+    print(f"modules loaded:         {modules}")
+
+    ok = True
+    if heavy:
+        print(f"❌ Heavy modules imported eagerly: {', '.join(heavy)}")
+        ok = False
+    if wall_median > args.budget:
+        print(f"❌ Cold start exceeds budget of {args.budget:.2f} s")
+        ok = False
+    return verdict(ok, "Within budget", "Over budget")
+
+
+if __name__ == '__main__':
+    run(main)
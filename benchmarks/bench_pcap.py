@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Offline analysis benchmark for pcap_offline.py
+
+Writes a deterministic synthetic capture (RTP flows at a fixed packet
+rate plus one RTSP exchange), runs NetworkStreamScanner.analyze_capture_file
+on it and checks what the detector found, loss and jitter included:
+
+    python benchmarks/bench_pcap.py [--flows 50] [--seconds 20] [--pps 50] [--format pcapng] [--drop-every 0]
+"""
+
+import os
+import tempfile
+
+from harness import arguments, frame, rtp, run, verdict, write_pcap, write_pcapng
+
+import network_scanner
+
+
+def dropped(tick, ticks, drop_every):
+    """Whether the RTP packet of `tick` is left out; never the first two or the last"""
+    return drop_every > 0 and 2 <= tick < ticks - 1 and tick % drop_every == 0
+
+
+def packets(flows, seconds, pps, drop_every=0):
+    """(timestamp, frame) in time order"""
+    yield 0.0, frame('192.168.1.10', '192.168.1.64', 6, 50000, 554, b'OPTIONS rtsp://cam/ RTSP/1.0\r\nCSeq: 1\r\n\r\n')
+    yield 0.001, frame('192.168.1.64', '192.168.1.10', 6, 554, 50000, b'RTSP/1.0 200 OK\r\nCSeq: 1\r\n\r\n')
+    for tick in range(seconds * pps):
+        if dropped(tick, seconds * pps, drop_every):
+            continue
+        for flow in range(flows):
+            timestamp = 0.01 + tick / pps + flow * 1e-5
+            yield timestamp, frame(f'192.168.2.{flow % 250 + 1}', '192.168.1.10', 17,
+                                   6970 + 2 * flow, 5004, rtp(tick, tick * 160, 0x1000 + flow))
+
+
+def main():
+    parser = arguments(__doc__)
+    parser.add_argument('--flows', type=int, default=50)
+    parser.add_argument('--seconds', type=int, default=20)
+    parser.add_argument('--pps', type=int, default=50, help='packets per second per RTP flow')
+    parser.add_argument('--format', choices=('pcap', 'pcapng'), default='pcapng')
+    parser.add_argument('--drop-every', type=int, default=0, help='leave out every Nth RTP packet to test loss')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, f'corpus.{args.format}')
+        (write_pcap if args.format == 'pcap' else write_pcapng)(path, packets(args.flows, args.seconds, args.pps,
+                                                                             args.drop_every))
+        print(f"corpus: {os.path.getsize(path) / 1e6:.1f} MB")
+
+        scanner = network_scanner.NetworkStreamScanner()
+        result = scanner.analyze_capture_file(path)
+
+    ticks = args.seconds * args.pps
+    lost = sum(dropped(tick, ticks, args.drop_every) for tick in range(ticks))
+    expected_packets = 2 + args.flows * (ticks - lost)
+    kinds = sorted({flow.kind for flow in scanner.flows})
+    ok = result['packets'] == expected_packets and 'RTSP' in kinds
+
+    streams = [stream for streams in scanner.rtp.summaries().values() for stream in streams]
+    losses = {stream['packets_lost'] for stream in streams}
+    jitter = max((stream['jitter_ms'] for stream in streams), default=0)
+    print(f"RTP streams: {len(streams)}, packets lost per stream: {sorted(losses)}, max jitter: {jitter} ms")
+    ok = ok and len(streams) == args.flows and losses == {lost}
+    if result['flows'] is not None and not lost:
+        rtp_flows = [flow for flow in result['flows'] if flow['dst_port'] == 5004]
+        rates = {round(flow['packet_rate']) for flow in rtp_flows}
+        print(f"RTP flows: {len(rtp_flows)}, packet rates: {sorted(rates)}")
+        ok = ok and len(rtp_flows) == args.flows and rates == {args.pps}
+    print(f"detected kinds: {kinds}")
+    return verdict(ok, "Corpus analysed as expected", "Unexpected analysis result")
+
+
+if __name__ == '__main__':
+    run(main)
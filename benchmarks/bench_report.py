@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Report output benchmark for report_writer.py
+
+Fills a scanner with synthetic results (a swept /16, identified devices
+and captured flows) and writes the report twice: as generate_report()
+dumped with json.dump(indent=2), the old way, and through write_report's
+streaming encoder, and reports time and peak memory for each. Runs
+offline:
+
+    python benchmarks/bench_report.py [--hosts 65534] [--devices 5000] [--flows 20000] [--format json]
+"""
+
+import json
+import os
+import tempfile
+
+from harness import arguments, measure, run, verdict
+
+import network_scanner
+import report_writer
+from host_table import DeviceRecord
+
+
+def populate(scanner, hosts, devices, flows):
+    for index in range(hosts):
+        ip = network_scanner.ip_string(0x0a140000 + index + 1)
+        scanner.active_hosts.add(ip)
+        scanner.rtt.observe(ip, 0.002)
+        if index < devices:
+            scanner.active_hosts.set_ports(ip, [80, 554])
+            info = DeviceRecord(ip, mac='c0:56:e3:00:00:01', type='IP Camera', manufacturer='HikVision',
+                                model='DS-2CD2143', confidence=90)
+            scanner.device_info[ip] = info
+            scanner.streaming_hosts[ip] = scanner.streaming_host(ip, [80, 554], info)
+    for index in range(flows):
+        scanner.flows.observe(17, 0x0a140000 + index % hosts + 1, 0x0a140001, 6970 + index, 5004,
+                              1200, 1.0 + index * 1e-4, 'RTP')
+
+
+def main():
+    parser = arguments(__doc__)
+    parser.add_argument('--hosts', type=int, default=65534)
+    parser.add_argument('--devices', type=int, default=5000)
+    parser.add_argument('--flows', type=int, default=20000)
+    parser.add_argument('--format', choices=('json', 'ndjson'), default='json')
+    args = parser.parse_args()
+
+    scanner = network_scanner.NetworkStreamScanner()
+    populate(scanner, args.hosts, args.devices, args.flows)
+    serializer = 'orjson' if report_writer.load_orjson() else 'json'
+
+    with tempfile.TemporaryDirectory() as directory:
+        old_path = os.path.join(directory, 'old.json')
+        new_path = os.path.join(directory, f'new.{args.format}')
+
+        def old():
+            report = scanner.generate_report()
+            with open(old_path, 'w') as f:
+                json.dump(report, f, indent=2, default=str)
+
+        _, old_time, _, old_peak = measure(old)
+        _, new_time, _, new_peak = measure(scanner.write_report, new_path, args.format)
+        old_size, new_size = os.path.getsize(old_path), os.path.getsize(new_path)
+        if args.format == 'json':
+            with open(old_path) as f_old, open(new_path) as f_new:
+                old_report, new_report = json.load(f_old), json.load(f_new)
+            old_report.pop('scan_timestamp')
+            new_report.pop('scan_timestamp')
+            ok = old_report == new_report
+        else:
+            ok = new_size > 0
+
+    print(f"generate_report + json.dump(indent=2): {old_time:6.2f}s, peak {old_peak / 2**20:7.1f} MiB, "
+          f"{old_size / 2**20:.1f} MiB written")
+    print(f"write_report ({args.format}, {serializer}):{' ' * (14 - len(args.format + serializer))}"
+          f"{new_time:6.2f}s, peak {new_peak / 2**20:7.1f} MiB, {new_size / 2**20:.1f} MiB written")
+    return verdict(ok, "Reports agree", "Reports differ")
+
+
+if __name__ == '__main__':
+    run(main)
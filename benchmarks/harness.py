@@ -0,0 +1,95 @@
+"""
+Shared plumbing for the scripts in benchmarks/
+
+Importing this puts the repository root on sys.path, so the scripts can
+be started from any directory. Each script builds its parser with
+arguments(), times its work with measure() and ends with verdict(),
+which prints one ✅/❌ line and gives the exit status. frame(), rtp()
+and write_pcap()/write_pcapng() build synthetic traffic and captures;
+the tests use them too.
+"""
+
+import argparse
+import os
+import socket
+import struct
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def arguments(doc):
+    """ArgumentParser described by the first line of a script's docstring"""
+    return argparse.ArgumentParser(description=doc.strip().splitlines()[0])
+
+
+def measure(work, *args):
+    """
+    (result, seconds, bytes still held, peak bytes) of work(*args)
+
+    Memory is what Python allocated during the call, per tracemalloc.
+    """
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        result = work(*args)
+        elapsed = time.perf_counter() - started
+        held, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, elapsed, held, peak
+
+
+def verdict(ok, passed, failed):
+    """Print the outcome line; 0 if `ok`, else 1"""
+    print(f"✅ {passed}" if ok else f"❌ {failed}")
+    return 0 if ok else 1
+
+
+def run(main):
+    sys.exit(main())
+
+
+def frame(src, dst, protocol, src_port, dst_port, payload):
+    """Ethernet + IPv4 + UDP/TCP frame (checksums left zero)"""
+    if protocol == 17:
+        transport = struct.pack('!HHHH', src_port, dst_port, 8 + len(payload), 0)
+    else:
+        transport = struct.pack('!HHIIBBHHH', src_port, dst_port, 1, 0, 5 << 4, 0x18, 65535, 0, 0)
+    ip = struct.pack('!BBHHHBBH4s4s', 0x45, 0, 20 + len(transport) + len(payload), 0, 0, 64,
+                     protocol, 0, socket.inet_aton(src), socket.inet_aton(dst))
+    return b'\x00' * 12 + b'\x08\x00' + ip + transport + payload
+
+
+def rtp(sequence, timestamp, ssrc, size=160, payload_type=0):
+    """RTP packet: fixed header and `size` zero bytes of payload"""
+    return (struct.pack('!BBHII', 0x80, payload_type, sequence & 0xffff, timestamp & 0xffffffff, ssrc)
+            + bytes(size))
+
+
+def write_pcap(path, records):
+    """Classic little-endian microsecond pcap of (timestamp, frame) records"""
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1))
+        for timestamp, data in records:
+            seconds = int(timestamp)
+            f.write(struct.pack('<IIII', seconds, round((timestamp - seconds) * 1e6), len(data), len(data)))
+            f.write(data)
+
+
+def write_pcapng(path, records):
+    """pcapng with one Ethernet interface at nanosecond resolution"""
+    def block(block_type, body):
+        length = 12 + len(body) + (-len(body) % 4)
+        return struct.pack('<II', block_type, length) + body + bytes(-len(body) % 4) + struct.pack('<I', length)
+
+    with open(path, 'wb') as f:
+        f.write(block(0x0A0D0D0A, struct.pack('<IHHq', 0x1A2B3C4D, 1, 0, -1)))
+        f.write(block(1, struct.pack('<HHI', 1, 0, 65535) + struct.pack('<HHB3x', 9, 1, 9) + bytes(4)))
+        for timestamp, data in records:
+            ticks = round(timestamp * 1e9)
+            f.write(block(6, struct.pack('<IIIII', 0, ticks >> 32, ticks & 0xffffffff, len(data), len(data)) + data))
@@ -0,0 +1,302 @@
+"""
+Multi-process capture pipeline for network_scanner.py
+
+The capturing process only walks the packet_ring and copies each frame
+into one of several shared-memory rings (ShardRing), chosen by a hash of
+the frame's address and port bytes so every packet of a flow lands in
+the same shard. One decoder process per shard runs the stream classifier
+on its frames and sends its flows back when the capture ends. Decoding
+therefore runs on as many cores as there are decoders instead of
+competing with capture for one interpreter.
+
+A full shard never blocks capture: the frame is dropped and counted, as
+the kernel does when the packet ring overflows. An idle decoder blocks
+on its shard's event until capture writes again. Linux only, like
+packet_ring; the rings are shared-memory files that the decoders map by
+name, and decoders start from a forkserver (or spawn), never by forking
+the capturing process, which may be a threaded API server.
+"""
+
+import mmap
+import multiprocessing
+import os
+import secrets
+import struct
+import time
+
+PIPELINE_WORKERS = max(1, (os.cpu_count() or 1) - 1)  # decoder processes
+SHARD_RING_SIZE = 16 << 20     # bytes of buffering per decoder
+SHARD_BATCH = 4096             # frames a decoder takes before publishing progress
+SHARD_IDLE_WAIT = 0.1          # longest a decoder blocks on an empty ring before looking again
+SHARD_RING_DIR = '/dev/shm'    # tmpfs holding the rings while a capture runs
+SHARD_DEPTH_EVERY = 1024       # frames between queue depth samples
+DECODER_RESULT_TIMEOUT = 30.0  # seconds to wait for a decoder's results
+
+# Shared header: head and tail byte positions, frames written and read, closed and
+# consumer-waiting flags
+COUNTER = struct.Struct('=Q')
+HEAD, TAIL, WRITTEN, READ, CLOSED, WAITING = 0, 8, 16, 24, 32, 40
+HEADER_SIZE = 64
+# Per frame: caplen, wirelen, timestamp, then the frame padded to RECORD_ALIGN
+RECORD = struct.Struct('=IId')
+RECORD_ALIGN = 16
+WRAP = 0xffffffff
+# Ethernet + IPv4 bytes that identify a flow: addresses and, without options, ports
+FLOW_BYTES = slice(26, 38)
+
+
+class ShardRing:
+    """
+    Single-producer, single-consumer frame ring in shared memory
+
+    Positions only grow; the producer owns HEAD and WRITTEN, the
+    consumer TAIL and READ, so no lock is needed. The ring lives in a
+    file under SHARD_RING_DIR; pickling a ShardRing passes its name and
+    `ready` event, and unpickling maps the same file as the consumer.
+    `ready` (a multiprocessing Event) wakes a consumer blocked in wait().
+    """
+
+    def __init__(self, size=SHARD_RING_SIZE, ready=None):
+        self.name = f'scanner-shard-{os.getpid()}-{secrets.token_hex(4)}'
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o600)
+        try:
+            os.ftruncate(fd, HEADER_SIZE + size - size % RECORD_ALIGN)
+            self._map(fd, ready)
+        finally:
+            os.close(fd)
+        self.owner = True
+
+    def __getstate__(self):
+        return self.name, self.ready
+
+    def __setstate__(self, state):
+        self.name, ready = state
+        fd = os.open(self.path, os.O_RDWR)
+        try:
+            self._map(fd, ready)
+        finally:
+            os.close(fd)
+        self.owner = False
+        self.tail = COUNTER.unpack_from(self.buf, TAIL)[0]
+        self.read = COUNTER.unpack_from(self.buf, READ)[0]
+
+    def _map(self, fd, ready):
+        self.buf = mmap.mmap(fd, os.fstat(fd).st_size)
+        self.capacity = len(self.buf) - HEADER_SIZE
+        self.ready = ready
+        self.head = 0
+        self.tail = 0  # producer: last tail seen; consumer: own position
+        self.written = 0
+        self.read = 0
+        self.dropped = 0
+
+    @property
+    def path(self):
+        return os.path.join(SHARD_RING_DIR, self.name)
+
+    def put(self, buf, offset, caplen, wirelen, timestamp):
+        """Copy one frame in; False (and counted as dropped) if the ring is full"""
+        size = RECORD.size + caplen + (-caplen % RECORD_ALIGN)
+        at = self.head % self.capacity
+        contiguous = self.capacity - at
+        needed = size if size <= contiguous else contiguous + size
+        if self.head + needed - self.tail > self.capacity:
+            self.tail = COUNTER.unpack_from(self.buf, TAIL)[0]
+            if self.head + needed - self.tail > self.capacity:
+                self.dropped += 1
+                return False
+        ring = self.buf
+        if size > contiguous:
+            RECORD.pack_into(ring, HEADER_SIZE + at, WRAP, 0, 0.0)
+            self.head += contiguous
+            at = 0
+        start = HEADER_SIZE + at + RECORD.size
+        RECORD.pack_into(ring, HEADER_SIZE + at, caplen, wirelen, timestamp)
+        ring[start:start + caplen] = buf[offset:offset + caplen]
+        self.head += size
+        self.written += 1
+        COUNTER.pack_into(ring, WRITTEN, self.written)
+        COUNTER.pack_into(ring, HEAD, self.head)
+        if COUNTER.unpack_from(ring, WAITING)[0]:
+            self.wake()
+        return True
+
+    def wake(self):
+        COUNTER.pack_into(self.buf, WAITING, 0)
+        if self.ready is not None:
+            self.ready.set()
+
+    def wait(self, timeout=SHARD_IDLE_WAIT):
+        """
+        Consumer: block until the producer writes or closes the ring
+
+        The producer only signals while WAITING is set, so a busy ring
+        costs it no system calls. `timeout` bounds a wake-up lost to the
+        two flags being read and written without a lock.
+        """
+        ring = self.buf
+        if self.ready is not None:
+            self.ready.clear()
+        COUNTER.pack_into(ring, WAITING, 1)
+        if COUNTER.unpack_from(ring, HEAD)[0] == self.tail and not self.closed():
+            if self.ready is not None:
+                self.ready.wait(timeout)
+            else:
+                time.sleep(timeout)
+        COUNTER.pack_into(ring, WAITING, 0)
+
+    def depth(self):
+        """Frames written but not yet decoded"""
+        return self.written - COUNTER.unpack_from(self.buf, READ)[0]
+
+    def close_input(self):
+        COUNTER.pack_into(self.buf, CLOSED, 1)
+        self.wake()
+
+    def drain(self, on_frame, limit=SHARD_BATCH):
+        """
+        Hand up to `limit` queued frames to `on_frame` (packet_ring's
+        callback signature, with this ring as `buf`); returns how many
+        """
+        ring = self.buf
+        head = COUNTER.unpack_from(ring, HEAD)[0]
+        tail = self.tail
+        count = 0
+        while tail < head and count < limit:
+            at = HEADER_SIZE + tail % self.capacity
+            caplen, wirelen, timestamp = RECORD.unpack_from(ring, at)
+            if caplen == WRAP:
+                tail += self.capacity - tail % self.capacity
+                continue
+            on_frame(ring, at + RECORD.size, caplen, wirelen, timestamp)
+            tail += RECORD.size + caplen + (-caplen % RECORD_ALIGN)
+            count += 1
+        if count or tail != self.tail:
+            self.tail = tail
+            self.read += count
+            COUNTER.pack_into(ring, READ, self.read)
+            COUNTER.pack_into(ring, TAIL, tail)
+        return count
+
+    def closed(self):
+        return COUNTER.unpack_from(self.buf, CLOSED)[0] == 1
+
+    def close(self):
+        self.buf.close()
+        if self.owner:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+
+
+def process_context():
+    """
+    multiprocessing context for worker processes: forkserver, else spawn
+
+    Not fork: the caller may be a thread of the API server, and forking
+    a threaded process copies locks other threads may be holding.
+    """
+    return multiprocessing.get_context(
+        'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+
+
+def decode(shard, classifier_factory, conn):
+    """Decoder process: classify a shard's frames until capture closes it"""
+    classifier = classifier_factory()
+    decoded = 0
+    while True:
+        count = shard.drain(classifier.analyze_frame)
+        decoded += count
+        if not count:
+            if shard.closed() and not shard.drain(classifier.analyze_frame):
+                break
+            shard.wait()
+    conn.send((decoded, classifier.capture_results()))
+    conn.close()
+    shard.close()
+
+
+class CapturePipeline:
+    """
+    Capture on a packet_ring.RingCapture, decode in worker processes
+
+        pipeline = CapturePipeline(ring, NetworkStreamScanner, workers=4)
+        stats, results = pipeline.run(duration=30)
+
+    `classifier_factory()` is called in each decoder and must return an
+    object with analyze_frame(buf, offset, caplen, wirelen, timestamp)
+    and capture_results(); `results` holds one capture_results() value
+    per decoder. Decoders are started with process_context(), so the
+    factory must be picklable (a module-level class or function).
+    """
+
+    def __init__(self, capture, classifier_factory, workers=PIPELINE_WORKERS,
+                 ring_size=SHARD_RING_SIZE):
+        self.capture = capture
+        self.classifier_factory = classifier_factory
+        self.context = process_context()
+        self.shards = [ShardRing(ring_size, self.context.Event()) for _ in range(max(1, workers))]
+        self.max_depth = [0] * len(self.shards)
+        self.dispatched = 0
+
+    def dispatch(self, buf, offset, caplen, wirelen, timestamp):
+        """packet_ring callback: route the frame to its flow's shard"""
+        shards = self.shards
+        shard = shards[hash(buf[offset + FLOW_BYTES.start:offset + FLOW_BYTES.stop]) % len(shards)]
+        shard.put(buf, offset, caplen, wirelen, timestamp)
+        self.dispatched += 1
+        if self.dispatched % SHARD_DEPTH_EVERY == 0:
+            for index, shard in enumerate(shards):
+                self.max_depth[index] = max(self.max_depth[index], shard.depth())
+
+    def run(self, duration, stop=None):
+        """
+        Capture for `duration` seconds (or until `stop` is set), then
+        wait for the decoders; returns (stats, results)
+        """
+        context = self.context
+        decoders = []
+        try:
+            for shard in self.shards:
+                receiver, sender = context.Pipe(duplex=False)
+                process = context.Process(target=decode, args=(shard, self.classifier_factory, sender),
+                                          daemon=True)
+                process.start()
+                sender.close()
+                decoders.append((process, receiver))
+
+            with self.capture:
+                delivered = self.capture.run(self.dispatch, duration, stop)
+                _, kernel_dropped = self.capture.stats()
+
+            for shard in self.shards:
+                shard.close_input()
+            results = []
+            decoded = []
+            for process, receiver in decoders:
+                if receiver.poll(DECODER_RESULT_TIMEOUT):
+                    count, result = receiver.recv()
+                    decoded.append(count)
+                    results.append(result)
+                else:
+                    decoded.append(None)
+                receiver.close()
+                process.join(1.0)
+        finally:
+            for process, _ in decoders:
+                if process.is_alive():
+                    process.terminate()
+            for shard in self.shards:
+                shard.close()
+
+        stats = {
+            'workers': len(self.shards),
+            'delivered': delivered,
+            'kernel_dropped': kernel_dropped,
+            'queue_dropped': sum(shard.dropped for shard in self.shards),
+            'shard_frames': [shard.written for shard in self.shards],
+            'shard_decoded': decoded,
+            'shard_max_depth': self.max_depth
+        }
+        return stats, results
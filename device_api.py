@@ -8,6 +8,11 @@ import sys
 from datetime import datetime, timedelta
 import socket
 import struct
+import threading
+import queue
+from urllib.parse import quote
+
+from network_scanner import NetworkStreamScanner, SCAN_CACHE_PATH
 
 # Fix Windows console encoding for emoji characters
 if sys.platform == 'win32':
@@ -121,7 +126,383 @@ def get_device_categories():
         'timestamp': hdmi_devices['scan_timestamp']
     })
 
-# Scan and thumbnail routes removed - using static HDMI inputs with inline SVG
+# Background network scanning - found devices are listed after the HDMI inputs
+SCAN_INTERVAL = 60       # seconds between passes while continuous scanning is on
+SCAN_DEADLINE = 300      # seconds before a pass is cancelled
+SCAN_STREAM_BACKLOG = 1024   # events a slow /api/scan/stream client may fall behind by
+SCAN_STREAM_KEEPALIVE = 15   # seconds between keepalives on an idle stream
+
+STATIC_DEVICES = list(hdmi_devices['devices'])
+
+DEVICE_CATEGORIES = {
+    'IP Camera': 'IP Cameras',
+    'Linux Server': 'Servers',
+    'Streaming Server': 'Servers',
+    'Media Server': 'Servers',
+    'Windows PC': 'PCs',
+}
+
+DEVICE_COLORS = {
+    'IP Cameras': '%239013FE',
+    'Servers': '%23417505',
+    'PCs': '%238B572A',
+    'Network Devices': '%234A4A4A',
+    'Unknown': '%239B9B9B',
+}
+
+
+def device_category(device_type, confidence):
+    if device_type == 'Unknown' or confidence <= 50:
+        return 'Unknown'
+    return DEVICE_CATEGORIES.get(device_type, 'Network Devices')
+
+
+def network_device(host):
+    """Scanner result -> the device shape used by /api/devices"""
+    category = device_category(host['device_type'], host['confidence'])
+    label = quote(host['host'])
+    return {
+        'id': f"net-{host['host']}",
+        'name': f"{host['manufacturer']} {host['device_type']}" if host['manufacturer'] != 'Unknown' else host['device_type'],
+        'ip': host['host'],
+        'mac': host['mac'],
+        'type': host['device_type'],
+        'category': category,
+        'manufacturer': host['manufacturer'],
+        'model': host['model'],
+        'confidence': host['confidence'],
+        'ports': host['open_ports'],
+        'services': sorted({service['service'] for service in host['services'] if service.get('service')}),
+        'src': f'data:image/svg+xml,%3Csvg xmlns="http://www.w3.org/2000/svg" width="200" height="150" viewBox="0 0 200 150"%3E%3Crect width="200" height="150" fill="{DEVICE_COLORS[category]}"/%3E%3Ctext x="100" y="75" font-family="Arial" font-size="18" fill="white" text-anchor="middle" dominant-baseline="middle"%3E{label}%3C/text%3E%3C/svg%3E',
+        'status': 'online'
+    }
+
+
+def publish_devices(streaming_hosts):
+    """Replace the network part of the device list in one step"""
+    devices = STATIC_DEVICES + [network_device(host) for host in streaming_hosts]
+    categories = {name: [] for name in hdmi_devices['device_categories']}
+    for device in devices:
+        categories[device.get('category', 'HDMI Sources')].append(device)
+    hdmi_devices.update({
+        'devices': devices,
+        'scan_timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'total_devices': len(devices),
+        'device_categories': categories
+    })
+
+
+class ScanService:
+    """
+    Runs NetworkStreamScanner passes on one background thread
+
+    A pass goes running -> completed, cancelled (stop), timed_out
+    (SCAN_DEADLINE) or failed. With continuous scanning the thread then
+    sits in 'waiting' until SCAN_INTERVAL passes or a rescan is asked for.
+    Request handlers only flip flags and read counters, so none of them
+    ever waits on the network.
+
+    Each pass runs the scanner's per-host pipeline, so devices join the
+    device list and go out to subscribers (see /api/scan/stream) one by
+    one as they are identified. A completed pass then drops devices that
+    were not seen again.
+    """
+
+    def __init__(self, interval=SCAN_INTERVAL, deadline=SCAN_DEADLINE, cache_path=None):
+        self.interval = interval
+        self.deadline = deadline
+        self.cache_path = cache_path
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+        self.scanner = None
+        self.last_scanner = None  # scanner of the last finished pass, for metrics()
+        self.state = 'idle'
+        self.network_range = None
+        self.continuous = True
+        self.stop_requested = False
+        self.timed_out = False
+        self.last_scan = None
+        self.last_error = None
+        self.passes = 0
+        self.progress = self._new_progress()
+        self.published = {}     # ip -> scanner entry currently in the device list
+        self.subscribers = []
+
+    @staticmethod
+    def _new_progress():
+        return {'hosts_found': 0, 'streaming_devices': 0, 'devices_identified': 0,
+                'started': None, 'elapsed': 0.0}
+
+    @property
+    def is_scanning(self):
+        return self.state in ('running', 'waiting', 'stopping')
+
+    def start(self, network_range=None, continuous=True):
+        """Start scanning; False if a scan is already running"""
+        with self.lock:
+            if self.thread and self.thread.is_alive():
+                return False
+            self.network_range = network_range
+            self.continuous = continuous
+            self.stop_requested = False
+            self.wake.clear()
+            self.state = 'running'
+            self.thread = threading.Thread(target=self._run, name='scan-service', daemon=True)
+            self.thread.start()
+        return True
+
+    def stop(self):
+        """Cancel the pass in progress and end continuous scanning"""
+        with self.lock:
+            if not (self.thread and self.thread.is_alive()):
+                return False
+            self.stop_requested = True
+            self.state = 'stopping'
+            if self.scanner:
+                self.scanner.cancel()
+            self.wake.set()
+        return True
+
+    def rescan(self):
+        """Run a pass now: wake a waiting service, or start a one-off pass"""
+        with self.lock:
+            if self.thread and self.thread.is_alive():
+                if self.state == 'waiting':
+                    self.wake.set()
+                    return 'woken'
+                return 'running'
+        self.start(self.network_range, continuous=False)
+        return 'started'
+
+    def status(self):
+        with self.lock:
+            progress = dict(self.progress)
+            if progress['started'] and self.state in ('running', 'stopping'):
+                progress['elapsed'] = round(time.monotonic() - progress['started'], 2)
+            progress.pop('started')
+            return {
+                'state': self.state,
+                'is_scanning': self.is_scanning,
+                'continuous': self.continuous,
+                'network_range': self.network_range,
+                'passes': self.passes,
+                'last_scan': self.last_scan,
+                'last_error': self.last_error,
+                'progress': progress
+            }
+
+    def metrics(self):
+        """Per-phase scan metrics of the pass in progress, else of the last one"""
+        with self.lock:
+            scanner = self.scanner or self.last_scanner
+        return scanner.metrics.summary() if scanner else None
+
+    def _run(self):
+        while True:
+            self._scan_once()
+            with self.lock:
+                if self.stop_requested:
+                    self.state = 'cancelled'
+                if self.stop_requested or not self.continuous:
+                    return
+                self.state = 'waiting'
+            self._emit('status', self.status())
+            self.wake.wait(self.interval)
+            with self.lock:
+                self.wake.clear()
+                if self.stop_requested:
+                    self.state = 'cancelled'
+                    return
+                self.state = 'running'
+
+    def subscribe(self):
+        """Queue of (event, data) pairs: 'device' per device found, 'status' per state change"""
+        events = queue.Queue(maxsize=SCAN_STREAM_BACKLOG)
+        with self.lock:
+            self.subscribers.append(events)
+        return events
+
+    def unsubscribe(self, events):
+        with self.lock:
+            if events in self.subscribers:
+                self.subscribers.remove(events)
+
+    def devices(self):
+        with self.lock:
+            return [network_device(entry) for entry in self.published.values()]
+
+    def _emit(self, event, data):
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for events in subscribers:
+            try:
+                events.put_nowait((event, data))
+            except queue.Full:
+                pass  # the client is not reading; it gets the full list when it reconnects
+
+    def _count(self, counter):
+        def callback(*_):
+            with self.lock:
+                self.progress[counter] += 1
+        return callback
+
+    def _scan_once(self):
+        scanner = NetworkStreamScanner(cache_path=self.cache_path)
+        with self.lock:
+            if self.stop_requested:
+                return
+            self.scanner = scanner
+            self.timed_out = False
+            self.last_error = None
+            self.progress = self._new_progress()
+            self.progress['started'] = time.monotonic()
+
+        def expire():
+            with self.lock:
+                self.timed_out = True
+            scanner.cancel()
+
+        seen = {}
+
+        def device_found(entry):
+            with self.lock:
+                seen[entry['host']] = entry
+                self.published[entry['host']] = entry
+                self.progress['streaming_devices'] += 1
+                if scanner.is_identified(entry):
+                    self.progress['devices_identified'] += 1
+                publish_devices(self.published.values())
+                self.last_scan = hdmi_devices['scan_timestamp']
+            self._emit('device', network_device(entry))
+
+        self._emit('status', self.status())
+        timer = threading.Timer(self.deadline, expire)
+        timer.daemon = True
+        timer.start()
+        outcome = 'completed'
+        try:
+            targets = [self.network_range] if isinstance(self.network_range, str) else self.network_range
+            scanner.scan_networks(targets, on_device=device_found, on_host=self._count('hosts_found'))
+            with self.lock:
+                if not scanner.cancelled.is_set():
+                    self.published = seen
+                    publish_devices(self.published.values())
+                    self.last_scan = hdmi_devices['scan_timestamp']
+        except Exception as e:
+            outcome = 'failed'
+            with self.lock:
+                self.last_error = str(e)
+            print(f"❌ Background scan failed: {e}")
+        finally:
+            timer.cancel()
+            if scanner.cache:
+                scanner.cache.close()
+
+        with self.lock:
+            if outcome == 'completed' and scanner.cancelled.is_set():
+                outcome = 'timed_out' if self.timed_out else 'cancelled'
+            self.state = outcome
+            self.scanner = None
+            self.last_scanner = scanner
+            self.passes += 1
+            self.progress['elapsed'] = round(time.monotonic() - self.progress['started'], 2)
+        self._emit('status', self.status())
+
+
+scan_service = ScanService(cache_path=os.environ.get('SCANNER_CACHE', SCAN_CACHE_PATH))
+
+
+@app.route('/api/scan/start', methods=['POST'])
+def scan_start():
+    """Start background network scanning"""
+    data = request.get_json(silent=True) or {}
+    # 'networks' lists CIDRs and/or interface names; neither means every local network
+    networks = data.get('networks') or data.get('network_range')
+    if not scan_service.start(networks, data.get('continuous', True)):
+        return jsonify({'status': 'info', 'message': 'Scan already running', **scan_service.status()})
+    return jsonify({'status': 'success', 'message': 'Scan started', **scan_service.status()})
+
+@app.route('/api/scan/stop', methods=['POST'])
+def scan_stop():
+    """Cancel background network scanning"""
+    if not scan_service.stop():
+        return jsonify({'status': 'info', 'message': 'No scan running', **scan_service.status()})
+    return jsonify({'status': 'success', 'message': 'Scan stopping', **scan_service.status()})
+
+@app.route('/api/scan/status', methods=['GET'])
+def scan_status():
+    """Get scan state and progress counters"""
+    return jsonify({
+        'status': 'success',
+        'device_count': hdmi_devices['total_devices'],
+        **scan_service.status()
+    })
+
+@app.route('/api/scan/metrics', methods=['GET'])
+def scan_metrics():
+    """
+    Per-phase probe counts, timeouts, errors and duration histograms
+
+    Covers the pass in progress, or the last pass when none is running.
+    Sharded passes report each shard's phases once the shard finishes.
+    """
+    return jsonify({'status': 'success', 'state': scan_service.state,
+                    'metrics': scan_service.metrics()})
+
+@app.route('/api/rescan', methods=['POST'])
+def rescan():
+    """Trigger an immediate scan pass"""
+    outcome = scan_service.rescan()
+    messages = {
+        'woken': 'Rescan started',
+        'started': 'Rescan started',
+        'running': 'Scan already in progress'
+    }
+    return jsonify({'status': 'success' if outcome != 'running' else 'info',
+                    'message': messages[outcome], **scan_service.status()})
+
+@app.route('/api/scan/stream', methods=['GET'])
+def scan_stream():
+    """
+    Stream scan results as they happen
+
+    NDJSON by default, one {"event": ..., "data": ...} object per line;
+    Server-Sent Events when the client accepts text/event-stream or
+    passes ?format=sse. Devices already found are sent first. The stream
+    ends when the current pass does, unless ?follow=1 keeps it open
+    across passes.
+    """
+    sse = request.args.get('format') == 'sse' or 'text/event-stream' in request.headers.get('Accept', '')
+    follow = request.args.get('follow') in ('1', 'true')
+    events = scan_service.subscribe()
+
+    def encode(event, data):
+        if sse:
+            return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        return json.dumps({'event': event, 'data': data}) + '\n'
+
+    def generate():
+        try:
+            status = scan_service.status()
+            yield encode('status', status)
+            for device in scan_service.devices():
+                yield encode('device', device)
+            running = status['state'] in ('running', 'stopping')
+            while running or follow:
+                try:
+                    event, data = events.get(timeout=SCAN_STREAM_KEEPALIVE)
+                except queue.Empty:
+                    yield ': keepalive\n\n' if sse else '\n'
+                    continue
+                yield encode(event, data)
+                if event == 'status':
+                    running = data['state'] in ('running', 'stopping')
+        finally:
+            scan_service.unsubscribe(events)
+
+    return Response(generate(), mimetype='text/event-stream' if sse else 'application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 # Q-SYS Core Aurora DIDO Plugin Integration (using TCP JSON-RPC)
 class QSysAuroraDIDO:
@@ -939,7 +1320,9 @@ if __name__ == '__main__':
     print("   POST /api/scan/start - Start network scanning")
     print("   POST /api/scan/stop - Stop network scanning")
     print("   GET  /api/scan/status - Get scanning status")
+    print("   GET  /api/scan/metrics - Per-phase scan timings and timeouts")
     print("   POST /api/rescan - Trigger immediate rescan")
+    print("   GET  /api/scan/stream - Devices as they are found (NDJSON, or SSE with ?format=sse)")
     print("   GET  /api/thumbnail?url=<stream_url> - Get thumbnail from MJPEG stream")
     print("   POST /api/dido/route - Route single input to output")
     print("   POST /api/dido/route-multiple - Route multiple inputs to single output")
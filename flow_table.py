@@ -0,0 +1,167 @@
+"""
+Bounded per-flow traffic aggregation for network_scanner.py
+
+Packets are folded into one fixed-size record per 5-tuple instead of
+being kept individually. Each flow has packet and byte counters, first
+and last seen times, an exponentially weighted byte rate and, if asked
+for, a fixed ring of recent (timestamp, size) samples. Flows idle for
+longer than idle_timeout are evicted, and beyond max_flows the least
+recently seen flow makes room. Memory therefore depends on those two
+limits, not on how long the capture runs.
+"""
+
+import math
+import socket
+import struct
+from array import array
+from collections import OrderedDict
+
+FLOW_MAX = 65536           # flows tracked at once
+FLOW_IDLE_TIMEOUT = 120.0  # seconds without a packet before a flow is evicted
+FLOW_RATE_WINDOW = 5.0     # seconds the rolling byte rate is averaged over
+FLOW_EXPIRE_EVERY = 1.0    # seconds of capture time between idle sweeps
+
+PROTOCOL_NAMES = {6: 'TCP', 17: 'UDP'}
+
+
+class Flow:
+    """Counters for one (protocol, src, dst, src_port, dst_port) flow"""
+
+    __slots__ = ('key', 'kind', 'packets', 'bytes', 'first_seen', 'last_seen',
+                 'rate', 'samples', 'sample_count')
+
+    def __init__(self, key, kind, timestamp, sample_size):
+        self.key = key
+        self.kind = kind
+        self.packets = 0
+        self.bytes = 0
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.rate = 0.0
+        self.samples = array('d', bytes(16 * sample_size)) if sample_size else None
+        self.sample_count = 0
+
+    def recent_samples(self):
+        """Kept (timestamp, size) samples, oldest first"""
+        if self.samples is None:
+            return []
+        size = len(self.samples) // 2
+        count = min(self.sample_count, size)
+        start = self.sample_count - count
+        return [(self.samples[2 * (i % size)], int(self.samples[2 * (i % size) + 1]))
+                for i in range(start, self.sample_count)]
+
+    def to_dict(self):
+        protocol, src, dst, src_port, dst_port = self.key
+        return {
+            'protocol': self.kind,
+            'transport': PROTOCOL_NAMES.get(protocol, str(protocol)),
+            'src_ip': socket.inet_ntoa(struct.pack('!I', src)),
+            'dst_ip': socket.inet_ntoa(struct.pack('!I', dst)),
+            'src_port': src_port,
+            'dst_port': dst_port,
+            'packets': self.packets,
+            'bytes': self.bytes,
+            'first_seen': self.first_seen,
+            'last_seen': self.last_seen,
+            'duration': round(self.last_seen - self.first_seen, 3),
+            'rate_bps': round(self.rate * 8, 1),
+            'timestamp': self.first_seen,
+            'size': self.bytes
+        }
+
+
+class FlowTable:
+    """
+    5-tuple -> Flow, ordered by last packet so eviction is cheap
+
+    `on_classified(flow)` fires when a flow is created or its kind
+    changes, e.g. to report each detected stream once.
+    """
+
+    def __init__(self, max_flows=FLOW_MAX, idle_timeout=FLOW_IDLE_TIMEOUT,
+                 rate_window=FLOW_RATE_WINDOW, sample_size=0, on_classified=None):
+        self.max_flows = max_flows
+        self.idle_timeout = idle_timeout
+        self.rate_window = rate_window
+        self.sample_size = sample_size
+        self.on_classified = on_classified
+        self.flows = OrderedDict()
+        self.evicted = 0
+        self.expired = 0
+        self.next_expiry = 0.0
+
+    def __len__(self):
+        return len(self.flows)
+
+    def __iter__(self):
+        return iter(self.flows.values())
+
+    def observe(self, protocol, src, dst, src_port, dst_port, size, timestamp, kind=None):
+        """
+        Count one packet; return its Flow, or None if it was not counted
+
+        Packets with no `kind` only count towards flows already tracked,
+        so e.g. the ACKs of a classified RTSP session are included while
+        unrelated traffic never creates a flow.
+        """
+        key = (protocol, src, dst, src_port, dst_port)
+        flow = self.flows.get(key)
+        if flow is None:
+            if kind is None:
+                return None
+            if len(self.flows) >= self.max_flows:
+                self.flows.popitem(last=False)
+                self.evicted += 1
+            flow = self.flows[key] = Flow(key, kind, timestamp, self.sample_size)
+            if self.on_classified:
+                self.on_classified(flow)
+        else:
+            self.flows.move_to_end(key)
+            if kind is not None and kind != flow.kind:
+                flow.kind = kind
+                if self.on_classified:
+                    self.on_classified(flow)
+
+        elapsed = timestamp - flow.last_seen
+        if elapsed > 0:
+            flow.rate *= math.exp(-elapsed / self.rate_window)
+        flow.rate += size / self.rate_window
+        flow.packets += 1
+        flow.bytes += size
+        flow.last_seen = timestamp
+        if flow.samples is not None:
+            slot = 2 * (flow.sample_count % self.sample_size)
+            flow.samples[slot] = timestamp
+            flow.samples[slot + 1] = size
+            flow.sample_count += 1
+
+        if timestamp >= self.next_expiry:
+            self.expire(timestamp)
+        return flow
+
+    def merge(self, flows):
+        """Adopt Flow records counted elsewhere, e.g. by capture_pipeline decoders"""
+        for flow in sorted(flows, key=lambda flow: flow.last_seen):
+            if flow.key not in self.flows and len(self.flows) >= self.max_flows:
+                self.flows.popitem(last=False)
+                self.evicted += 1
+            self.flows[flow.key] = flow
+            self.flows.move_to_end(flow.key)
+
+    def expire(self, now):
+        """Evict flows idle for longer than idle_timeout"""
+        self.next_expiry = now + FLOW_EXPIRE_EVERY
+        cutoff = now - self.idle_timeout
+        while self.flows:
+            flow = next(iter(self.flows.values()))
+            if flow.last_seen >= cutoff:
+                break
+            self.flows.popitem(last=False)
+            self.expired += 1
+
+    def summary(self, kinds=None):
+        """Flow dicts (optionally only of the given kinds), busiest first"""
+        flows = [flow for flow in self.flows.values() if kinds is None or flow.kind in kinds]
+        flows.sort(key=lambda flow: flow.bytes, reverse=True)
+        return [flow.to_dict() for flow in flows]
@@ -0,0 +1,201 @@
+"""
+Compact host records for network_scanner.py
+
+A /16 sweep used to leave a list of up to 65536 address strings behind,
+plus a dict per identified device. HostTable keeps liveness as one bit
+per address and open ports as one bitmask per address (bit i set when
+the i-th scanned port is open), in blocks of 512 bytes and 8 KiB per
+/20 that are only allocated once an address in that /20 is recorded.
+Identified devices are DeviceRecord objects with __slots__. Both pickle
+to little more than their raw bytes, so shard results stay cheap to
+pass between processes.
+"""
+
+import socket
+import struct
+from array import array
+
+BLOCK_BITS = 12                # addresses per block: one /20
+BLOCK_SIZE = 1 << BLOCK_BITS
+BLOCK_MASK = BLOCK_SIZE - 1
+
+
+def _number(ip):
+    return ip if isinstance(ip, int) else struct.unpack('!I', socket.inet_aton(ip))[0]
+
+
+def _string(address):
+    return socket.inet_ntoa(struct.pack('!I', address))
+
+
+class HostTable:
+    """
+    Set of live IPv4 addresses with an open-port bitmask per address
+
+    Iterates addresses as strings in numeric order, supports `in`, len()
+    and add(), so it stands in for the list of address strings it
+    replaces. `ports` fixes the bit of each port in the masks; ports not
+    in it are not recorded.
+    """
+
+    def __init__(self, ports=()):
+        self.ports = tuple(ports)
+        self.port_bits = {port: 1 << index for index, port in enumerate(self.ports)}
+        self.typecode = 'H' if len(self.ports) <= 16 else 'I' if len(self.ports) <= 32 else 'Q'
+        self.alive = {}       # address >> BLOCK_BITS -> bitmap of BLOCK_SIZE bits
+        self.open_ports = {}  # address >> BLOCK_BITS -> array of BLOCK_SIZE port masks
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, ip):
+        address = _number(ip)
+        block = self.alive.get(address >> BLOCK_BITS)
+        offset = address & BLOCK_MASK
+        return block is not None and bool(block[offset >> 3] & (1 << (offset & 7)))
+
+    def __iter__(self):
+        return (_string(address) for address in self.addresses())
+
+    def add(self, ip):
+        """Mark `ip` alive; True if it was not already"""
+        address = _number(ip)
+        block = self.alive.get(address >> BLOCK_BITS)
+        if block is None:
+            block = self.alive[address >> BLOCK_BITS] = bytearray(BLOCK_SIZE // 8)
+        offset = address & BLOCK_MASK
+        bit = 1 << (offset & 7)
+        if block[offset >> 3] & bit:
+            return False
+        block[offset >> 3] |= bit
+        self.count += 1
+        return True
+
+    def addresses(self, first=0, last=0xffffffff):
+        """Live addresses between `first` and `last` (inclusive) as integers, in order"""
+        for base in sorted(self.alive):
+            start = base << BLOCK_BITS
+            if start + BLOCK_MASK < first or start > last:
+                continue
+            block = self.alive[base]
+            for index in range(max(0, first - start) >> 3, (min(BLOCK_MASK, last - start) >> 3) + 1):
+                byte = block[index]
+                while byte:
+                    low = byte & -byte
+                    address = start | (index << 3) | (low.bit_length() - 1)
+                    if first <= address <= last:
+                        yield address
+                    byte ^= low
+
+    def hosts_in(self, network):
+        """Live addresses of an ipaddress.IPv4Network, as strings"""
+        return (_string(address) for address in
+                self.addresses(int(network.network_address), int(network.broadcast_address)))
+
+    def set_ports(self, ip, ports):
+        address = _number(ip)
+        mask = 0
+        for port in ports:
+            mask |= self.port_bits.get(port, 0)
+        masks = self.open_ports.get(address >> BLOCK_BITS)
+        if masks is None:
+            if not mask:
+                return
+            masks = self.open_ports[address >> BLOCK_BITS] = array(
+                self.typecode, bytes(array(self.typecode).itemsize * BLOCK_SIZE))
+        masks[address & BLOCK_MASK] = mask
+
+    def get_ports(self, ip):
+        """Open ports recorded for `ip`, in `ports` order"""
+        address = _number(ip)
+        masks = self.open_ports.get(address >> BLOCK_BITS)
+        mask = masks[address & BLOCK_MASK] if masks is not None else 0
+        return [port for port, bit in self.port_bits.items() if mask & bit]
+
+    def update(self, other):
+        """Merge another table with the same `ports`, e.g. from a scan shard"""
+        for base, block in other.alive.items():
+            mine = self.alive.get(base)
+            if mine is None:
+                self.alive[base] = bytearray(block)
+            else:
+                self.alive[base] = bytearray(a | b for a, b in zip(mine, block))
+        for base, masks in other.open_ports.items():
+            mine = self.open_ports.get(base)
+            if mine is None:
+                self.open_ports[base] = array(self.typecode, masks)
+            else:
+                for offset, mask in enumerate(masks):
+                    if mask:
+                        mine[offset] = mask
+        self.count = sum(bin(int.from_bytes(block, 'little')).count('1') for block in self.alive.values())
+
+    def copy(self):
+        table = HostTable(self.ports)
+        table.update(self)
+        return table
+
+    def nbytes(self):
+        """Bytes held by the bitmaps and port masks"""
+        return (sum(len(block) for block in self.alive.values()) +
+                sum(masks.itemsize * len(masks) for masks in self.open_ports.values()))
+
+
+class DeviceRecord:
+    """
+    Identification result for one device
+
+    Fixed __slots__ instead of a dict per device, but read and written
+    like the dict it replaces (record['manufacturer'], update(), dict(record)).
+    """
+
+    __slots__ = ('ip', 'type', 'manufacturer', 'model', 'confidence', 'mac', 'services', 'oui_vendor')
+
+    def __init__(self, ip, mac='', **fields):
+        self.ip = ip
+        self.type = 'Unknown'
+        self.manufacturer = 'Unknown'
+        self.model = 'Unknown'
+        self.confidence = 0
+        self.mac = mac
+        self.services = []
+        self.oui_vendor = None
+        self.update(fields)
+
+    @classmethod
+    def from_dict(cls, info):
+        """Record from a dict such as a cached identity; unknown keys are dropped"""
+        return cls(**{key: value for key, value in info.items() if key in cls.__slots__})
+
+    def keys(self):
+        return [key for key in self.__slots__ if key != 'oui_vendor' or self.oui_vendor is not None]
+
+    def items(self):
+        return [(key, getattr(self, key)) for key in self.keys()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.__slots__ else default
+
+    def update(self, fields):
+        for key, value in dict(fields).items():
+            self[key] = value
+
+    def __repr__(self):
+        return f"DeviceRecord({dict(self)!r})"
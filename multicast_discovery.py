@@ -0,0 +1,289 @@
+"""
+Multicast service discovery for network_scanner.py
+
+Sends one ONVIF WS-Discovery Probe, one SSDP M-SEARCH and one mDNS query
+and parses whatever answers arrive within a short window. Devices that
+announce themselves this way never need to be found by sweeping.
+"""
+
+import asyncio
+import re
+import socket
+import struct
+import uuid
+from urllib.parse import unquote
+
+MULTICAST_WINDOW = 1.0  # seconds to collect replies
+
+WSD_ADDR = ('239.255.255.250', 3702)
+SSDP_ADDR = ('239.255.255.250', 1900)
+MDNS_ADDR = ('224.0.0.251', 5353)
+
+# mDNS service types worth asking for, with what an answer tells us
+MDNS_SERVICES = {
+    '_axis-video._tcp.local': ('IP Camera', 'Axis', 90),
+    '_rtsp._tcp.local': ('IP Camera', 'Unknown', 75),
+    '_ndi._tcp.local': ('NDI Source', 'Unknown', 85),
+}
+
+# SSDP device URNs that map onto our device types
+SSDP_DEVICE_TYPES = {
+    'networkvideotransmitter': ('IP Camera', 80),
+    'mediarenderer': ('Media Renderer', 70),
+    'mediaserver': ('Media Server', 70),
+    'internetgatewaydevice': ('Router', 70),
+    'wfadevice': ('Network Device', 60),
+}
+
+WSD_PROBE = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<e:Envelope xmlns:e="http://www.w3.org/2003/05/soap-envelope"'
+    ' xmlns:w="http://schemas.xmlsoap.org/ws/2004/08/addressing"'
+    ' xmlns:d="http://schemas.xmlsoap.org/ws/2005/04/discovery"'
+    ' xmlns:dn="http://www.onvif.org/ver10/network/wsdl">'
+    '<e:Header>'
+    '<w:MessageID>uuid:{message_id}</w:MessageID>'
+    '<w:To e:mustUnderstand="true">urn:schemas-xmlsoap-org:ws:2005:04:discovery</w:To>'
+    '<w:Action e:mustUnderstand="true">http://schemas.xmlsoap.org/ws/2005/04/discovery/Probe</w:Action>'
+    '</e:Header>'
+    '<e:Body><d:Probe><d:Types>dn:NetworkVideoTransmitter</d:Types></d:Probe></e:Body>'
+    '</e:Envelope>'
+)
+
+SSDP_MSEARCH = (
+    'M-SEARCH * HTTP/1.1\r\n'
+    'HOST: 239.255.255.250:1900\r\n'
+    'MAN: "ssdp:discover"\r\n'
+    'MX: 1\r\n'
+    'ST: ssdp:all\r\n'
+    'USER-AGENT: NetworkScanner/1.0\r\n'
+    '\r\n'
+)
+
+DNS_PTR, DNS_TXT, DNS_SRV, DNS_A = 12, 16, 33, 1
+DNS_QU = 0x8000  # ask for a unicast response
+
+XML_ELEMENT_RE = {
+    name: re.compile(rf'<(?:[\w-]+:)?{name}\b[^>]*>(.*?)</(?:[\w-]+:)?{name}>', re.S)
+    for name in ('Types', 'Scopes', 'XAddrs')
+}
+
+
+def build_wsd_probe():
+    return WSD_PROBE.format(message_id=uuid.uuid4()).encode()
+
+
+def build_ssdp_msearch():
+    return SSDP_MSEARCH.encode()
+
+
+def build_mdns_query(names=tuple(MDNS_SERVICES)):
+    """One DNS message with a PTR question per service type"""
+    message = struct.pack('!6H', 0, 0, len(names), 0, 0, 0)
+    for name in names:
+        for label in name.split('.'):
+            message += bytes([len(label)]) + label.encode()
+        message += b'\x00' + struct.pack('!HH', DNS_PTR, 1 | DNS_QU)
+    return message
+
+
+def parse_wsd_reply(data):
+    """ProbeMatch -> service info, using the ONVIF scopes for maker and model"""
+    text = data.decode('utf-8', errors='replace')
+    if 'ProbeMatch' not in text:
+        return None
+
+    def element(name):
+        match = XML_ELEMENT_RE[name].search(text)
+        return match.group(1).split() if match else []
+
+    scopes = {}
+    for scope in element('Scopes'):
+        if scope.startswith('onvif://www.onvif.org/'):
+            key, _, value = scope[len('onvif://www.onvif.org/'):].partition('/')
+            scopes.setdefault(key.lower(), unquote(value))
+
+    types = ' '.join(element('Types'))
+    return {
+        'service': 'ONVIF (WS-Discovery)',
+        'device_type': 'IP Camera' if 'NetworkVideoTransmitter' in types else 'ONVIF Device',
+        'manufacturer': scopes.get('mfr') or scopes.get('name') or 'Unknown',
+        'model': scopes.get('hardware', 'Unknown'),
+        'confidence': 90,
+        'xaddrs': element('XAddrs'),
+        'scopes': scopes
+    }
+
+
+def parse_ssdp_reply(data):
+    """M-SEARCH response -> service info from ST/USN and SERVER"""
+    lines = data.decode('utf-8', errors='replace').split('\r\n')
+    if not lines or not lines[0].upper().startswith('HTTP/1.1 200'):
+        return None
+    headers = {}
+    for line in lines[1:]:
+        name, sep, value = line.partition(':')
+        if sep:
+            headers[name.strip().lower()] = value.strip()
+
+    device_type, confidence = 'UPnP Device', 40
+    urn = f"{headers.get('st', '')} {headers.get('usn', '')}".lower()
+    for key, (mapped, score) in SSDP_DEVICE_TYPES.items():
+        if f'device:{key}' in urn:
+            device_type, confidence = mapped, score
+            break
+    return {
+        'service': 'UPnP (SSDP)',
+        'device_type': device_type,
+        'manufacturer': 'Unknown',
+        'model': 'Unknown',
+        'confidence': confidence,
+        'server_header': headers.get('server', ''),
+        'location': headers.get('location', ''),
+        'st': headers.get('st', '')
+    }
+
+
+def read_dns_name(data, offset):
+    """Decode a possibly compressed DNS name; return (name, offset after it)"""
+    labels = []
+    end = None
+    for _ in range(64):  # bound pointer chains
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = offset + 2
+            offset = ((length & 0x3F) << 8) | data[offset + 1]
+            continue
+        offset += 1
+        if length == 0:
+            return '.'.join(labels), end if end is not None else offset
+        labels.append(data[offset:offset + length].decode('utf-8', errors='replace'))
+        offset += length
+    raise ValueError('DNS name compression loop')
+
+
+def parse_dns_records(data):
+    """All PTR/SRV/TXT/A resource records of a DNS message as (name, type, value)"""
+    _, _, questions, answers, authority, additional = struct.unpack('!6H', data[:12])
+    offset = 12
+    for _ in range(questions):
+        _, offset = read_dns_name(data, offset)
+        offset += 4
+
+    records = []
+    for _ in range(answers + authority + additional):
+        name, offset = read_dns_name(data, offset)
+        rtype, _, _, length = struct.unpack('!HHIH', data[offset:offset + 10])
+        offset += 10
+        rdata = offset
+        offset += length
+        if rtype == DNS_PTR:
+            records.append((name, rtype, read_dns_name(data, rdata)[0]))
+        elif rtype == DNS_SRV:
+            port = struct.unpack('!H', data[rdata + 4:rdata + 6])[0]
+            records.append((name, rtype, (read_dns_name(data, rdata + 6)[0], port)))
+        elif rtype == DNS_TXT:
+            strings, cursor = [], rdata
+            while cursor < offset:
+                size = data[cursor]
+                strings.append(data[cursor + 1:cursor + 1 + size].decode('utf-8', errors='replace'))
+                cursor += 1 + size
+            records.append((name, rtype, strings))
+        elif rtype == DNS_A and length == 4:
+            records.append((name, rtype, socket.inet_ntoa(data[rdata:offset])))
+    return records
+
+
+def parse_mdns_reply(data):
+    """mDNS answer -> service info for the best service type announced"""
+    try:
+        records = parse_dns_records(data)
+    except (IndexError, ValueError, struct.error):
+        return None
+
+    best = None
+    instances = []
+    for name, rtype, value in records:
+        if rtype == DNS_PTR and name.lower() in MDNS_SERVICES:
+            instances.append(value)
+            mapped = MDNS_SERVICES[name.lower()]
+            if best is None or mapped[2] > best[2]:
+                best = mapped
+    if best is None:
+        return None
+
+    txt = {}
+    for name, rtype, value in records:
+        if rtype == DNS_TXT:
+            for item in value:
+                key, _, val = item.partition('=')
+                txt.setdefault(key.lower(), val)
+
+    device_type, manufacturer, confidence = best
+    return {
+        'service': 'mDNS',
+        'device_type': device_type,
+        'manufacturer': manufacturer,
+        'model': txt.get('model', 'Unknown'),
+        'confidence': confidence,
+        'instances': instances,
+        'txt': txt
+    }
+
+
+PROTOCOLS = {
+    'wsd': (WSD_ADDR, build_wsd_probe, parse_wsd_reply, 1),
+    'ssdp': (SSDP_ADDR, build_ssdp_msearch, parse_ssdp_reply, 2),
+    'mdns': (MDNS_ADDR, build_mdns_query, parse_mdns_reply, 255),
+}
+
+
+class _ReplyProtocol(asyncio.DatagramProtocol):
+    def __init__(self, parse, on_reply):
+        self.parse = parse
+        self.on_reply = on_reply
+
+    def datagram_received(self, data, addr):
+        try:
+            info = self.parse(data)
+        except Exception:
+            info = None
+        if info:
+            self.on_reply(addr[0], info)
+
+
+async def discover(on_reply, window=MULTICAST_WINDOW, interface_ip=None, targets=None):
+    """
+    Send every probe once and feed parsed replies to `on_reply(ip, info)`
+
+    `targets` overrides the destination per protocol ('wsd', 'ssdp',
+    'mdns'), e.g. to point at tools/discovery_responder.py on loopback.
+    Each probe goes out from its own ephemeral port so replies come back
+    unicast; mDNS uses the legacy-unicast form for the same reason.
+    """
+    loop = asyncio.get_running_loop()
+    transports = []
+    try:
+        for name, (address, build, parse, ttl) in PROTOCOLS.items():
+            destination = (targets or {}).get(name, address)
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+            try:
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
+                if interface_ip:
+                    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF,
+                                    socket.inet_aton(interface_ip))
+                sock.bind(('', 0))
+                sock.setblocking(False)
+                transport, _ = await loop.create_datagram_endpoint(
+                    lambda parse=parse: _ReplyProtocol(parse, on_reply), sock=sock)
+            except OSError:
+                sock.close()
+                continue
+            transports.append(transport)
+            transport.sendto(build(), destination)
+        await asyncio.sleep(window)
+    finally:
+        for transport in transports:
+            transport.close()
+
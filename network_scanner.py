@@ -1,39 +1,795 @@
+import asyncio
+import bisect
+import errno
+import heapq
 import socket
-import subprocess
+import struct
 import threading
 import time
-import platform
-import requests
-from urllib.parse import urlparse
-import urllib3
-try:
-    from scapy.all import *
-    SCAPY_AVAILABLE = True
-except ImportError:
-    SCAPY_AVAILABLE = False
-    print("Warning: scapy not available. Packet capture will be disabled.")
-import netifaces
 import ipaddress
+import itertools
 import json
+import os
+import re
+from array import array
 from collections import defaultdict
 
-# Disable SSL warnings for local network scanning
-urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+import packet_ring
+from flow_table import FlowTable
+from host_table import DeviceRecord, HostTable
+from rtp_streams import RtpTracker
+from scan_metrics import ScanMetrics
+
+# Heavy third-party dependencies (scapy, requests, netifaces) are imported
+# lazily by the features that need them, so importing this module or running
+# host discovery stays fast. See benchmarks/bench_import.py.
+_scapy = None
+_requests = None
+_http_signatures = None
+_rtsp_signatures = None
+_oui_index = None
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+HTTP_SIGNATURES_PATH = os.path.join(DATA_DIR, 'http_signatures.json')
+RTSP_SIGNATURES_PATH = os.path.join(DATA_DIR, 'rtsp_signatures.json')
+SCAN_CACHE_PATH = os.path.join(DATA_DIR, 'scan_cache.db')  # override with $SCANNER_CACHE
+OUI_PATH = os.path.join(DATA_DIR, 'oui.tsv')
+OUI_CONFIDENCE = 70  # maker known from the MAC and device type agrees with the ports
+IEEE_OUI_RE = re.compile(r'^\s*([0-9A-Fa-f]{2})-([0-9A-Fa-f]{2})-([0-9A-Fa-f]{2})\s+\(hex\)\s+(.+?)\s*$')
+SIGNATURE_FORMAT_VERSION = 1
+TITLE_RE = re.compile(r'<title>(.*?)</title>', re.IGNORECASE)
+SDP_RESOLUTION_RE = re.compile(
+    r'a=(?:framesize:\d+\s+(\d+)-(\d+)|x-dimensions:\s*(\d+),\s*(\d+)|cliprect:0,0,(\d+),(\d+))')
+RTSP_PROBE_MAX_BYTES = 16 * 1024
+
+
+def load_scapy():
+    """Import the scapy pieces used for packet capture on first use.
+
+    Returns a namespace with ``conf``, ``sniff``, ``IP``, ``TCP`` and ``UDP``, or None
+    when scapy is not installed.
+    """
+    global _scapy
+    if _scapy is None:
+        try:
+            from types import SimpleNamespace
+            from scapy.all import conf, sniff, IP, TCP, UDP
+            _scapy = SimpleNamespace(conf=conf, sniff=sniff, IP=IP, TCP=TCP, UDP=UDP)
+        except ImportError:
+            _scapy = False
+    return _scapy or None
+
+
+def load_requests():
+    """Import requests on first HTTP probe and silence local TLS warnings"""
+    global _requests
+    if _requests is None:
+        import requests
+        import urllib3
+        # Disable SSL warnings for local network scanning
+        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+        _requests = requests
+    return _requests
+
+
+def load_http_signatures():
+    """Compile the bundled HTTP signature file on first use"""
+    global _http_signatures
+    if _http_signatures is None:
+        _http_signatures = SignatureMatcher.load(HTTP_SIGNATURES_PATH)
+    return _http_signatures
+
+
+def load_rtsp_signatures():
+    """Compile the bundled RTSP signature file on first use"""
+    global _rtsp_signatures
+    if _rtsp_signatures is None:
+        _rtsp_signatures = SignatureMatcher.load(RTSP_SIGNATURES_PATH)
+    return _rtsp_signatures
+
+
+def load_oui_index():
+    """Load the bundled MAC OUI index on first use"""
+    global _oui_index
+    if _oui_index is None:
+        try:
+            _oui_index = OuiIndex.load(OUI_PATH)
+        except OSError:
+            _oui_index = OuiIndex([])
+    return _oui_index
+
+
+class OuiIndex:
+    """
+    MAC OUI -> (manufacturer, device type hint) lookup
+
+    OUIs are kept as 24-bit integers in a sorted array('I') with a parallel
+    array('H') of indices into a small table of distinct vendors, about six
+    bytes per entry even for the full IEEE registry. Lookups are a bisect.
+    """
+
+    def __init__(self, entries):
+        vendor_ids = {}
+        self.vendors = []
+        rows = []
+        for oui, manufacturer, device_type in entries:
+            key = (manufacturer, device_type)
+            if key not in vendor_ids:
+                vendor_ids[key] = len(self.vendors)
+                self.vendors.append(key)
+            rows.append((oui, vendor_ids[key]))
+        rows.sort()
+        self.prefixes = array('I', (oui for oui, _ in rows))
+        self.vendor_ids = array('H', (vendor for _, vendor in rows))
+
+    @classmethod
+    def load(cls, path):
+        """Read data/oui.tsv style lines, or IEEE oui.txt '(hex)' lines"""
+        entries = []
+        with open(path, encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if line.startswith('#') or not line.strip():
+                    continue
+                match = IEEE_OUI_RE.match(line)
+                if match:
+                    entries.append((int(''.join(match.group(1, 2, 3)), 16), match.group(4), ''))
+                    continue
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) >= 2 and len(fields[0]) == 6:
+                    try:
+                        oui = int(fields[0], 16)
+                    except ValueError:
+                        continue
+                    entries.append((oui, fields[1], fields[2] if len(fields) > 2 else ''))
+        return cls(entries)
+
+    def __len__(self):
+        return len(self.prefixes)
+
+    def lookup(self, mac):
+        """Return (manufacturer, device type hint) for a MAC, or None"""
+        digits = re.sub(r'[^0-9A-Fa-f]', '', mac or '')
+        if len(digits) < 6:
+            return None
+        oui = int(digits[:6], 16)
+        if oui & 0x020000:  # locally administered, not a registered OUI
+            return None
+        index = bisect.bisect_left(self.prefixes, oui)
+        if index < len(self.prefixes) and self.prefixes[index] == oui:
+            return self.vendors[self.vendor_ids[index]]
+        return None
+
+
+def trie_regex(patterns):
+    """
+    Regex source matching any of `patterns`, factored as a prefix trie
+
+    Alternatives sharing a prefix are merged, so the engine tests each
+    character once per position no matter how many patterns there are, and
+    the greedy optional groups make it prefer the longest pattern.
+    """
+    trie = {}
+    for pattern in patterns:
+        node = trie
+        for char in pattern:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def emit(node):
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{body})?' if '' in node else body
+
+    return emit(trie)
+
+
+class SignatureMatcher:
+    """
+    HTTP fingerprint set compiled into a single multi-pattern matcher
+
+    All vendor patterns go into one trie-shaped regex run as a lookahead at
+    every position, which finds the longest pattern starting there; shorter
+    patterns starting at the same position are its prefixes and are added
+    from a precomputed table. One pass over the page (and one per relevant
+    header) therefore scores every vendor at once.
+    """
+
+    def __init__(self, spec):
+        if spec.get('version') != SIGNATURE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported signature file version: {spec.get('version')}")
+        self.version = spec['version']
+        self.content_score = spec['content_score']
+        self.header_score = spec['header_score']
+        self.threshold = spec['threshold']
+        self.vendors = []
+        for vendor in spec['vendors']:
+            vendor = dict(vendor)
+            vendor['headers'] = frozenset(vendor['headers'])
+            if vendor.get('model_regex'):
+                vendor['model_regex'] = re.compile(vendor['model_regex'])
+            self.vendors.append(vendor)
+
+        patterns = sorted({p for vendor in self.vendors for p in vendor['patterns']})
+        self.regex = re.compile(f'(?=({trie_regex(patterns)}))')
+        self.prefixes = {p: [q for q in patterns if p.startswith(q)] for p in patterns}
+        self.vendors_by_pattern = defaultdict(list)
+        for index, vendor in enumerate(self.vendors):
+            for pattern in set(vendor['patterns']):
+                self.vendors_by_pattern[pattern].append(index)
+        self.header_names = sorted({h for vendor in self.vendors for h in vendor['headers']})
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def vendor_for(self, text):
+        """First vendor, in file order, with any pattern in `text`, or None"""
+        indices = [i for pattern in self.find(text.lower()) for i in self.vendors_by_pattern[pattern]]
+        return self.vendors[min(indices)] if indices else None
+
+    def find(self, text):
+        """Set of all patterns occurring anywhere in `text` (lowercase)"""
+        longest = {m.group(1) for m in self.regex.finditer(text)}
+        return {p for match in longest for p in self.prefixes[match]}
+
+    def match(self, content, headers):
+        """
+        Score every vendor against a lowercased page and its headers
+
+        Returns (vendor, confidence, model) for the first vendor, in file
+        order, scoring above the threshold, or None.
+        """
+        scores = [0] * len(self.vendors)
+        content_hits = [False] * len(self.vendors)
+        for pattern in self.find(content):
+            for index in self.vendors_by_pattern[pattern]:
+                scores[index] += self.content_score
+                content_hits[index] = True
+
+        for header in self.header_names:
+            value = headers.get(header)
+            if not value:
+                continue
+            for pattern in self.find(value.lower()):
+                for index in self.vendors_by_pattern[pattern]:
+                    if header in self.vendors[index]['headers']:
+                        scores[index] += self.header_score
+
+        for index, vendor in enumerate(self.vendors):
+            if scores[index] > self.threshold:
+                model = 'Unknown'
+                if content_hits[index] and vendor.get('model_regex'):
+                    model_match = vendor['model_regex'].search(content)
+                    if model_match:
+                        model = model_match.group().upper()
+                return vendor, scores[index], model
+        return None
+
+
+class RtspResponseReader:
+    """
+    Reads pipelined RTSP responses off one socket
+
+    Responses are framed by the blank line after the headers plus
+    Content-Length, so several can be read back to back from the same
+    buffer. Reading stops at `max_bytes` in total.
+    """
+
+    def __init__(self, sock, max_bytes=RTSP_PROBE_MAX_BYTES):
+        self.sock = sock
+        self.max_bytes = max_bytes
+        self.buffer = b''
+        self.received = 0
+
+    def _fill(self):
+        if self.received >= self.max_bytes:
+            return False
+        chunk = self.sock.recv(min(4096, self.max_bytes - self.received))
+        if not chunk:
+            return False
+        self.received += len(chunk)
+        self.buffer += chunk
+        return True
+
+    def read_response(self):
+        """Return (status, {lowercase header: value}, body) or None"""
+        while b'\r\n\r\n' not in self.buffer:
+            if not self._fill():
+                return None
+        head, self.buffer = self.buffer.split(b'\r\n\r\n', 1)
+        lines = head.decode('latin-1').split('\r\n')
+        parts = lines[0].split(' ', 2)
+        if len(parts) < 2 or not parts[0].startswith('RTSP/'):
+            return None
+        try:
+            status = int(parts[1])
+        except ValueError:
+            return None
+
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(':')
+            if sep:
+                name = name.strip().lower()
+                headers[name] = f"{headers[name]}, {value.strip()}" if name in headers else value.strip()
+
+        length = int(headers.get('content-length', '0') or 0)
+        while len(self.buffer) < length:
+            if not self._fill():
+                break
+        body, self.buffer = self.buffer[:length], self.buffer[length:]
+        return status, headers, body
+
+
+def parse_sdp(body):
+    """
+    Summarise an SDP description: tracks, codecs and video resolution
+
+    Resolution comes from a=framesize (Hikvision, Dahua, many ONVIF
+    cameras), a=x-dimensions or a=cliprect, whichever is present.
+    """
+    tracks = []
+    codecs = []
+    resolution = ''
+    session_name = ''
+    for line in body.decode('utf-8', errors='replace').splitlines():
+        line = line.strip()
+        if line.startswith('s='):
+            session_name = line[2:]
+        elif line.startswith('m='):
+            tracks.append(line[2:].split(' ', 1)[0])
+        elif line.startswith('a=rtpmap:'):
+            fields = line[9:].split(' ', 1)
+            if len(fields) == 2:
+                codec = fields[1].split('/', 1)[0]
+                if codec not in codecs:
+                    codecs.append(codec)
+        elif not resolution:
+            match = SDP_RESOLUTION_RE.match(line)
+            if match:
+                width, height = [g for g in match.groups() if g is not None]
+                resolution = f"{width}x{height}"
+    return {
+        'session_name': session_name,
+        'tracks': len(tracks),
+        'media': tracks,
+        'codecs': codecs,
+        'resolution': resolution
+    }
+
+
+# Host discovery tuning
+DISCOVERY_TIMEOUT = 0.75       # seconds to wait for any reply from a host
+DISCOVERY_CONCURRENCY = 512    # hosts probed at once
+DISCOVERY_PORTS = (80, 554, 443)  # TCP fallback when ICMP is unavailable or blocked
+MAX_SWEEP_ADDRESSES = 65536    # largest sweep allowed (a /16)
+
+# File descriptors: probe sockets are sized to the RLIMIT_NOFILE soft limit
+FD_RESERVE = 64                # kept free for the cache, capture, logs and the API server
+FD_DEFAULT_BUDGET = 448        # probe sockets allowed where the limit cannot be read
+FD_WAIT = 0.05                 # back-off while the process is out of descriptors, doubling
+FD_WAIT_MAX = 5.0              # give up on a socket after waiting this long in total
+
+# Port scan tuning
+PORT_SCAN_TIMEOUT = 1.0        # seconds before a silent port counts as filtered
+PORT_SCAN_CONCURRENCY = 2048   # connects in flight across all hosts
+PORT_SCAN_PER_HOST = 16        # connects in flight against any one host
+
+# Device identification
+IDENTIFY_HTTP_PORTS = (80, 443, 8080, 8081)
+IDENTIFY_WORKERS = 64          # probes in flight across all devices
+IDENTIFY_POOL_HOSTS = 256      # per-host connection pools kept by the session
+PIPELINE_HOST_WORKERS = 256    # hosts scan_pipeline port-scans and identifies at once
+IDENTIFY_DEADLINE = 8.0        # seconds allowed to identify one device
+HTTP_PROBE_MAX_BYTES = 64 * 1024  # enough for <title>, vendor markers and headers
+HTTP_PROBE_CHUNK = 8192
+HTTP_HEADER_PROBE_BYTES = 2048   # stage 2 of the classifier: headers plus a page head
+IDENTIFY_CONFIDENCE_THRESHOLD = 70  # stop probing a device once this sure of its maker
+STREAMING_CONTENT_TYPES = ('multipart/x-mixed-replace', 'video/', 'audio/')
+
+# Adaptive timeouts (RFC 6298 style), derived from RTTs measured per host
+RTT_TIMEOUT_MIN = 0.05         # never wait less than this for any probe
+RTT_TIMEOUT_MAX = 3.0          # never wait more than this for any probe
+RTT_READ_TIMEOUT_MIN = 1.0     # floor for reads, which include device think time
+
+# Multi-network scans: address space split into shards scanned by worker processes
+SHARD_PREFIX = 24              # networks larger than this are split into subnets this size
+SHARD_WORKERS = os.cpu_count() or 1  # shard processes run at once
+SHARD_RATE_LIMIT = 1000        # sweep probes and port connects per second, per parallel shard
+
+NEIGHBOR_TABLE_PATH = '/proc/net/arp'
+ATF_COM = 0x02                 # neighbor entry is complete (has a MAC)
+
+# Packet capture: only these reach user space, the kernel drops the rest
+CAPTURE_TCP_PORTS = (80, 554, 1935, 8080, 8554)   # HTTP streams, RTSP, RTMP
+CAPTURE_UDP_PORT_RANGES = ((1234, 1234), (5004, 5005), (6970, 6999))  # MPEG-TS, RTP/RTCP
+CAPTURE_FILTER_MAX_HOSTS = 64  # hosts named in the filter; each costs 4 instructions per UDP packet
+INTERFACE_STATS_PATH = '/sys/class/net/{interface}/statistics/{counter}'
+SOL_PACKET = 263
+PACKET_STATISTICS = 6
+
+
+def ip_string(address):
+    """32-bit integer -> dotted quad"""
+    return socket.inet_ntoa(struct.pack('!I', address))
+
+
+def ip_number(address):
+    """Dotted quad -> 32-bit integer"""
+    return struct.unpack('!I', socket.inet_aton(address))[0]
+
+
+def build_capture_filter(tcp_ports=CAPTURE_TCP_PORTS, udp_port_ranges=CAPTURE_UDP_PORT_RANGES,
+                         hosts=()):
+    """
+    BPF expression (pcap syntax) that keeps only candidate stream packets
+
+    TCP on the given ports, UDP in the given port ranges, and any UDP to
+    or from `hosts` - cameras negotiate RTP ports over RTSP, so a known
+    streaming host's UDP traffic is kept whatever the port. Frames with
+    one 802.1Q tag match too, as with packet_ring.compile_filter.
+    """
+    clauses = []
+    if tcp_ports:
+        clauses.append('tcp and (' + ' or '.join(f'port {port}' for port in sorted(set(tcp_ports))) + ')')
+    ranges = [f'port {low}' if low == high else f'portrange {low}-{high}'
+              for low, high in sorted(set(udp_port_ranges))]
+    if ranges:
+        clauses.append('udp and (' + ' or '.join(ranges) + ')')
+    hosts = sorted(set(hosts))[:CAPTURE_FILTER_MAX_HOSTS]
+    if hosts:
+        clauses.append('udp and (' + ' or '.join(f'host {host}' for host in hosts) + ')')
+    expression = 'ip and (' + ' or '.join(f'({clause})' for clause in clauses) + ')' if clauses else 'ip'
+    return f'({expression}) or (vlan and {expression})'
+
+
+def interface_packet_count(interface):
+    """Packets received plus sent on `interface` so far, or None if unknown"""
+    total = 0
+    for counter in ('rx_packets', 'tx_packets'):
+        try:
+            with open(INTERFACE_STATS_PATH.format(interface=interface, counter=counter)) as f:
+                total += int(f.read())
+        except (OSError, ValueError):
+            return None
+    return total
+
+
+def packet_socket_stats(sock):
+    """(delivered, dropped) since the last call, from a Linux AF_PACKET socket, or None"""
+    try:
+        return struct.unpack('II', sock.getsockopt(SOL_PACKET, PACKET_STATISTICS, 8))
+    except (AttributeError, OSError, struct.error):
+        return None
+
+
+class RttEstimator:
+    """
+    Smoothed RTT and RTT variance per host
+
+    Follows the TCP retransmission timer (RFC 6298): every sample updates
+    SRTT and RTTVAR, and timeout() returns SRTT + 4 * RTTVAR clamped to
+    [RTT_TIMEOUT_MIN, RTT_TIMEOUT_MAX]. Hosts without samples get the
+    caller's fixed default.
+    """
+
+    def __init__(self, minimum=RTT_TIMEOUT_MIN, maximum=RTT_TIMEOUT_MAX):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.hosts = {}  # ip -> [srtt, rttvar, samples]
+
+    def observe(self, ip, rtt):
+        if rtt is None:
+            return
+        state = self.hosts.get(ip)
+        if state is None:
+            self.hosts[ip] = [rtt, rtt / 2, 1]
+            return
+        srtt, rttvar, samples = state
+        rttvar = 0.75 * rttvar + 0.25 * abs(srtt - rtt)
+        srtt = 0.875 * srtt + 0.125 * rtt
+        self.hosts[ip] = [srtt, rttvar, samples + 1]
+
+    def timeout(self, ip, default, minimum=None):
+        """Timeout for the next probe of `ip`, or `default` if never measured"""
+        state = self.hosts.get(ip)
+        if state is None:
+            return default
+        srtt, rttvar, _ = state
+        lower = max(self.minimum, minimum or 0)
+        return min(max(srtt + 4 * rttvar, lower), max(self.maximum, lower))
+
+    @staticmethod
+    def describe(ip, state):
+        """(ip, report entry) for one host's RTT state"""
+        srtt, rttvar, samples = state
+        return ip, {'srtt_ms': round(srtt * 1000, 3), 'rttvar_ms': round(rttvar * 1000, 3),
+                    'samples': samples}
+
+    def summary(self):
+        return dict(self.describe(ip, state) for ip, state in self.hosts.items())
+
+
+class RateLimiter:
+    """
+    Paces asyncio probes to `rate` per second
+
+    Each wait() takes the next free slot, `1 / rate` after the previous
+    one; up to `burst` slots left unused in the past may be caught up.
+    Waits end early once `cancelled` (an Event) is set.
+    """
+
+    def __init__(self, rate, burst=16, cancelled=None):
+        self.interval = 1.0 / rate
+        self.burst = burst * self.interval
+        self.cancelled = cancelled
+        self.next_slot = 0.0
+
+    async def wait(self):
+        now = time.monotonic()
+        slot = max(now - self.burst, self.next_slot)
+        self.next_slot = slot + self.interval
+        while slot > now and not (self.cancelled and self.cancelled.is_set()):
+            await asyncio.sleep(min(slot - now, 0.1))
+            now = time.monotonic()
+
+
+def icmp_checksum(data):
+    """RFC 1071 internet checksum"""
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+
+class IcmpPinger:
+    """
+    Unprivileged ICMP echo over a SOCK_DGRAM ping socket
+
+    A single socket serves a whole sweep; replies are matched back to their
+    request by (address, sequence). On Linux this needs the caller's group in
+    net.ipv4.ping_group_range; open() returns None when that is not allowed.
+    """
+
+    def __init__(self, sock, loop):
+        self.sock = sock
+        self.loop = loop
+        self.sequence = 0
+        self.waiters = {}
+        loop.add_reader(sock.fileno(), self._on_readable)
+
+    @classmethod
+    def open(cls, loop):
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+        except (OSError, AttributeError):
+            return None
+        sock.setblocking(False)
+        return cls(sock, loop)
+
+    def close(self):
+        self.loop.remove_reader(self.sock.fileno())
+        self.sock.close()
+        for waiter in self.waiters.values():
+            if not waiter.done():
+                waiter.cancel()
+        self.waiters.clear()
+
+    def _on_readable(self):
+        while True:
+            try:
+                data, addr = self.sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            # macOS delivers the IP header too, Linux does not
+            if data and data[0] >> 4 == 4:
+                data = data[(data[0] & 0x0f) * 4:]
+            if len(data) < 8 or data[0] != 0:  # type 0 = echo reply
+                continue
+            sequence = struct.unpack('!H', data[6:8])[0]
+            waiter = self.waiters.pop((addr[0], sequence), None)
+            if waiter and not waiter.done():
+                waiter.set_result(time.perf_counter())
+
+    async def ping(self, ip, timeout):
+        """Send one echo request; return the RTT in seconds or None"""
+        self.sequence = (self.sequence + 1) & 0xffff
+        sequence = self.sequence
+        header = struct.pack('!BBHHH', 8, 0, 0, 0, sequence)
+        payload = b'NetworkScanner'
+        packet = struct.pack('!BBHHH', 8, 0, icmp_checksum(header + payload), 0, sequence) + payload
+
+        waiter = self.loop.create_future()
+        self.waiters[(ip, sequence)] = waiter
+        sent = time.perf_counter()
+        try:
+            self.sock.sendto(packet, (ip, 0))
+            received = await asyncio.wait_for(waiter, timeout)
+            return received - sent
+        except (OSError, asyncio.TimeoutError):
+            return None
+        finally:
+            self.waiters.pop((ip, sequence), None)
+
+
+def descriptor_budget():
+    """
+    Sockets this process can still open for probes
+
+    The RLIMIT_NOFILE soft limit less the descriptors already open and
+    FD_RESERVE; concurrency limits are capped so their sockets fit.
+    """
+    try:
+        import resource
+        soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    except (ImportError, OSError, ValueError):
+        return FD_DEFAULT_BUDGET
+    if soft == resource.RLIM_INFINITY:
+        return 1 << 20
+    try:
+        in_use = len(os.listdir('/proc/self/fd'))
+    except OSError:
+        in_use = 0
+    return max(1, soft - in_use - FD_RESERVE)
+
+
+async def open_socket():
+    """
+    Non-blocking TCP socket, waiting while the process is out of descriptors
+
+    EMFILE/ENFILE are back-pressure: other probes close their sockets
+    within a timeout, so this retries with a growing back-off for up to
+    FD_WAIT_MAX seconds before giving up with the OSError.
+    """
+    delay, waited = FD_WAIT, 0.0
+    while True:
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        except OSError as e:
+            if e.errno not in (errno.EMFILE, errno.ENFILE) or waited >= FD_WAIT_MAX:
+                raise
+            await asyncio.sleep(delay)
+            waited += delay
+            delay = min(delay * 2, 1.0)
+            continue
+        sock.setblocking(False)
+        return sock
+
+
+async def tcp_probe(ip, port, timeout):
+    """
+    Probe liveness with a TCP connect; return the RTT in seconds or None
+
+    A refused connection (RST) proves the host is up just as well as an
+    accepted one.
+    """
+    loop = asyncio.get_running_loop()
+    sock = None
+    try:
+        sock = await open_socket()
+        sent = time.perf_counter()
+        await asyncio.wait_for(loop.sock_connect(sock, (ip, port)), timeout)
+        return time.perf_counter() - sent
+    except ConnectionRefusedError:
+        return time.perf_counter() - sent
+    except (OSError, asyncio.TimeoutError):
+        return None
+    finally:
+        if sock is not None:
+            sock.close()
+
+
+async def connect_port(ip, port, timeout):
+    """
+    Non-blocking TCP connect; return (is_open, rtt)
+
+    rtt is measured whenever the host answered (handshake or RST) and is
+    None for filtered ports.
+    """
+    loop = asyncio.get_running_loop()
+    sock = None
+    try:
+        sock = await open_socket()
+        sent = time.perf_counter()
+        await asyncio.wait_for(loop.sock_connect(sock, (ip, port)), timeout)
+        return True, time.perf_counter() - sent
+    except ConnectionRefusedError:
+        return False, time.perf_counter() - sent
+    except (OSError, asyncio.TimeoutError):
+        return False, None
+    finally:
+        if sock is not None:
+            sock.close()
+
+
+async def probe_host(ip, timeout, pinger=None, ports=DISCOVERY_PORTS):
+    """
+    Race an ICMP echo against TCP connects; return the first RTT or None
+
+    Dead hosts therefore cost a single timeout rather than one per method.
+    """
+    probes = [asyncio.ensure_future(tcp_probe(ip, port, timeout)) for port in ports]
+    if pinger is not None:
+        probes.append(asyncio.ensure_future(pinger.ping(ip, timeout)))
+    try:
+        for finished in asyncio.as_completed(probes):
+            rtt = await finished
+            if rtt is not None:
+                return rtt
+        return None
+    finally:
+        for probe in probes:
+            probe.cancel()
+
 
 class NetworkStreamScanner:
-    def __init__(self):
-        self.active_hosts = []
+    def __init__(self, cache_path=None):
         self.streaming_ports = [80, 443, 554, 1935, 8080, 8554, 5004, 5005, 1234]  # Common streaming ports
-        self.detected_streams = []
-        self.traffic_data = defaultdict(list)
+        self.active_hosts = HostTable(self.streaming_ports)  # liveness bitmap and open-port masks
+        self.flows = FlowTable(on_classified=self._flow_classified)  # capture traffic per 5-tuple
+        self.rtp = RtpTracker(on_confirmed=self._rtp_confirmed)  # RTP receiver stats per SSRC
+        self.capture_stats = {}
+        self.flow_statistics = []  # per-flow rates and inter-arrival stats from analyze_capture_file
         self.device_info = {}  # Store device identification results
-        
+        self.streaming_hosts = {}  # ip -> latest entry from scan_pipeline / scan_streaming_ports
+        self.mac_addresses = {}  # ip -> MAC learned from the neighbor table
+        self.interface = None  # interface chosen by get_local_network
+        self.local_ip = None  # our address on that interface
+        self.discovered = {}  # ip -> service infos from multicast discovery
+        self.rtt = RttEstimator()  # per-host RTTs drive probe timeouts
+        self.metrics = ScanMetrics()  # per-phase probe counts and duration histograms
+        self.pacer = None  # RateLimiter for sweep probes and port connects, if any
+        self.networks = []  # networks scanned by scan_networks
+        self._http = None  # pooled requests session, see http_session()
+        self.http_max_bytes = HTTP_PROBE_MAX_BYTES  # body budget per HTTP probe
+        self.classifier_stats = {stage: {'entered': 0, 'identified': 0, 'requests': 0}
+                                 for stage in ('ports', 'headers', 'full')}
+        self.liveness_changed = set()  # hosts that came up or went down since the cached scan
+        self.cache_scope = None  # cache_network() of the network being scanned
+        self.cancelled = threading.Event()  # set by cancel() to abandon a scan in progress
+
+        # Optional on-disk cache: restarts and rescans skip fresh results
+        self.cache = None
+        if cache_path:
+            from scan_cache import ScanCache
+            self.cache = ScanCache(cache_path)
+            self.rtt.hosts.update(self.cache.rtt_state())
+            self.mac_addresses.update(self.cache.macs())
+
+    def cache_network(self, network):
+        """
+        Key of `network` in the scan cache: the CIDR, qualified by the
+        interface when known, so the same private range behind two
+        interfaces or VLANs keeps separate cached ports and identities
+        """
+        return f'{network}%{self.interface}' if self.interface else str(network)
+
+    def cancel(self):
+        """
+        Abandon the scan in progress from another thread
+
+        Sweeps and port scans stop taking new hosts and identification
+        probes that have not started yet are dropped; each phase then
+        returns what it has so far.
+        """
+        self.cancelled.set()
+
     def get_local_network(self):
         """Get the local network range"""
         try:
+            import netifaces
+
             # Get default gateway interface
             gateways = netifaces.gateways()
             default_interface = gateways['default'][netifaces.AF_INET][1]
+            self.interface = default_interface
             
             # Get network info for the interface
             addrs = netifaces.ifaddresses(default_interface)
@@ -41,6 +797,7 @@ class NetworkStreamScanner:
             
             ip = ipv4_info['addr']
             netmask = ipv4_info['netmask']
+            self.local_ip = ip
             
             # Calculate network range
             network = ipaddress.IPv4Network(f"{ip}/{netmask}", strict=False)
@@ -48,174 +805,424 @@ class NetworkStreamScanner:
         except:
             return "192.168.100.0/24"  # Fallback
     
-    def ping_host(self, ip):
+    def get_local_networks(self, interfaces=None):
+        """
+        [(network, interface, local_ip)] for the IPv4 networks we are on
+
+        Every interface netifaces reports (or only those named in
+        `interfaces`) except loopback, link-local and point-to-point
+        addresses. Without netifaces this is just get_local_network().
+        """
+        networks = []
+        try:
+            import netifaces
+
+            for interface in interfaces or netifaces.interfaces():
+                for info in netifaces.ifaddresses(interface).get(netifaces.AF_INET, []):
+                    if 'addr' not in info or 'netmask' not in info:
+                        continue
+                    network = ipaddress.IPv4Network(f"{info['addr']}/{info['netmask']}", strict=False)
+                    if network.is_loopback or network.is_link_local or network.prefixlen >= 31:
+                        continue
+                    networks.append((str(network), interface, info['addr']))
+        except (ImportError, ValueError, OSError):
+            pass
+        if not networks and not interfaces:
+            network = self.get_local_network()
+            networks.append((network, self.interface, self.local_ip))
+        return networks
+
+    def resolve_targets(self, targets=None):
+        """
+        [(network, interface, local_ip)] for CIDRs and interface names
+
+        A CIDR is paired with the local interface whose network overlaps
+        it, if any; an interface name stands for all of its networks.
+        No targets means every local network.
+        """
+        if not targets:
+            return self.get_local_networks()
+        local = None
+        resolved = []
+        for target in targets:
+            try:
+                network = ipaddress.IPv4Network(target, strict=False)
+            except ValueError:
+                found = self.get_local_networks([target])
+                if not found:
+                    print(f"⚠️  No IPv4 network on interface {target}")
+                resolved.extend(found)
+                continue
+            if local is None:
+                local = self.get_local_networks()
+            interface, local_ip = next(((interface, ip) for cidr, interface, ip in local
+                                        if ipaddress.IPv4Network(cidr).overlaps(network)), (None, None))
+            resolved.append((str(network), interface, local_ip))
+        return resolved
+
+    def read_neighbor_table(self, interface=None):
+        """
+        Read the kernel's IPv4 neighbor (ARP) cache
+
+        Returns {ip: mac} for complete entries, optionally limited to one
+        interface. Only Linux exposes /proc/net/arp; elsewhere this returns
+        an empty dict and discovery falls back to probing.
+        """
+        neighbors = {}
+        try:
+            with open(NEIGHBOR_TABLE_PATH) as f:
+                next(f, None)  # header
+                for line in f:
+                    fields = line.split()
+                    if len(fields) < 6:
+                        continue
+                    ip, _hw_type, flags, mac, _mask, device = fields[:6]
+                    if interface and device != interface:
+                        continue
+                    if not int(flags, 16) & ATF_COM or mac == '00:00:00:00:00:00':
+                        continue
+                    neighbors[ip] = mac.lower()
+        except (OSError, ValueError):
+            pass
+        return neighbors
+
+    def ping_host(self, ip, timeout=None):
         """Check if host is alive"""
+        timeout = timeout or self.rtt.timeout(ip, DISCOVERY_TIMEOUT)
+
+        async def check():
+            pinger = IcmpPinger.open(asyncio.get_running_loop())
+            try:
+                return await probe_host(ip, timeout, pinger)
+            finally:
+                if pinger:
+                    pinger.close()
+
         try:
-            # Use appropriate ping command for OS
-            if platform.system().lower() == 'windows':
-                result = subprocess.run(['ping', '-n', '1', '-w', '1000', ip],
-                                      capture_output=True, text=True, timeout=2)
-            else:
-                result = subprocess.run(['ping', '-c', '1', '-W', '1000', ip],
-                                      capture_output=True, text=True, timeout=2)
-            return result.returncode == 0
-        except:
+            rtt = asyncio.run(check())
+        except Exception:
             return False
-    
+        self.rtt.observe(ip, rtt)
+        return rtt is not None
+
     def scan_port(self, ip, port):
         """Check if port is open"""
         try:
             sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(1)
+            sock.settimeout(self.rtt.timeout(ip, PORT_SCAN_TIMEOUT))
             result = sock.connect_ex((ip, port))
             sock.close()
             return result == 0
         except:
             return False
 
+    def scan_ports(self, hosts, ports=None, on_host=None, timeout=PORT_SCAN_TIMEOUT,
+                   concurrency=PORT_SCAN_CONCURRENCY, per_host=PORT_SCAN_PER_HOST):
+        """
+        Scan many hosts and ports at once; return {host: [open ports]}
+
+        Every connect runs on one asyncio loop, capped globally by
+        `concurrency` and per host by `per_host`, so a scan takes about
+        hosts * ports / concurrency timeouts instead of hosts * ports.
+        `on_host(host, open_ports)` fires as soon as each host is finished.
+        `concurrency` is capped to what descriptor_budget() allows.
+        """
+        ports = list(ports or self.streaming_ports)
+        results = {}
+        concurrency = min(concurrency, descriptor_budget())
+        if hosts:
+            asyncio.run(self._scan_ports(list(hosts), ports, results, on_host,
+                                         timeout, concurrency, per_host))
+        return results
+
+    async def _scan_ports(self, hosts, ports, results, on_host, timeout, concurrency, per_host):
+        connect_slots = asyncio.Semaphore(max(1, concurrency))
+        pending = iter(hosts)
+
+        async def worker():
+            for host in pending:
+                if self.cancelled.is_set():
+                    return
+                results[host] = await self._scan_host_ports(host, ports, connect_slots, per_host, timeout)
+                if on_host:
+                    on_host(host, results[host])
+
+        # Enough host workers to keep every connect slot busy
+        workers = max(1, min(len(hosts), -(-concurrency // max(1, min(per_host, len(ports))))))
+        await asyncio.gather(*(worker() for _ in range(workers)))
+
+    async def _scan_host_ports(self, host, ports, connect_slots, per_host, timeout):
+        """Open ports of one host, sharing `connect_slots` with every other host"""
+        host_slots = asyncio.Semaphore(max(1, per_host))
+
+        async def check(port):
+            async with connect_slots, host_slots:
+                if self.pacer:
+                    await self.pacer.wait()
+                    if self.cancelled.is_set():
+                        return None
+                connect_started = time.perf_counter()
+                is_open, rtt = await connect_port(host, port, self.rtt.timeout(host, timeout))
+                self.metrics.observe('port_scan', time.perf_counter() - connect_started, rtt is not None)
+                self.rtt.observe(host, rtt)
+                if is_open:
+                    print(f"🔓 {host}:{port} - OPEN")
+                    return port
+            return None
+
+        found = await asyncio.gather(*(check(port) for port in ports))
+        return [port for port in found if port is not None]
+
+    def http_session(self):
+        """Shared requests session so identification probes reuse connections"""
+        if self._http is None:
+            requests = load_requests()
+            from requests.adapters import HTTPAdapter
+
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=IDENTIFY_POOL_HOSTS,
+                                  pool_maxsize=IDENTIFY_WORKERS, max_retries=0)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            session.headers['User-Agent'] = 'NetworkScanner/1.0'
+            session.verify = False
+            self._http = session
+        return self._http
+
     def identify_device(self, ip, open_ports):
         """Identify device type and manufacturer"""
-        device_info = {
-            'ip': ip,
-            'type': 'Unknown',
-            'manufacturer': 'Unknown',
-            'model': 'Unknown',
-            'confidence': 0,
-            'services': []
-        }
+        return self.identify_devices({ip: open_ports})[ip]
+
+    def identify_devices(self, open_ports_by_host, on_device=None,
+                         deadline=IDENTIFY_DEADLINE, workers=IDENTIFY_WORKERS):
+        """
+        Identify many devices at once; return {ip: device_info}
+
+        Devices go through a cascade and leave it as soon as they are
+        confidently identified (see is_identified):
+          1. 'ports'   - open ports and MAC, no traffic at all
+          2. 'headers' - a tiny ranged GET per web port, plus RTSP OPTIONS
+          3. 'full'    - a capped full-page GET, only for web ports that
+                         answered stage 2 without settling the device
+        All probes of all hosts share one bounded thread pool. Each device
+        gets `deadline` seconds from its first probe starting; probes
+        starting later are dropped. `on_device(ip, device_info)` fires as
+        each device completes.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        devices = {}
+
+        async def identify(ip, ports, pool):
+            devices[ip] = await self._identify_host(ip, ports, pool, deadline)
+            if on_device:
+                on_device(ip, devices[ip])
+
+        async def identify_all():
+            with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+                await asyncio.gather(*(identify(ip, list(ports), pool)
+                                       for ip, ports in open_ports_by_host.items()))
+
+        asyncio.run(identify_all())
+        return devices
+
+    async def _identify_host(self, ip, open_ports, pool, deadline=IDENTIFY_DEADLINE):
+        """
+        The identify_devices cascade for one host, from a running loop
+
+        Probes run on the caller's thread `pool`, so many hosts can be
+        identified concurrently while each one finishes on its own.
+        """
+        loop = asyncio.get_running_loop()
+        stats = self.classifier_stats
+        started = {}
+        results = {}
+
+        async def run(probes, stage):
+            stats[stage]['entered'] += 1
+            stats[stage]['requests'] += len(probes)
+            answers = await asyncio.gather(
+                *(loop.run_in_executor(pool, self._run_probe, ip, probe, stage, started, deadline)
+                  for probe in probes),
+                return_exceptions=True)
+            for probe, result in zip(probes, answers):
+                if isinstance(result, Exception):
+                    result = None
+                # A failed full fetch keeps what the header stage learned
+                if result is not None or probe not in results:
+                    results[probe] = result
+            return self._merge_identification(ip, open_ports, results)
+
+        stats['ports']['entered'] += 1
+        stage = 'ports'
+        device_info = self._merge_identification(ip, open_ports, {})
+        probes = self._header_probes(open_ports)
+        if probes and not self.is_identified(device_info):
+            stage = 'headers'
+            device_info = await run(probes, stage)
+            retry = self._full_probes(results)
+            if retry and not self.is_identified(device_info):
+                stage = 'full'
+                device_info = await run(retry, stage)
+        if self.is_identified(device_info):
+            stats[stage]['identified'] += 1
+        return device_info
+
+    def _header_probes(self, open_ports):
+        """Stage 2 probes: every web port, plus RTSP"""
+        probes = [('http', port) for port in IDENTIFY_HTTP_PORTS if port in open_ports]
+        if 554 in open_ports:
+            probes.append(('rtsp', 554))
+        return probes
+
+    def _full_probes(self, results):
+        """Stage 3 probes: web ports that answered stage 2 with a page, not a stream"""
+        return [('http', port) for port in IDENTIFY_HTTP_PORTS
+                if results.get(('http', port)) and not results[('http', port)].get('content_type')]
+
+    def is_identified(self, device_info):
+        """Confident enough to stop probing: known maker and high confidence"""
+        return (device_info['manufacturer'] not in ('Unknown', 'Generic')
+                and device_info['confidence'] >= IDENTIFY_CONFIDENCE_THRESHOLD)
+
+    def classifier_summary(self):
+        """Per-stage counters with hit rates, for the report"""
+        summary = {}
+        for stage, counters in self.classifier_stats.items():
+            entered = counters['entered']
+            summary[stage] = dict(counters, hit_rate=round(counters['identified'] / entered, 3) if entered else 0.0)
+        return summary
+
+    def _run_probe(self, ip, probe, stage, started, deadline):
+        """Run one identification probe within what is left of the device deadline"""
+        start = started.setdefault(ip, time.monotonic())
+        budget = start + deadline - time.monotonic()
+        if budget <= 0 or self.cancelled.is_set():
+            return None
+        kind, port = probe
+        probe_started = time.perf_counter()
+        if kind == 'rtsp':
+            result = self.get_rtsp_info(ip, port, time_budget=budget)
+        elif stage == 'headers':
+            result = self.get_http_info(ip, port, time_budget=budget,
+                                        max_bytes=HTTP_HEADER_PROBE_BYTES, byte_range=True)
+        else:
+            result = self.get_http_info(ip, port, time_budget=budget)
+        # Timeouts and errors are counted where the probe catches them
+        self.metrics.observe('rtsp_identify' if kind == 'rtsp' else 'http_identify',
+                             time.perf_counter() - probe_started, result is not None, timed_out=False)
+        return result
+
+    def _merge_identification(self, ip, open_ports, results):
+        """Combine probe results into device_info, HTTP first, then RTSP, then ports"""
+        device_info = DeviceRecord(ip, mac=self.mac_addresses.get(ip, ''))
 
         # Check HTTP services for device identification
-        for port in [80, 443, 8080, 8081]:
-            if port in open_ports:
-                http_info = self.get_http_info(ip, port)
-                if http_info:
-                    device_info['services'].append(http_info)
-                    if http_info['device_type'] != 'Unknown':
-                        device_info['type'] = http_info['device_type']
-                        device_info['manufacturer'] = http_info['manufacturer']
-                        device_info['model'] = http_info['model']
-                        device_info['confidence'] = http_info['confidence']
+        for port in IDENTIFY_HTTP_PORTS:
+            http_info = results.get(('http', port))
+            if http_info:
+                device_info['services'].append(http_info)
+                if http_info['device_type'] != 'Unknown':
+                    device_info['type'] = http_info['device_type']
+                    device_info['manufacturer'] = http_info['manufacturer']
+                    device_info['model'] = http_info['model']
+                    device_info['confidence'] = http_info['confidence']
 
         # Check RTSP service
-        if 554 in open_ports:
-            rtsp_info = self.get_rtsp_info(ip)
-            if rtsp_info:
-                device_info['services'].append(rtsp_info)
-                if device_info['type'] == 'Unknown' and rtsp_info['device_type'] != 'Unknown':
-                    device_info['type'] = rtsp_info['device_type']
-                    device_info['manufacturer'] = rtsp_info['manufacturer']
-                    device_info['confidence'] = rtsp_info['confidence']
+        rtsp_info = results.get(('rtsp', 554))
+        if rtsp_info:
+            device_info['services'].append(rtsp_info)
+            if device_info['type'] == 'Unknown' and rtsp_info['device_type'] != 'Unknown':
+                device_info['type'] = rtsp_info['device_type']
+                device_info['manufacturer'] = rtsp_info['manufacturer']
+                device_info['confidence'] = rtsp_info['confidence']
+
+        # Multicast discovery answers are self-descriptions: trust them most
+        discovered = self.discovered.get(ip, [])
+        device_info['services'].extend(discovered)
+        best = max(discovered, key=lambda service: service['confidence'], default=None)
+        if best and best['confidence'] > device_info['confidence']:
+            device_info['type'] = best['device_type']
+            device_info['confidence'] = best['confidence']
+            if best['manufacturer'] != 'Unknown':
+                device_info['manufacturer'] = best['manufacturer']
+            if best['model'] != 'Unknown':
+                device_info['model'] = best['model']
 
         # Port-based inference
+        port_guess = self.infer_from_ports(open_ports)
         if device_info['type'] == 'Unknown':
-            device_info.update(self.infer_from_ports(open_ports))
+            device_info.update(port_guess)
+
+        # MAC OUI: manufacturer for free, and a type hint when ports agree
+        vendor = load_oui_index().lookup(device_info['mac'])
+        if vendor:
+            manufacturer, type_hint = vendor
+            device_info['oui_vendor'] = manufacturer
+            if device_info['manufacturer'] in ('Unknown', 'Generic'):
+                device_info['manufacturer'] = manufacturer
+                if type_hint and device_info['type'] in ('Unknown', 'Web Service'):
+                    device_info['type'] = type_hint
+                # Only the ports agreeing on their own make the hint trustworthy
+                if type_hint and device_info['type'] == type_hint and port_guess['type'] == type_hint:
+                    device_info['confidence'] = max(device_info['confidence'], OUI_CONFIDENCE)
 
         self.device_info[ip] = device_info
         return device_info
 
-    def get_http_info(self, ip, port):
-        """Get device info from HTTP headers and content"""
+    def get_http_info(self, ip, port, time_budget=None, max_bytes=None, byte_range=False):
+        """
+        Get device info from HTTP headers and content
+
+        With `byte_range` only the first `max_bytes` of the page are asked
+        for (Range header), which is what the classifier's header stage uses.
+        """
         try:
             protocol = 'https' if port == 443 else 'http'
             url = f"{protocol}://{ip}:{port}"
 
-            response = requests.get(url, timeout=5, verify=False,
-                                  headers={'User-Agent': 'NetworkScanner/1.0'})
-
-            headers = response.headers
-            content = response.text.lower()
-
-            # Device signatures - expanded
-            signatures = {
-                'hikvision': {
-                    'patterns': ['hikvision', 'web service', 'ipcam', 'dvr', 'nvr', 'hik-connect'],
-                    'headers': ['server', 'www-authenticate'],
-                    'type': 'IP Camera',
-                    'manufacturer': 'HikVision'
-                },
-                'dahua': {
-                    'patterns': ['dahua', 'dhipcam', 'netsurf', 'webs', 'dss'],
-                    'headers': ['server', 'www-authenticate'],
-                    'type': 'IP Camera',
-                    'manufacturer': 'Dahua'
-                },
-                'axis': {
-                    'patterns': ['axis', 'vapix', 'axis communications'],
-                    'headers': ['server'],
-                    'type': 'IP Camera',
-                    'manufacturer': 'Axis'
-                },
-                'foscam': {
-                    'patterns': ['foscam', 'ipcamera', 'netwave'],
-                    'headers': ['server'],
-                    'type': 'IP Camera',
-                    'manufacturer': 'Foscam'
-                },
-                'ubiquiti': {
-                    'patterns': ['ubiquiti', 'unifi', 'airmax', 'edgeos'],
-                    'headers': ['server'],
-                    'type': 'Network Device',
-                    'manufacturer': 'Ubiquiti'
-                },
-                'tp-link': {
-                    'patterns': ['tp-link', 'tplink', 'archer'],
-                    'headers': ['server'],
-                    'type': 'Router',
-                    'manufacturer': 'TP-Link'
-                },
-                'netgear': {
-                    'patterns': ['netgear', 'readynas'],
-                    'headers': ['server'],
-                    'type': 'Router',
-                    'manufacturer': 'Netgear'
-                },
-                'linksys': {
-                    'patterns': ['linksys', 'cisco'],
-                    'headers': ['server'],
-                    'type': 'Router',
-                    'manufacturer': 'Linksys'
-                },
-                'generic_camera': {
-                    'patterns': ['camera', 'webcam', 'ipcam', 'surveillance', 'cctv', 'dvr', 'nvr'],
-                    'headers': ['server', 'www-authenticate'],
-                    'type': 'IP Camera',
-                    'manufacturer': 'Generic'
-                }
-            }
-
-            for vendor, sig in signatures.items():
-                confidence = 0
-                model = 'Unknown'
+            timeout = (self.rtt.timeout(ip, 5),
+                       self.rtt.timeout(ip, 5, minimum=RTT_READ_TIMEOUT_MIN))
+            if time_budget is not None:
+                timeout = tuple(min(t, time_budget) for t in timeout)
+            started = time.monotonic()
+            max_bytes = max_bytes or self.http_max_bytes
+            headers = {'Range': f'bytes=0-{max_bytes - 1}'} if byte_range else None
+            response = self.http_session().get(url, timeout=timeout, stream=True, headers=headers)
+            try:
+                headers = response.headers
+                content_type = headers.get('content-type', '').lower()
+                if content_type.startswith(STREAMING_CONTENT_TYPES):
+                    # Endless MJPEG/media stream: headers are all we need
+                    content = ''
+                else:
+                    content = self.read_capped(response, started + sum(timeout), max_bytes).lower()
+            finally:
+                response.close()
 
-                # Check content patterns
-                for pattern in sig['patterns']:
-                    if pattern in content:
-                        confidence += 30
-                        # Try to extract model
-                        if vendor == 'hikvision' and 'ds-' in content:
-                            import re
-                            model_match = re.search(r'ds-\w+', content)
-                            if model_match:
-                                model = model_match.group().upper()
-
-                # Check headers
-                for header in sig['headers']:
-                    if header in headers:
-                        header_value = headers[header].lower()
-                        for pattern in sig['patterns']:
-                            if pattern in header_value:
-                                confidence += 40
-
-                if confidence > 50:
-                    return {
-                        'service': f'HTTP ({port})',
-                        'device_type': sig['type'],
-                        'manufacturer': sig['manufacturer'],
-                        'model': model,
-                        'confidence': confidence,
-                        'server_header': headers.get('server', ''),
-                        'title': self.extract_title(content)
-                    }
+            matched = load_http_signatures().match(content, headers)
+            if not matched and content_type.startswith(STREAMING_CONTENT_TYPES):
+                return {
+                    'service': f'HTTP ({port})',
+                    'device_type': 'IP Camera',
+                    'manufacturer': 'Unknown',
+                    'model': 'Unknown',
+                    'confidence': 60,
+                    'server_header': headers.get('server', ''),
+                    'content_type': content_type,
+                    'title': ''
+                }
+            if matched:
+                sig, confidence, model = matched
+                return {
+                    'service': f'HTTP ({port})',
+                    'device_type': sig['type'],
+                    'manufacturer': sig['manufacturer'],
+                    'model': model,
+                    'confidence': confidence,
+                    'server_header': headers.get('server', ''),
+                    'title': self.extract_title(content)
+                }
 
             # Generic web service detection
             return {
@@ -229,55 +1236,98 @@ class NetworkStreamScanner:
             }
 
         except Exception as e:
+            self.metrics.failed('http_identify', e)
             return None
 
-    def get_rtsp_info(self, ip):
-        """Get device info from RTSP service"""
+    def read_capped(self, response, deadline, max_bytes=None):
+        """
+        Read at most `max_bytes` of a streamed response body before `deadline`
+
+        Enough for the <title> and vendor markers; large web UIs are never
+        buffered in full and slow-drip bodies cannot outlive the probe.
+        """
+        max_bytes = max_bytes or self.http_max_bytes
+        body = bytearray()
+        for chunk in response.iter_content(chunk_size=HTTP_PROBE_CHUNK):
+            body += chunk
+            if len(body) >= max_bytes or time.monotonic() >= deadline:
+                break
         try:
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(5)
-            sock.connect((ip, 554))
+            return body[:max_bytes].decode(response.encoding or 'utf-8', errors='replace')
+        except LookupError:
+            return body[:max_bytes].decode('utf-8', errors='replace')
 
-            # Send RTSP OPTIONS request
-            request = f"OPTIONS rtsp://{ip}:554/ RTSP/1.0\r\nCSeq: 1\r\nUser-Agent: NetworkScanner\r\n\r\n"
-            sock.send(request.encode())
+    def get_rtsp_info(self, ip, port=554, time_budget=None):
+        """
+        Get device info from RTSP service
 
-            response = sock.recv(1024).decode()
-            sock.close()
+        OPTIONS and DESCRIBE are pipelined on one connection. Server,
+        Public and WWW-Authenticate headers plus the SDP (when DESCRIBE is
+        not refused for lack of credentials) are matched against the RTSP
+        signature table.
+        """
+        try:
+            budget = time_budget if time_budget is not None else float('inf')
+            url = f"rtsp://{ip}:{port}/"
+            request = (
+                f"OPTIONS {url} RTSP/1.0\r\nCSeq: 1\r\nUser-Agent: NetworkScanner\r\n\r\n"
+                f"DESCRIBE {url} RTSP/1.0\r\nCSeq: 2\r\nUser-Agent: NetworkScanner\r\n"
+                f"Accept: application/sdp\r\n\r\n"
+            )
 
-            # Look for device signatures in RTSP response
-            response_lower = response.lower()
+            with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+                sock.settimeout(min(self.rtt.timeout(ip, 5), budget))
+                sock.connect((ip, port))
+                sock.settimeout(min(self.rtt.timeout(ip, 5, minimum=RTT_READ_TIMEOUT_MIN), budget))
+                sock.sendall(request.encode())
 
-            if 'hikvision' in response_lower:
-                return {
-                    'service': 'RTSP (554)',
-                    'device_type': 'IP Camera',
-                    'manufacturer': 'HikVision',
-                    'confidence': 80
-                }
-            elif 'dahua' in response_lower:
-                return {
-                    'service': 'RTSP (554)',
-                    'device_type': 'IP Camera',
-                    'manufacturer': 'Dahua',
-                    'confidence': 80
-                }
-            else:
-                return {
-                    'service': 'RTSP (554)',
-                    'device_type': 'IP Camera',
-                    'manufacturer': 'Unknown',
-                    'confidence': 60
-                }
+                reader = RtspResponseReader(sock)
+                options = reader.read_response()
+                if options is None:
+                    return None
+                try:
+                    describe = reader.read_response()
+                except OSError:
+                    describe = None  # some servers hang up after OPTIONS
+
+            _, headers, _ = options
+            sdp = {}
+            sdp_text = ''
+            if describe:
+                describe_status, describe_headers, body = describe
+                for name, value in describe_headers.items():
+                    headers.setdefault(name, value)
+                if describe_status == 200 and body:
+                    sdp = parse_sdp(body)
+                    sdp_text = body.decode('utf-8', errors='replace').lower()
+
+            info = {
+                'service': f'RTSP ({port})',
+                'device_type': 'IP Camera',
+                'manufacturer': 'Unknown',
+                'confidence': 60,
+                'server_header': headers.get('server', ''),
+                'methods': [m.strip() for m in headers.get('public', '').split(',') if m.strip()],
+                'auth_required': bool(describe and describe[0] == 401)
+            }
+            info.update(sdp)
+
+            matched = load_rtsp_signatures().match(sdp_text, headers)
+            if matched:
+                sig, confidence, _ = matched
+                info['device_type'] = sig['type']
+                info['manufacturer'] = sig['manufacturer']
+                info['confidence'] = min(confidence, 95)
+            return info
 
         except Exception as e:
+            self.metrics.failed('rtsp_identify', e)
             return None
 
     def extract_title(self, content):
         """Extract title from HTML content"""
         try:
-            import re
-            title_match = re.search(r'<title>(.*?)</title>', content, re.IGNORECASE)
+            title_match = TITLE_RE.search(content)
             if title_match:
                 return title_match.group(1).strip()
         except:
@@ -321,251 +1371,956 @@ class NetworkStreamScanner:
 
         return {'type': 'Unknown', 'manufacturer': 'Unknown', 'confidence': 0}
     
-    def scan_network(self):
-        """Scan network for active hosts"""
+    def scan_network(self, network_range=None, on_host=None,
+                     timeout=DISCOVERY_TIMEOUT, concurrency=DISCOVERY_CONCURRENCY,
+                     multicast=True):
+        """
+        Scan network for active hosts
+
+        Sweeps every address in the range on an asyncio loop with at most
+        `concurrency` hosts in flight, and reports each host as soon as it
+        answers (via print and the optional `on_host(ip, rtt)` callback).
+        Hosts found in the kernel neighbor table, then hosts answering
+        multicast discovery (see multicast_discover), are reported first
+        with rtt None and are not probed again.
+        """
         print("🔍 Scanning network for active hosts...")
-        network_range = self.get_local_network()
+        network_range = network_range or self.get_local_network()
         print(f"📡 Network range: {network_range}")
-        
-        network = ipaddress.IPv4Network(network_range)
-        threads = []
-        
-        def check_host(ip):
-            if self.ping_host(str(ip)):
-                self.active_hosts.append(str(ip))
-                print(f"✅ Found active host: {ip}")
-        
-        # Scan all IPs in network (limit to reasonable range for demo)
-        for ip in list(network.hosts())[:50]:  # Limit to first 50 IPs for demo
-            thread = threading.Thread(target=check_host, args=(ip,))
-            threads.append(thread)
-            thread.start()
-        
-        # Wait for all threads
-        for thread in threads:
-            thread.join()
-        
-        print(f"📊 Found {len(self.active_hosts)} active hosts")
+
+        network = ipaddress.IPv4Network(network_range, strict=False)
+        self.cache_scope = self.cache_network(network)
+        if network.num_addresses > MAX_SWEEP_ADDRESSES:
+            print(f"⚠️  {network} is larger than a /16, sweeping only the first {MAX_SWEEP_ADDRESSES} addresses")
+
+        started = time.perf_counter()
+
+        # Fast path: hosts already in the neighbor cache are known to be alive
+        for ip, mac in self.read_neighbor_table(self.interface).items():
+            if ipaddress.IPv4Address(ip) not in network or not self.active_hosts.add(ip):
+                continue
+            self.mac_addresses[ip] = mac
+            print(f"✅ Found active host: {ip} ({mac}, neighbor table)")
+            if on_host:
+                on_host(ip, None)
+
+        if multicast and not self.cancelled.is_set():
+            def announce(ip, info):
+                if ipaddress.IPv4Address(ip) in network and self.active_hosts.add(ip):
+                    print(f"✅ Found active host: {ip} ({info['service']})")
+                    if on_host:
+                        on_host(ip, None)
+
+            self.multicast_discover(on_reply=announce)
+
+        asyncio.run(self._sweep(network, on_host, timeout, concurrency))
+
+        # A cancelled sweep did not reach every address: unswept hosts are not down
+        if self.cache and not self.cancelled.is_set():
+            self.liveness_changed = self.cache.update_hosts(
+                self.cache_scope, self.active_hosts.hosts_in(network), self.mac_addresses, self.rtt.hosts)
+            print(f"♻️  Liveness changed for {len(self.liveness_changed)} hosts since the cached scan")
+
+        print(f"📊 Found {len(self.active_hosts)} active hosts in {time.perf_counter() - started:.2f}s")
         return self.active_hosts
-    
-    def scan_streaming_ports(self):
-        """Scan for streaming-related ports on active hosts"""
+
+    def multicast_discover(self, window=None, targets=None, on_reply=None):
+        """
+        Find devices that answer ONVIF WS-Discovery, SSDP or mDNS
+
+        One probe per protocol goes out on the local interface and replies
+        are collected for `window` seconds (MULTICAST_WINDOW by default).
+        Each reply is merged into self.discovered and later into
+        device_info by identification. Returns self.discovered.
+        """
+        import multicast_discovery
+
+        def record(ip, info):
+            self._record_discovery(ip, info)
+            if on_reply:
+                on_reply(ip, info)
+
+        window = multicast_discovery.MULTICAST_WINDOW if window is None else window
+        try:
+            asyncio.run(multicast_discovery.discover(record, window, self.local_ip, targets))
+        except OSError as e:
+            print(f"⚠️  Multicast discovery failed: {e}")
+        return self.discovered
+
+    def _record_discovery(self, ip, info):
+        """Keep one entry per service per host, with the maker name normalised"""
+        raw = info['manufacturer'] if info['manufacturer'] != 'Unknown' else info.get('server_header', '')
+        vendor = load_http_signatures().vendor_for(raw) if raw else None
+        if vendor and vendor['manufacturer'] != 'Generic':
+            info['manufacturer'] = vendor['manufacturer']
+
+        services = self.discovered.setdefault(ip, [])
+        for index, existing in enumerate(services):
+            if existing['service'] == info['service']:
+                if info['confidence'] > existing['confidence']:
+                    services[index] = info
+                return
+        services.append(info)
+
+    async def _sweep(self, network, on_host, timeout, concurrency, descriptors=None):
+        """
+        Probe the network with a fixed pool of worker coroutines
+
+        Addresses already in self.active_hosts are skipped, so discovery
+        running alongside reports each host only once. Each worker holds
+        a socket per DISCOVERY_PORTS entry, so `concurrency` is capped to
+        fit `descriptors` sockets (by default, all of descriptor_budget()).
+        """
+        descriptors = descriptors or descriptor_budget()
+        if concurrency * len(DISCOVERY_PORTS) > descriptors:
+            concurrency = max(1, descriptors // len(DISCOVERY_PORTS))
+            print(f"ℹ️  Sweeping {concurrency} hosts at once to stay within the open-file limit")
+        loop = asyncio.get_running_loop()
+        pinger = IcmpPinger.open(loop)
+        if pinger is None:
+            print("ℹ️  ICMP ping sockets unavailable, using TCP connect probes")
+
+        if network.num_addresses <= 2:
+            addresses = iter(network)
+        else:
+            addresses = network.hosts()
+        addresses = itertools.islice(addresses, MAX_SWEEP_ADDRESSES)
+
+        async def worker():
+            for ip in addresses:
+                if self.cancelled.is_set():
+                    return
+                ip = str(ip)
+                if ip in self.active_hosts:
+                    continue
+                if self.pacer:
+                    await self.pacer.wait()
+                probe_started = time.perf_counter()
+                rtt = await probe_host(ip, self.rtt.timeout(ip, timeout), pinger)
+                self.metrics.observe('discovery', time.perf_counter() - probe_started, rtt is not None)
+                self.rtt.observe(ip, rtt)
+                if rtt is not None and self.active_hosts.add(ip):
+                    print(f"✅ Found active host: {ip} ({rtt * 1000:.1f} ms)")
+                    if on_host:
+                        on_host(ip, rtt)
+
+        try:
+            await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+        finally:
+            if pinger:
+                pinger.close()
+
+    def scan_streaming_ports(self, on_host=None, on_device=None):
+        """
+        Scan for streaming-related ports on active hosts
+
+        `on_host` and `on_device` are passed on to scan_ports and
+        identify_devices for progress reporting.
+        """
         print("\n🎥 Scanning for streaming ports and identifying devices...")
         streaming_hosts = []
+        open_ports_by_host = self.cached_results(self.active_hosts, self._cached_ports)
+        stale = [host for host in self.active_hosts if host not in open_ports_by_host]
+        scanned = self.scan_ports(stale, on_host=on_host)
+        if self.cache and self.cache_scope:
+            self.cache.store_ports(self.cache_scope, scanned)
+        open_ports_by_host.update(scanned)
+        for host, ports in open_ports_by_host.items():
+            self.active_hosts.set_ports(host, ports)
+        open_ports_by_host = {host: ports for host, ports in open_ports_by_host.items() if ports}
+
+        # Identify device type and manufacturer
+        devices = self.cached_results(open_ports_by_host, self._cached_identity)
+        self.device_info.update(devices)
+        stale = {host: ports for host, ports in open_ports_by_host.items() if host not in devices}
+        print(f"🔍 Identifying {len(stale)} devices ({len(devices)} from cache)...")
+        identified = self.identify_devices(stale, on_device=on_device)
+        # A cancelled pass dropped probes, so its identities are not worth keeping
+        if self.cache and self.cache_scope and not self.cancelled.is_set():
+            self.cache.store_identities(self.cache_scope, identified, stale)
+        devices.update(identified)
 
         for host in self.active_hosts:
-            open_ports = []
-            for port in self.streaming_ports:
-                if self.scan_port(host, port):
-                    open_ports.append(port)
-                    print(f"🔓 {host}:{port} - OPEN")
+            open_ports = open_ports_by_host.get(host, [])
 
             if open_ports:
-                # Identify device type and manufacturer
-                print(f"🔍 Identifying device at {host}...")
-                device_info = self.identify_device(host, open_ports)
-
-                streaming_hosts.append({
-                    'host': host,
-                    'open_ports': open_ports,
-                    'device_type': device_info['type'],
-                    'manufacturer': device_info['manufacturer'],
-                    'model': device_info['model'],
-                    'confidence': device_info['confidence'],
-                    'services': device_info['services']
-                })
-
-                # Print identification results
-                if device_info['confidence'] > 50:
-                    print(f"📷 Identified: {device_info['manufacturer']} {device_info['type']}")
-                    if device_info['model'] != 'Unknown':
-                        print(f"   Model: {device_info['model']}")
-                else:
-                    print(f"❓ Unknown device type (confidence: {device_info['confidence']}%)")
-                    # Debug info for unknown devices
-                    print(f"   Debug: Open ports {open_ports}")
-                    if device_info['services']:
-                        for service in device_info['services']:
-                            print(f"   Service: {service.get('service', 'N/A')} - {service.get('server_header', 'No header')}")
-                            if service.get('title'):
-                                print(f"   Title: {service['title'][:50]}...")
+                streaming_host = self.streaming_host(host, open_ports, devices[host])
+                streaming_hosts.append(streaming_host)
+                self.streaming_hosts[host] = streaming_host
+                self.print_identification(streaming_host)
+
+        return streaming_hosts
+
+    def streaming_host(self, host, open_ports, device_info):
+        """One entry of scan_streaming_ports' result"""
+        return {
+            'host': host,
+            'mac': device_info['mac'],
+            'open_ports': open_ports,
+            'device_type': device_info['type'],
+            'manufacturer': device_info['manufacturer'],
+            'model': device_info['model'],
+            'confidence': device_info['confidence'],
+            'services': device_info['services']
+        }
+
+    def print_identification(self, streaming_host):
+        if streaming_host['confidence'] > 50:
+            print(f"📷 Identified: {streaming_host['manufacturer']} {streaming_host['device_type']}")
+            if streaming_host['model'] != 'Unknown':
+                print(f"   Model: {streaming_host['model']}")
+        else:
+            print(f"❓ Unknown device type (confidence: {streaming_host['confidence']}%)")
+            # Debug info for unknown devices
+            print(f"   Debug: Open ports {streaming_host['open_ports']}")
+            for service in streaming_host['services']:
+                print(f"   Service: {service.get('service', 'N/A')} - {service.get('server_header', 'No header')}")
+                if service.get('title'):
+                    print(f"   Title: {service['title'][:50]}...")
+
+    def scan_pipeline(self, network_range=None, on_device=None, on_host=None,
+                      timeout=DISCOVERY_TIMEOUT, concurrency=DISCOVERY_CONCURRENCY,
+                      multicast=True):
+        """
+        Discover, port-scan and identify every host independently
+
+        The same work as scan_network followed by scan_streaming_ports,
+        but each host moves on to its port scan as soon as it is found
+        and to identification as soon as its ports are known, so the
+        first devices are reported while the sweep is still running.
+        `on_host(ip, rtt)` fires per live host and `on_device(entry)`
+        per streaming host, with the entries scan_streaming_ports returns.
+        Returns the list of those entries.
+        """
+        print("🔍 Scanning network for streaming devices...")
+        network_range = network_range or self.get_local_network()
+        print(f"📡 Network range: {network_range}")
+        network = ipaddress.IPv4Network(network_range, strict=False)
+        self.cache_scope = self.cache_network(network)
+
+        started = time.perf_counter()
+        streaming_hosts = asyncio.run(self._pipeline(network, on_host, on_device,
+                                                     timeout, concurrency, multicast))
+        # A cancelled sweep did not reach every address: unswept hosts are not down
+        if self.cache and not self.cancelled.is_set():
+            self.liveness_changed = self.cache.update_hosts(
+                self.cache_scope, self.active_hosts.hosts_in(network), self.mac_addresses, self.rtt.hosts)
+
+        print(f"📊 Found {len(self.active_hosts)} active hosts and "
+              f"{len(streaming_hosts)} streaming devices in {time.perf_counter() - started:.2f}s")
+        return streaming_hosts
+
+    def scan_networks(self, targets=None, on_device=None, on_host=None,
+                      workers=SHARD_WORKERS, rate_limit=SHARD_RATE_LIMIT, multicast=True):
+        """
+        scan_pipeline over several networks and interfaces at once
+
+        `targets` are CIDRs and/or interface names (see resolve_targets);
+        each network is split into /SHARD_PREFIX shards that worker
+        processes scan in parallel, each shard paced to `rate_limit`
+        probes per second. With a single shard, or `workers` <= 1, the
+        shards are scanned in this process one after another, unpaced,
+        like scan_pipeline. Multicast discovery runs in the first shard
+        of every network. Hosts, devices and RTTs from all shards are
+        merged into this scanner; `on_host` and `on_device` fire here as
+        the shards report them. Returns the streaming host entries.
+        Networks larger than MAX_SWEEP_ADDRESSES are cut to their first
+        /16 before sharding, as scan_network does.
+        """
+        networks = self.resolve_targets(targets)
+        self.networks = [network for network, _, _ in networks]
+        shards = []
+        for network, interface, local_ip in networks:
+            network = ipaddress.IPv4Network(network)
+            if network.num_addresses > MAX_SWEEP_ADDRESSES:
+                limited = next(network.subnets(new_prefix=33 - MAX_SWEEP_ADDRESSES.bit_length()))
+                print(f"⚠️  {network} is larger than a /16, sweeping only {limited}")
+                network = limited
+            subnets = network.subnets(new_prefix=max(SHARD_PREFIX, network.prefixlen))
+            for index, subnet in enumerate(subnets):
+                shards.append((str(subnet), interface, local_ip, multicast and index == 0))
+        print(f"🗺️  Scanning {len(networks)} networks in {len(shards)} shards: {', '.join(self.networks)}")
+
+        if len(shards) == 1 or workers <= 1:
+            # One shard at a time is the plain pipeline: nothing to pace against
+            streaming_hosts = []
+            for network, interface, local_ip, shard_multicast in shards:
+                if self.cancelled.is_set():
+                    break
+                self.interface, self.local_ip = interface, local_ip
+                streaming_hosts += self.scan_pipeline(network, on_device, on_host,
+                                                      multicast=shard_multicast)
+            return streaming_hosts
+
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        from capture_pipeline import process_context
+
+        context = process_context()
+        events = context.Queue()
+        cancelled = context.Event()
+        cache_path = self.cache.path if self.cache else None
+        streaming_hosts = []
+        started = time.perf_counter()
+
+        def relay():
+            # Shard events and cancellation cross process boundaries here
+            while True:
+                event = events.get()
+                if event is None:
+                    return
+                kind, payload = event
+                if kind == 'host' and on_host:
+                    on_host(*payload)
+                elif kind == 'device' and on_device:
+                    on_device(payload)
+
+        def watch():
+            while not done.is_set():
+                if self.cancelled.wait(0.2):
+                    cancelled.set()
+                    return
+
+        done = threading.Event()
+        relay_thread = threading.Thread(target=relay, daemon=True)
+        relay_thread.start()
+        threading.Thread(target=watch, daemon=True).start()
+        try:
+            with ProcessPoolExecutor(max_workers=min(workers, len(shards)), mp_context=context,
+                                     initializer=_shard_init, initargs=(events, cancelled)) as pool:
+                futures = [pool.submit(_scan_shard, shard, cache_path, rate_limit) for shard in shards]
+                for future in as_completed(futures):
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"⚠️  Shard failed: {e}")
+                        continue
+                    streaming_hosts += result['streaming_hosts']
+                    self._merge_shard(result)
+        finally:
+            done.set()
+            events.put(None)
+            relay_thread.join()
 
+        streaming_hosts.sort(key=lambda entry: ip_number(entry['host']))
+        print(f"📊 {len(shards)} shards: {len(self.active_hosts)} active hosts and "
+              f"{len(streaming_hosts)} streaming devices in {time.perf_counter() - started:.2f}s")
+        return streaming_hosts
+
+    def _merge_shard(self, result):
+        """Fold one shard's findings into this scanner"""
+        self.active_hosts.update(result['active_hosts'])
+        self.streaming_hosts.update((entry['host'], entry) for entry in result['streaming_hosts'])
+        self.mac_addresses.update(result['mac_addresses'])
+        self.device_info.update(result['device_info'])
+        self.discovered.update(result['discovered'])
+        self.rtt.hosts.update(result['rtt'])
+        self.liveness_changed |= result['liveness_changed']
+        self.metrics.merge(result['metrics'])
+        for stage, counters in result['classifier_stats'].items():
+            for counter, value in counters.items():
+                self.classifier_stats[stage][counter] += value
+
+    async def _pipeline(self, network, on_host, on_device, timeout, concurrency, multicast):
+        """Discovery feeds a queue; a pool of host workers scans and identifies"""
+        from concurrent.futures import ThreadPoolExecutor
+
+        queue = asyncio.Queue()
+        streaming_hosts = []
+        # Only hosts that were already up last time may reuse cached results
+        scope = self.cache_scope
+        reusable = self.cache.alive_hosts(scope) if self.cache else set()
+        # Descriptors left once identification's pooled and in-flight connections
+        # are set aside are split between the sweep and the port scan
+        spare = max(2, descriptor_budget() - IDENTIFY_POOL_HOSTS - IDENTIFY_WORKERS)
+        sweep_descriptors = spare // 2
+        connect_slots = asyncio.Semaphore(min(PORT_SCAN_CONCURRENCY, spare - sweep_descriptors))
+        pool = ThreadPoolExecutor(max_workers=IDENTIFY_WORKERS)
+
+        def found(ip, rtt):
+            if on_host:
+                on_host(ip, rtt)
+            queue.put_nowait(ip)
+
+        def announce(ip, info):
+            self._record_discovery(ip, info)
+            if ipaddress.IPv4Address(ip) in network and self.active_hosts.add(ip):
+                print(f"✅ Found active host: {ip} ({info['service']})")
+                found(ip, None)
+
+        async def process(ip):
+            cached = ip in reusable
+            open_ports = self.cache.fresh_ports(scope, ip) if cached else None
+            if open_ports is None:
+                open_ports = await self._scan_host_ports(ip, self.streaming_ports, connect_slots,
+                                                         PORT_SCAN_PER_HOST, PORT_SCAN_TIMEOUT)
+                if self.cache and not self.cancelled.is_set():
+                    self.cache.store_ports(scope, {ip: open_ports})
+            self.active_hosts.set_ports(ip, open_ports)
+            if not open_ports:
+                return
+
+            device_info = self._cached_identity(ip, open_ports) if cached else None
+            if device_info is None:
+                device_info = await self._identify_host(ip, open_ports, pool)
+                if self.cache and not self.cancelled.is_set():
+                    self.cache.store_identities(scope, {ip: device_info}, {ip: open_ports})
+            self.device_info[ip] = device_info
+
+            streaming_host = self.streaming_host(ip, open_ports, device_info)
+            streaming_hosts.append(streaming_host)
+            self.streaming_hosts[ip] = streaming_host
+            self.print_identification(streaming_host)
+            if on_device:
+                on_device(streaming_host)
+
+        async def worker():
+            while True:
+                ip = await queue.get()
+                if ip is None:
+                    return
+                if self.cancelled.is_set():
+                    continue
+                try:
+                    await process(ip)
+                except Exception as e:
+                    print(f"⚠️  {ip}: {e}")
+
+        workers = [asyncio.create_task(worker()) for _ in range(PIPELINE_HOST_WORKERS)]
+        try:
+            for ip, mac in self.read_neighbor_table(self.interface).items():
+                if ipaddress.IPv4Address(ip) in network and self.active_hosts.add(ip):
+                    self.mac_addresses[ip] = mac
+                    print(f"✅ Found active host: {ip} ({mac}, neighbor table)")
+                    found(ip, None)
+
+            discovery = [self._sweep(network, found, timeout, concurrency, sweep_descriptors)]
+            if multicast:
+                import multicast_discovery
+                discovery.append(multicast_discovery.discover(
+                    announce, multicast_discovery.MULTICAST_WINDOW, self.local_ip))
+            results = await asyncio.gather(*discovery, return_exceptions=True)
+            for result in results:
+                if isinstance(result, OSError):
+                    print(f"⚠️  Discovery failed: {result}")
+                elif isinstance(result, BaseException):
+                    raise result
+        finally:
+            for _ in workers:
+                queue.put_nowait(None)
+            await asyncio.gather(*workers)
+            pool.shutdown(wait=False)
         return streaming_hosts
     
+    def cached_results(self, hosts, lookup):
+        """{host: cached value} for hosts the cache can answer for in cache_scope"""
+        if not self.cache or not self.cache_scope:
+            return {}
+        results = {}
+        for host in hosts:
+            if host in self.liveness_changed:
+                continue
+            value = lookup(host)
+            if value is not None:
+                results[host] = value
+        return results
+
+    def _cached_ports(self, host):
+        return self.cache.fresh_ports(self.cache_scope, host)
+
+    def _cached_identity(self, host, ports=None):
+        if ports is None:
+            ports = self.cache.fresh_ports(self.cache_scope, host)
+            if ports is None:
+                return None
+        info = self.cache.fresh_identity(self.cache_scope, host, ports)
+        return DeviceRecord.from_dict(info) if info is not None else None
+
     def analyze_packet(self, packet):
         """Analyze packet for streaming protocols"""
+        scapy = _scapy
+        IP, TCP, UDP = scapy.IP, scapy.TCP, scapy.UDP
         try:
             if packet.haslayer(IP):
-                src_ip = packet[IP].src
-                dst_ip = packet[IP].dst
-                
-                # Check for common streaming protocols
-                stream_indicators = {
-                    'RTSP': b'RTSP/',
-                    'RTP': packet.haslayer(UDP) and len(packet) > 12,
-                    'HTTP_STREAM': b'video/' in bytes(packet) or b'audio/' in bytes(packet),
-                    'RTMP': packet.haslayer(TCP) and packet[TCP].dport == 1935
-                }
-                
-                for protocol, condition in stream_indicators.items():
-                    if protocol == 'RTP' and condition:
-                        # Basic RTP detection (UDP packets with specific characteristics)
-                        stream_info = {
-                            'timestamp': time.time(),
-                            'src_ip': src_ip,
-                            'dst_ip': dst_ip,
-                            'protocol': 'RTP (possible)',
-                            'size': len(packet)
-                        }
-                        self.traffic_data[f"{src_ip}->{dst_ip}"].append(stream_info)
-                    elif isinstance(condition, bytes) and condition in bytes(packet):
-                        stream_info = {
-                            'timestamp': time.time(),
-                            'src_ip': src_ip,
-                            'dst_ip': dst_ip,
-                            'protocol': protocol,
-                            'size': len(packet)
-                        }
-                        self.detected_streams.append(stream_info)
-                        print(f"🎬 Stream detected: {protocol} from {src_ip} to {dst_ip}")
-                    elif protocol == 'RTMP' and condition:
-                        stream_info = {
-                            'timestamp': time.time(),
-                            'src_ip': src_ip,
-                            'dst_ip': dst_ip,
-                            'protocol': 'RTMP',
-                            'size': len(packet)
-                        }
-                        self.detected_streams.append(stream_info)
-                        print(f"🎬 Stream detected: RTMP from {src_ip} to {dst_ip}")
-                
+                raw = bytes(packet)
+                ip = packet[IP]
+                src_port = dst_port = 0
+                payload = b''
+                if packet.haslayer(TCP):
+                    src_port, dst_port = packet[TCP].sport, packet[TCP].dport
+                elif packet.haslayer(UDP):
+                    src_port, dst_port = packet[UDP].sport, packet[UDP].dport
+                    payload = bytes(packet[UDP].payload)
+                self.record_packet(ip.proto, ip_number(ip.src), ip_number(ip.dst), src_port, dst_port,
+                                   len(raw), time.time(), b'RTSP/' in raw, payload, 0, len(payload))
         except Exception as e:
             pass  # Ignore packet parsing errors
-    
-    def start_packet_capture(self, duration=30):
-        """Start capturing packets for stream detection"""
-        if not SCAPY_AVAILABLE:
+
+    def analyze_frame(self, buf, offset, caplen, wirelen, timestamp):
+        """
+        analyze_packet for a raw Ethernet frame inside a capture ring
+
+        Headers are parsed in place and payloads searched with buf.find,
+        so frames that match nothing cost no allocations beyond the
+        header tuple.
+        """
+        headers = packet_ring.frame_headers(buf, offset, caplen)
+        if headers is None:
+            return
+        protocol, src, dst, src_port, dst_port, start, end = headers
+        self.record_packet(protocol, src, dst, src_port, dst_port, wirelen, timestamp,
+                           buf.find(b'RTSP/', offset, offset + caplen) != -1, buf, start, end)
+
+    def record_packet(self, protocol, src, dst, src_port, dst_port, size, timestamp, rtsp,
+                      payload=None, start=0, end=0):
+        """
+        Fold one classified packet into self.flows
+
+        RTSP is recognised by its payload and RTMP by port 1935. A UDP
+        payload (`payload[start:end]`) is RTP only once self.rtp has
+        validated its header and seen its SSRC in sequence, so DNS, mDNS
+        and other datagrams never become flows. Unclassified packets
+        still count towards flows that are already tracked.
+        """
+        if rtsp:
+            kind = 'RTSP'
+        elif protocol == 6 and dst_port == 1935:
+            kind = 'RTMP'
+        elif protocol == 17 and payload is not None and \
+                self.rtp.observe(payload, start, end, src, dst, src_port, dst_port, timestamp):
+            kind = 'RTP'
+        else:
+            kind = None
+        self.flows.observe(protocol, src, dst, src_port, dst_port, size, timestamp, kind)
+
+    def _flow_classified(self, flow):
+        if flow.kind != 'RTP':
+            protocol, src, dst, _, _ = flow.key
+            print(f"🎬 Stream detected: {flow.kind} from {ip_string(src)} to {ip_string(dst)}")
+
+    def _rtp_confirmed(self, stream):
+        print(f"🎬 Stream detected: RTP from {ip_string(stream.source)} to "
+              f"{ip_string(stream.destination)}:{stream.dst_port} (SSRC 0x{stream.ssrc:08x})")
+
+    def start_packet_capture(self, duration=30, capture_filter=None, engine=None, workers=None):
+        """
+        Start capturing packets for stream detection
+
+        The kernel applies a BPF filter (build_capture_filter over the
+        streaming ports and the streaming hosts found so far, unless
+        `capture_filter` is given), so only candidate packets are copied
+        into Python. self.capture_stats records how many packets the
+        interface saw, how many the filter delivered and how many the
+        kernel dropped for lack of buffer space.
+
+        `engine` is 'ring' (packet_ring's TPACKET_V3 ring, Linux only),
+        'pipeline' (the ring with decoding spread over `workers` processes,
+        see capture_pipeline), 'scapy' (sniff) or None to use the ring
+        whenever it can be opened, as a pipeline if there are spare cores.
+        A custom `capture_filter` string needs scapy's pcap compiler.
+        """
+        if engine is None and capture_filter is None and packet_ring.available():
+            engine = 'pipeline' if (os.cpu_count() or 1) > 1 else 'ring'
+        if engine in ('ring', 'pipeline'):
+            try:
+                if engine == 'pipeline':
+                    return self.start_pipeline_capture(duration, workers)
+                return self.start_ring_capture(duration)
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Capture ring unavailable ({e}), falling back to scapy")
+
+        scapy = load_scapy()
+        if scapy is None:
             print("❌ Packet capture disabled: scapy not available")
             return
 
+        if capture_filter is None:
+            capture_filter = build_capture_filter(hosts=self.device_info)
+        interface = self.interface or str(scapy.conf.iface)
+
         print(f"\n📡 Starting packet capture for {duration} seconds...")
         print("🎯 Looking for streaming protocols (RTSP, RTP, HTTP streams, RTMP)...")
+        print(f"🧹 Kernel filter: {capture_filter}")
         print("⚠️  Note: Packet capture requires administrator/root privileges")
 
+        delivered = 0
+
+        def analyze(packet):
+            nonlocal delivered
+            delivered += 1
+            self.analyze_packet(packet)
+
+        seen_before = interface_packet_count(interface)
+        started = time.perf_counter()
         try:
-            # Capture packets for specified duration
-            packets = sniff(timeout=duration, prn=self.analyze_packet, store=False)
+            sock = scapy.conf.L2listen(iface=interface, filter=capture_filter)
+            try:
+                packet_socket_stats(getattr(sock, 'ins', None))  # reading resets the counters
+                # Capture packets for specified duration
+                scapy.sniff(opened_socket=sock, timeout=duration, prn=analyze, store=False)
+                kernel = packet_socket_stats(getattr(sock, 'ins', None))
+            finally:
+                sock.close()
             print(f"✅ Packet capture completed. Analyzed packets for {duration} seconds.")
         except Exception as e:
+            self.metrics.observe('capture', time.perf_counter() - started, False, delivered, timed_out=False)
+            self.metrics.failed('capture', e)
             print(f"❌ Error during packet capture: {e}")
             print("💡 Try running as administrator/root for packet capture")
+            return
+        self.metrics.observe('capture', time.perf_counter() - started, items=delivered)
+
+        seen_after = interface_packet_count(interface)
+        seen = seen_after - seen_before if seen_before is not None and seen_after is not None else None
+        self.capture_stats = {
+            'engine': 'scapy',
+            'interface': interface,
+            'filter': capture_filter,
+            'interface_packets': seen,
+            'delivered': delivered,
+            'kernel_filtered': max(0, seen - delivered) if seen is not None else None,
+            'kernel_dropped': kernel[1] if kernel else None
+        }
+        if seen is not None:
+            print(f"📉 Kernel filtered {self.capture_stats['kernel_filtered']} of {seen} packets, "
+                  f"delivered {delivered}")
     
-    def generate_report(self):
-        """Generate a comprehensive report"""
-        streaming_hosts = self.scan_streaming_ports()
-
-        # Categorize devices
-        device_categories = {
-            'IP Cameras': [],
-            'Network Devices': [],
-            'Servers': [],
-            'PCs': [],
-            'Unknown': []
+    def capture_ring(self, interface):
+        """
+        packet_ring.RingCapture filtered on the streaming ports and hosts
+
+        Returns (ring, hosts in its filter). If the host clause does not
+        compile, the ring filters on ports only.
+        """
+        hosts = list(self.device_info)[:CAPTURE_FILTER_MAX_HOSTS]
+        try:
+            return packet_ring.RingCapture(interface, CAPTURE_TCP_PORTS, CAPTURE_UDP_PORT_RANGES, hosts), hosts
+        except ValueError as e:
+            print(f"⚠️  {e}, filtering on ports only")
+            return packet_ring.RingCapture(interface, CAPTURE_TCP_PORTS, CAPTURE_UDP_PORT_RANGES), []
+
+    def start_ring_capture(self, duration=30):
+        """Capture through packet_ring.RingCapture and classify with analyze_frame"""
+        interface = self.interface or self.default_interface()
+        ring, hosts = self.capture_ring(interface)
+
+        print(f"\n📡 Starting ring capture on {interface} for {duration} seconds...")
+        print("🎯 Looking for streaming protocols (RTSP, RTP, RTMP)...")
+        print(f"🧹 Kernel filter: {build_capture_filter(hosts=hosts)}")
+
+        seen_before = interface_packet_count(interface)
+        started = time.perf_counter()
+        with ring:
+            delivered = ring.run(self.analyze_frame, duration, stop=self.cancelled)
+            _, dropped = ring.stats()
+        self.metrics.observe('capture', time.perf_counter() - started, items=delivered)
+        seen_after = interface_packet_count(interface)
+        seen = seen_after - seen_before if seen_before is not None and seen_after is not None else None
+        self.capture_stats = {
+            'engine': 'ring',
+            'interface': interface,
+            'filter': build_capture_filter(hosts=hosts),
+            'interface_packets': seen,
+            'delivered': delivered,
+            'kernel_filtered': max(0, seen - delivered) if seen is not None else None,
+            'kernel_dropped': dropped
+        }
+        print(f"✅ Ring capture completed: {delivered} packets delivered, {dropped} dropped by the kernel")
+
+    def start_pipeline_capture(self, duration=30, workers=None):
+        """
+        start_ring_capture with analyze_frame running in decoder processes
+
+        This process only copies frames into per-decoder shared-memory
+        rings, sharded by flow; each decoder classifies its share with a
+        fresh NetworkStreamScanner and the flows and RTP streams it found
+        are merged into this scanner afterwards. Queue drops and depths
+        are added to self.capture_stats.
+        """
+        import capture_pipeline
+
+        workers = workers or capture_pipeline.PIPELINE_WORKERS
+        interface = self.interface or self.default_interface()
+        ring, hosts = self.capture_ring(interface)
+        pipeline = capture_pipeline.CapturePipeline(ring, NetworkStreamScanner, workers)
+
+        print(f"\n📡 Starting ring capture on {interface} for {duration} seconds with {workers} decoders...")
+        print("🎯 Looking for streaming protocols (RTSP, RTP, RTMP)...")
+        print(f"🧹 Kernel filter: {build_capture_filter(hosts=hosts)}")
+
+        seen_before = interface_packet_count(interface)
+        started = time.perf_counter()
+        stats, results = pipeline.run(duration, stop=self.cancelled)
+        self.metrics.observe('capture', time.perf_counter() - started, items=stats['delivered'])
+        seen_after = interface_packet_count(interface)
+        seen = seen_after - seen_before if seen_before is not None and seen_after is not None else None
+        for flows, streams in results:
+            self.flows.merge(flows)
+            self.rtp.merge(streams)
+        self.capture_stats = {
+            'engine': 'pipeline',
+            'interface': interface,
+            'filter': build_capture_filter(hosts=hosts),
+            'interface_packets': seen,
+            'kernel_filtered': max(0, seen - stats['delivered']) if seen is not None else None,
+            **stats
+        }
+        print(f"✅ Pipeline capture completed: {stats['delivered']} packets delivered, "
+              f"{stats['kernel_dropped']} dropped by the kernel, {stats['queue_dropped']} by full decoder queues")
+
+    def capture_results(self):
+        """Flow and RTP stream records for capture_pipeline to merge"""
+        return list(self.flows), list(self.rtp.streams.values())
+
+    def analyze_capture_file(self, path):
+        """
+        Run stream detection over a pcap/pcapng file instead of live traffic
+
+        Every frame goes through analyze_frame exactly as a live capture
+        would; pcap_offline adds vectorised per-flow statistics
+        (self.flow_statistics) when NumPy is installed. Needs no root.
+        """
+        import pcap_offline
+
+        print(f"\n📂 Analyzing capture file {path}...")
+        started = time.perf_counter()
+        result = pcap_offline.analyze(path, on_frame=self.analyze_frame)
+        elapsed = time.perf_counter() - started
+        self.metrics.observe('capture', elapsed, items=result['packets'])
+        self.flow_statistics = result['flows'] or []
+        self.capture_stats = {
+            'engine': 'file',
+            'file': path,
+            'format': result['format'],
+            'packets': result['packets'],
+            'delivered': result['ethernet_frames'],
+            'seconds': round(elapsed, 3)
         }
+        if result['flows'] is None:
+            print("⚠️  NumPy not installed: per-flow statistics skipped")
+        print(f"✅ Analyzed {result['packets']} packets in {elapsed:.2f}s "
+              f"({result['packets'] / elapsed if elapsed else 0:,.0f} packets/s)")
+        return result
+
+    def default_interface(self):
+        """Interface of the default route, from the kernel routing table"""
+        try:
+            with open('/proc/net/route') as f:
+                for line in f.readlines()[1:]:
+                    fields = line.split()
+                    if fields[1] == '00000000':
+                        return fields[0]
+        except (OSError, IndexError):
+            pass
+        return 'lo'
+
+    def device_category(self, device_type):
+        """Report category of a device type"""
+        if 'Camera' in device_type:
+            return 'IP Cameras'
+        if 'Network' in device_type:
+            return 'Network Devices'
+        if 'Server' in device_type:
+            return 'Servers'
+        if 'PC' in device_type:
+            return 'PCs'
+        return 'Unknown'
 
+    def report_sections(self):
+        """
+        The report as a list of (key, value) sections for report_writer
+
+        Built only from results already collected; nothing is scanned
+        again. The hosts, devices and flows to include are fixed when
+        this is called, but their dicts are only built as each section
+        is consumed: long lists are iterators and big mappings are
+        report_writer.Fields, so the sections can be written once.
+        """
+        from report_writer import Fields
+
+        streaming_hosts = list(self.streaming_hosts.values())
+        devices = list(self.device_info.items())
+        macs = list(self.mac_addresses.items())
+        rtt = list(self.rtt.hosts.items())
+        flows = sorted(self.flows, key=lambda flow: flow.bytes, reverse=True)
+        detected_streams = [flow for flow in flows if flow.kind in ('RTSP', 'RTMP')]
+        rtp_streams = self.rtp.summaries()
+
+        categories = {category: [] for category in ('IP Cameras', 'Network Devices', 'Servers', 'PCs', 'Unknown')}
         for host_info in streaming_hosts:
-            device_type = host_info['device_type']
-            if 'Camera' in device_type:
-                device_categories['IP Cameras'].append(host_info)
-            elif 'Network' in device_type:
-                device_categories['Network Devices'].append(host_info)
-            elif 'Server' in device_type:
-                device_categories['Servers'].append(host_info)
-            elif 'PC' in device_type:
-                device_categories['PCs'].append(host_info)
-            else:
-                device_categories['Unknown'].append(host_info)
-
-        report = {
-            'scan_timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
-            'network_range': self.get_local_network(),
-            'active_hosts': self.active_hosts,
-            'streaming_hosts': streaming_hosts,
-            'device_categories': device_categories,
-            'device_info': self.device_info,
-            'detected_streams': self.detected_streams,
-            'traffic_summary': {
-                'total_streams_detected': len(self.detected_streams),
-                'unique_protocols': list(set([s['protocol'] for s in self.detected_streams])),
-                'active_connections': len(self.traffic_data),
+            categories[self.device_category(host_info['device_type'])].append(host_info)
+
+        def with_rtp(hosts):
+            return (dict(host_info, rtp_streams=rtp_streams.get(host_info['host'], []))
+                    for host_info in hosts)
+
+        return [
+            ('scan_timestamp', time.strftime('%Y-%m-%d %H:%M:%S')),
+            ('network_range', self.get_local_network()),
+            ('networks', self.networks),
+            ('active_hosts', iter(self.active_hosts.copy())),
+            ('mac_addresses', Fields(macs)),
+            ('host_rtt', Fields(RttEstimator.describe(ip, state) for ip, state in rtt)),
+            ('streaming_hosts', with_rtp(streaming_hosts)),
+            ('device_categories', Fields((category, with_rtp(hosts)) for category, hosts in categories.items())),
+            ('device_info', Fields((ip, dict(info)) for ip, info in devices)),
+            ('classifier_stats', self.classifier_summary()),
+            ('capture_stats', self.capture_stats),
+            ('performance', self.metrics.summary()),
+            ('detected_streams', (flow.to_dict() for flow in detected_streams)),
+            ('flows', (flow.to_dict() for flow in flows)),
+            ('flow_statistics', iter(self.flow_statistics)),
+            ('rtp_streams', rtp_streams),
+            ('traffic_summary', {
+                'total_streams_detected': len(detected_streams) + sum(map(len, rtp_streams.values())),
+                'rtp_packets_lost': sum(stream['packets_lost'] for streams in rtp_streams.values()
+                                        for stream in streams),
+                'unique_protocols': sorted({flow.kind for flow in flows}),
+                'active_connections': len(flows),
+                'flows_evicted': self.flows.evicted + self.flows.expired,
                 'identified_devices': len([h for h in streaming_hosts if h['confidence'] > 50])
-            }
-        }
+            })
+        ]
+
+    def generate_report(self):
+        """Generate a comprehensive report from the results collected so far, as a dict"""
+        import report_writer
+
+        return report_writer.materialise(report_writer.Fields(self.report_sections()))
+
+    def write_report(self, path, format=None):
+        """
+        Stream the report to `path` without building it in memory
+
+        `format` is 'json' or 'ndjson' (one line per host, device, flow
+        and so on); by default it follows the file extension.
+        """
+        import report_writer
+
+        format = format or ('ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'json')
+        started = time.perf_counter()
+        with open(path, 'wb', buffering=1 << 20) as f:
+            if format == 'ndjson':
+                report_writer.write_ndjson(f, self.report_sections())
+            else:
+                report_writer.write_json(f, self.report_sections())
+            size = f.tell()
+        print(f"💾 Report written to {path} ({size / 1024:.0f} KiB in {time.perf_counter() - started:.2f}s)")
+        return size
+
+_shard_events = None
+_shard_cancelled = None
+
+
+def _shard_init(events, cancelled):
+    """Shard process setup: where to report progress and how to learn of cancellation"""
+    global _shard_events, _shard_cancelled
+    _shard_events = events
+    _shard_cancelled = cancelled
+
+
+def _scan_shard(shard, cache_path, rate_limit):
+    """Run scan_pipeline over one shard in a worker process; return what it found"""
+    network, interface, local_ip, multicast = shard
+    scanner = NetworkStreamScanner(cache_path=cache_path)
+    scanner.cancelled = _shard_cancelled
+    scanner.interface, scanner.local_ip = interface, local_ip
+    scanner.pacer = RateLimiter(rate_limit, cancelled=scanner.cancelled) if rate_limit else None
+    try:
+        streaming_hosts = []
+        if not scanner.cancelled.is_set():
+            streaming_hosts = scanner.scan_pipeline(
+                network, multicast=multicast,
+                on_host=lambda ip, rtt: _shard_events.put(('host', (ip, rtt))),
+                on_device=lambda entry: _shard_events.put(('device', entry)))
+    finally:
+        if scanner.cache:
+            scanner.cache.close()
+    return {
+        'network': network,
+        'streaming_hosts': streaming_hosts,
+        'active_hosts': scanner.active_hosts,
+        'mac_addresses': scanner.mac_addresses,
+        'device_info': scanner.device_info,
+        'discovered': scanner.discovered,
+        'rtt': scanner.rtt.hosts,
+        'liveness_changed': scanner.liveness_changed,
+        'classifier_stats': scanner.classifier_stats,
+        'metrics': scanner.metrics
+    }
 
-        return report
 
 # Create and run the scanner
-def main():
-    scanner = NetworkStreamScanner()
+def main(targets=None):
+    """Scan `targets` (CIDRs or interface names), or every local network"""
+    scanner = NetworkStreamScanner(cache_path=os.environ.get('SCANNER_CACHE', SCAN_CACHE_PATH))
     
     print("🚀 Network Stream Scanner Starting...")
     print("=" * 50)
     
-    # Step 1: Scan network for active hosts
-    active_hosts = scanner.scan_network()
-    
-    # Step 2: Scan for streaming ports
-    streaming_hosts = scanner.scan_streaming_ports()
+    # Steps 1 and 2: find hosts, port-scan and identify each as soon as it answers
+    streaming_hosts = scanner.scan_networks(targets)
     
     # Step 3: Capture packets (shorter duration for demo)
     print("\n⚠️  Note: Packet capture requires root privileges")
     print("🔄 Starting packet capture (10 seconds for demo)...")
     scanner.start_packet_capture(duration=10)
     
-    # Step 4: Generate report
-    report = scanner.generate_report()
-    
+    # Step 4: Stream the report to disk, then summarise from the scanner's own records
+    scanner.write_report('network_stream_report.json')
+
     print("\n" + "=" * 50)
     print("📋 SCAN RESULTS")
     print("=" * 50)
-    
-    print(f"🌐 Network Range: {report['network_range']}")
-    print(f"💻 Active Hosts: {len(report['active_hosts'])}")
-    
-    if report['active_hosts']:
-        for host in report['active_hosts']:
-            print(f"   • {host}")
-    
-    print(f"\n🎥 Hosts with Streaming Ports: {len(report['streaming_hosts'])}")
+
+    print(f"🌐 Network Range: {', '.join(scanner.networks) or scanner.get_local_network()}")
+    print(f"💻 Active Hosts: {len(scanner.active_hosts)}")
+    for host in scanner.active_hosts:
+        print(f"   • {host}")
+
+    print(f"\n🎥 Hosts with Streaming Ports: {len(streaming_hosts)}")
 
     # Display devices by category
-    for category, devices in report['device_categories'].items():
-        if devices:
-            print(f"\n📂 {category}: {len(devices)}")
-            for device in devices:
-                confidence_indicator = "✅" if device['confidence'] > 70 else "⚠️" if device['confidence'] > 50 else "❓"
-                print(f"   {confidence_indicator} {device['host']} - {device['manufacturer']} {device['device_type']}")
-                if device['model'] != 'Unknown':
-                    print(f"      Model: {device['model']}")
-                print(f"      Ports: {device['open_ports']} (Confidence: {device['confidence']}%)")
-
-    print(f"\n📡 Detected Streams: {report['traffic_summary']['total_streams_detected']}")
-    if report['detected_streams']:
-        for stream in report['detected_streams'][-5:]:  # Show last 5
-            print(f"   • {stream['protocol']}: {stream['src_ip']} → {stream['dst_ip']}")
+    categories = {category: [] for category in ('IP Cameras', 'Network Devices', 'Servers', 'PCs', 'Unknown')}
+    for device in streaming_hosts:
+        categories[scanner.device_category(device['device_type'])].append(device)
+    for category, devices in categories.items():
+        if not devices:
+            continue
+        print(f"\n📂 {category}: {len(devices)}")
+        for device in devices:
+            confidence_indicator = "✅" if device['confidence'] > 70 else "⚠️" if device['confidence'] > 50 else "❓"
+            print(f"   {confidence_indicator} {device['host']} - {device['manufacturer']} {device['device_type']}")
+            if device['model'] != 'Unknown':
+                print(f"      Model: {device['model']}")
+            print(f"      Ports: {device['open_ports']} (Confidence: {device['confidence']}%)")
+
+    detected_streams = [flow for flow in scanner.flows if flow.kind in ('RTSP', 'RTMP')]
+    rtp_streams = scanner.rtp.summaries()
+    print(f"\n📡 Detected Streams: {len(detected_streams) + sum(map(len, rtp_streams.values()))}")
+    for flow in heapq.nlargest(5, detected_streams, key=lambda flow: flow.bytes):  # the busiest 5
+        stream = flow.to_dict()
+        print(f"   • {stream['protocol']}: {stream['src_ip']} → {stream['dst_ip']}")
+    for source, streams in rtp_streams.items():
+        for stream in streams:
+            print(f"   • RTP {stream['codec']}: {source} → {stream['dst_ip']}:{stream['dst_port']} "
+                  f"{stream['bitrate_bps'] / 1000:.0f} kbit/s, {stream['loss_ratio']:.1%} loss, "
+                  f"{stream['jitter_ms']} ms jitter")
 
     print(f"\n🎯 Device Identification Summary:")
-    print(f"   • Successfully identified: {report['traffic_summary']['identified_devices']} devices")
-    print(f"   • IP Cameras found: {len(report['device_categories']['IP Cameras'])}")
-    print(f"   • Network devices found: {len(report['device_categories']['Network Devices'])}")
-    print(f"   • Unknown devices: {len(report['device_categories']['Unknown'])}")
-    
-    # Save detailed report to file
-    with open('network_stream_report.json', 'w') as f:
-        json.dump(report, f, indent=2, default=str)
-    
-    print(f"\n💾 Detailed report saved to: network_stream_report.json")
+    print(f"   • Successfully identified: {len([h for h in streaming_hosts if h['confidence'] > 50])} devices")
+    print(f"   • IP Cameras found: {len(categories['IP Cameras'])}")
+    print(f"   • Network devices found: {len(categories['Network Devices'])}")
+    print(f"   • Unknown devices: {len(categories['Unknown'])}")
+
+    performance = scanner.metrics.summary()
+    print(f"\n⏱️  Scan Phases (most time in {performance['dominant_phase'] or 'none'}):")
+    for phase, metrics in performance['phases'].items():
+        if metrics['probes']:
+            print(f"   • {phase}: {metrics['probes']} probes, {metrics['timeouts']} timeouts, "
+                  f"{metrics['errors']} errors, p50 ≤ {metrics['durations']['p50_ms']} ms, "
+                  f"p99 ≤ {metrics['durations']['p99_ms']} ms, {metrics['wall_s']}s wall")
     print("✅ Scan completed!")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import sys
+    main(sys.argv[1:])
\ No newline at end of file
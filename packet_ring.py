@@ -0,0 +1,367 @@
+"""
+AF_PACKET capture engine for network_scanner.py
+
+Receives frames through a memory-mapped TPACKET_V3 ring: the kernel
+writes packets straight into shared blocks and user space walks them in
+place, so nothing is copied per packet and no packet objects are built.
+Headers are read with struct.unpack_from on the ring itself. A classic
+BPF program compiled from the capture spec (see compile_filter) is
+attached before the socket is bound, so uninteresting traffic never
+reaches the ring. Linux only; needs CAP_NET_RAW.
+"""
+
+import mmap
+import select
+import socket
+import struct
+import time
+
+ETH_P_ALL = 0x0003
+ETH_P_IP = 0x0800
+ETH_P_8021Q = 0x8100
+
+SOL_PACKET = 263
+PACKET_RX_RING = 5
+PACKET_STATISTICS = 6
+PACKET_VERSION = 10
+TPACKET_V3 = 2
+SO_ATTACH_FILTER = 26
+TP_STATUS_KERNEL = 0
+TP_STATUS_USER = 1
+
+RING_BLOCK_SIZE = 1 << 20      # bytes per ring block, a multiple of the page size
+RING_BLOCK_COUNT = 64          # blocks in the ring (64 MiB of buffering)
+RING_FRAME_SIZE = 2048         # nominal frame slot, only used to size the request
+RING_BLOCK_TIMEOUT = 50        # ms before the kernel hands over a partly filled block
+SNAPLEN = 65535
+
+BLOCK_HEADER = struct.Struct('=III')             # block_status, num_pkts, offset_to_first_pkt at +8
+BLOCK_STATUS = struct.Struct('=I')
+FRAME_HEADER = struct.Struct('=IIIIIIH')         # tpacket3_hdr up to tp_mac
+ETHERTYPE = struct.Struct('!H')
+IPV4_HEADER = struct.Struct('!B5xHxB2xII')       # ver/ihl, flags+fragment, protocol, src, dst
+PORTS = struct.Struct('!HH')
+
+IPPROTO_TCP = 6
+IPPROTO_UDP = 17
+
+# Classic BPF opcodes (linux/filter.h)
+BPF_LD_W_ABS = 0x20
+BPF_LD_H_ABS = 0x28
+BPF_LD_B_ABS = 0x30
+BPF_LD_H_IND = 0x48
+BPF_LDX_B_MSH = 0xb1
+BPF_JEQ_K = 0x15
+BPF_JGT_K = 0x25
+BPF_JGE_K = 0x35
+BPF_JSET_K = 0x45
+BPF_JA = 0x05
+BPF_RET_K = 0x06
+BPF_MAXINSNS = 4096            # longest program the kernel accepts
+BPF_MAX_OFFSET = 255           # conditional jumps have 8-bit offsets; BPF_JA has 32
+
+
+def available():
+    return hasattr(socket, 'AF_PACKET')
+
+
+def compile_filter(tcp_ports=(), udp_port_ranges=(), hosts=()):
+    """
+    Classic BPF for the same spec as network_scanner.build_capture_filter
+
+    Accepts Ethernet IPv4 frames, untagged or with one 802.1Q tag, that
+    are TCP to or from `tcp_ports`, UDP with either port inside one of
+    `udp_port_ranges`, or UDP to or from one of `hosts`. Returns the
+    program as packed sock_filter structs. Conditional jumps too far for
+    their 8-bit offsets go through BPF_JA trampolines; ValueError if the
+    program exceeds BPF_MAXINSNS.
+    """
+    program = []  # (code, jt, jf, k) with jt/jf as label names or 0
+    tcp_ports = sorted(set(tcp_ports))
+    udp_port_ranges = sorted(set(udp_port_ranges))
+    hosts = sorted(set(hosts))
+
+    def emit(code, k=0, jt=0, jf=0):
+        program.append((code, jt, jf, k))
+
+    def label(name):
+        program.append(name)
+
+    def ports_block(accept, matches, ip):
+        # Source port then destination port, each against every match
+        for offset in (ip, ip + 2):
+            emit(BPF_LD_H_IND, offset)
+            for low, high in matches:
+                if low == high:
+                    emit(BPF_JEQ_K, low, jt=accept)
+                else:
+                    skip = f'skip{len(program)}'
+                    emit(BPF_JGE_K, low, jf=skip)
+                    emit(BPF_JGT_K, high, jt=skip, jf=accept)
+                    label(skip)
+
+    def ipv4_block(ip):
+        # The IPv4 part of the program for a header starting at `ip`
+        tcp, udp = f'tcp{ip}', f'udp{ip}'
+        emit(BPF_LD_B_ABS, ip + 9)
+        emit(BPF_JEQ_K, IPPROTO_TCP, jt=tcp)
+        emit(BPF_JEQ_K, IPPROTO_UDP, jt=udp)
+        emit(BPF_RET_K, 0)
+
+        label(tcp)
+        if tcp_ports:
+            emit(BPF_LD_H_ABS, ip + 6)
+            emit(BPF_JSET_K, 0x1fff, jt='drop')  # later fragments carry no ports
+            emit(BPF_LDX_B_MSH, ip)
+            ports_block('accept', [(port, port) for port in tcp_ports], ip)
+        emit(BPF_RET_K, 0)
+
+        label(udp)
+        for address in hosts:
+            value = struct.unpack('!I', socket.inet_aton(address))[0]
+            emit(BPF_LD_W_ABS, ip + 12)
+            emit(BPF_JEQ_K, value, jt='accept')
+            emit(BPF_LD_W_ABS, ip + 16)
+            emit(BPF_JEQ_K, value, jt='accept')
+        if udp_port_ranges:
+            emit(BPF_LD_H_ABS, ip + 6)
+            emit(BPF_JSET_K, 0x1fff, jt='drop')
+            emit(BPF_LDX_B_MSH, ip)
+            ports_block('accept', udp_port_ranges, ip)
+        emit(BPF_RET_K, 0)
+
+    # Kernels that strip VLAN tags on receive show untagged frames here;
+    # the tagged branch covers interfaces that hand the tag through
+    emit(BPF_LD_H_ABS, 12)
+    emit(BPF_JEQ_K, ETH_P_IP, jt='untagged')
+    emit(BPF_JEQ_K, ETH_P_8021Q, jf='drop')
+    emit(BPF_LD_H_ABS, 16)
+    emit(BPF_JEQ_K, ETH_P_IP, jt='tagged', jf='drop')
+    label('untagged')
+    ipv4_block(14)
+    label('tagged')
+    ipv4_block(18)
+
+    label('accept')
+    emit(BPF_RET_K, SNAPLEN)
+    label('drop')
+    emit(BPF_RET_K, 0)
+
+    program = _relax_jumps(program)
+    positions = _label_positions(program)
+    if len(program) - len(positions) > BPF_MAXINSNS:
+        raise ValueError('capture filter too large for a BPF program')
+
+    # Resolve labels into relative forward jumps
+    instructions = []
+    for item in program:
+        if isinstance(item, str):
+            continue
+        code, jt, jf, k = item
+        here = len(instructions)
+        jt = positions[jt] - here - 1 if isinstance(jt, str) else jt
+        jf = positions[jf] - here - 1 if isinstance(jf, str) else jf
+        if code == BPF_JA and isinstance(k, str):
+            k = positions[k] - here - 1
+        instructions.append(struct.pack('=HBBI', code, jt, jf, k))
+    return b''.join(instructions)
+
+
+def _label_positions(program):
+    positions = {}
+    index = 0
+    for item in program:
+        if isinstance(item, str):
+            positions[item] = index
+        else:
+            index += 1
+    return positions
+
+
+def _relax_jumps(program):
+    """
+    Route conditional jumps beyond BPF_MAX_OFFSET through BPF_JA
+
+    A far branch jumps to a BPF_JA placed right after the instruction,
+    which makes the long jump. Inserting those can push other jumps out
+    of range, so this repeats until every offset fits.
+    """
+    while True:
+        positions = _label_positions(program)
+        relaxed = []
+        index = 0
+        changed = False
+        for item in program:
+            if isinstance(item, str):
+                relaxed.append(item)
+                continue
+            code, jt, jf, k = item
+            far = [isinstance(target, str) and positions[target] - index - 1 > BPF_MAX_OFFSET
+                   for target in (jt, jf)]
+            index += 1
+            if code == BPF_JA or not any(far):
+                relaxed.append(item)
+                continue
+            changed = True
+            name = f'far{len(relaxed)}_{len(program)}'
+            targets = [jt, jf]
+            trampolines = []
+            for branch, target in enumerate(targets):
+                if target == 0:
+                    targets[branch] = f'{name}_next'
+                elif far[branch]:
+                    targets[branch] = f'{name}_{branch}'
+                    trampolines += [targets[branch], (BPF_JA, 0, 0, target)]
+            relaxed.append((code, targets[0], targets[1], k))
+            relaxed.extend(trampolines)
+            relaxed.append(f'{name}_next')
+        program = relaxed
+        if not changed:
+            return program
+
+
+def attach_filter(sock, program):
+    """SO_ATTACH_FILTER a compiled program (the kernel copies it)"""
+    import ctypes
+
+    buffer = ctypes.create_string_buffer(program, len(program))
+    fprog = struct.pack('HL', len(program) // 8, ctypes.addressof(buffer))
+    sock.setsockopt(socket.SOL_SOCKET, SO_ATTACH_FILTER, fprog)
+
+
+def frame_headers(buf, offset, length):
+    """
+    Parse Ethernet/IPv4/TCP|UDP headers in place
+
+    Returns (protocol, src, dst, src_port, dst_port, payload_start,
+    payload_end) with addresses as 32-bit integers and offsets into
+    `buf`, or None for anything that is not an unfragmented IPv4 TCP or
+    UDP packet.
+    """
+    end = offset + length
+    ip = offset + 14
+    if length < 34:
+        return None
+    ethertype = ETHERTYPE.unpack_from(buf, offset + 12)[0]
+    if ethertype == ETH_P_8021Q:
+        ethertype = ETHERTYPE.unpack_from(buf, offset + 16)[0]
+        ip += 4
+    if ethertype != ETH_P_IP or ip + IPV4_HEADER.size > end:
+        return None
+    version_ihl, fragment, protocol, src, dst = IPV4_HEADER.unpack_from(buf, ip)
+    if version_ihl >> 4 != 4 or fragment & 0x1fff:
+        return None
+    transport = ip + (version_ihl & 0x0f) * 4
+    if protocol == IPPROTO_UDP:
+        start = transport + 8
+    elif protocol == IPPROTO_TCP:
+        if transport + 13 > end:
+            return None
+        start = transport + (buf[transport + 12] >> 4) * 4
+    else:
+        return None
+    if start > end:
+        return None
+    src_port, dst_port = PORTS.unpack_from(buf, transport)
+    return protocol, src, dst, src_port, dst_port, start, end
+
+
+class RingCapture:
+    """
+    A TPACKET_V3 receive ring on one interface
+
+        with RingCapture('eth0', tcp_ports=(554,)) as ring:
+            ring.run(on_frame, duration=10)
+
+    `on_frame(buf, offset, caplen, wirelen, timestamp)` gets the mmap'd
+    ring and the offset of the Ethernet header; it must not keep `buf`
+    slices beyond the call, since the block goes back to the kernel.
+    """
+
+    def __init__(self, interface, tcp_ports=(), udp_port_ranges=(), hosts=(),
+                 block_size=RING_BLOCK_SIZE, block_count=RING_BLOCK_COUNT,
+                 block_timeout=RING_BLOCK_TIMEOUT):
+        self.interface = interface
+        self.program = compile_filter(tcp_ports, udp_port_ranges, hosts) \
+            if tcp_ports or udp_port_ranges or hosts else None
+        self.block_size = block_size
+        self.block_count = block_count
+        self.block_timeout = block_timeout
+        self.sock = None
+        self.ring = None
+        self.block = 0
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def open(self):
+        # Protocol 0 receives nothing until bind, so the filter is in place first
+        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, 0)
+        try:
+            if self.program:
+                attach_filter(sock, self.program)
+            sock.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V3)
+            frames = self.block_size // RING_FRAME_SIZE * self.block_count
+            request = struct.pack('=7I', self.block_size, self.block_count, RING_FRAME_SIZE,
+                                  frames, self.block_timeout, 0, 0)
+            sock.setsockopt(SOL_PACKET, PACKET_RX_RING, request)
+            self.ring = mmap.mmap(sock.fileno(), self.block_size * self.block_count,
+                                  mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+            sock.bind((self.interface, ETH_P_ALL))
+        except OSError:
+            sock.close()
+            raise
+        self.sock = sock
+        self.block = 0
+        self.stats()  # reading resets the kernel counters
+
+    def close(self):
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def stats(self):
+        """(packets, drops) since the last call, as counted by the kernel"""
+        return struct.unpack('=II', self.sock.getsockopt(SOL_PACKET, PACKET_STATISTICS, 8))
+
+    def run(self, on_frame, duration, stop=None):
+        """
+        Hand every captured frame to `on_frame` for `duration` seconds
+
+        `stop`, an optional threading.Event, ends the capture early.
+        Returns the number of frames delivered.
+        """
+        ring = self.ring
+        poller = select.poll()
+        poller.register(self.sock, select.POLLIN | select.POLLERR)
+        read_block = BLOCK_HEADER.unpack_from
+        read_frame = FRAME_HEADER.unpack_from
+        deadline = time.monotonic() + duration
+        delivered = 0
+
+        while not (stop and stop.is_set()):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            base = self.block * self.block_size
+            status, count, first = read_block(ring, base + 8)
+            if not status & TP_STATUS_USER:
+                poller.poll(min(remaining, 0.25) * 1000)
+                continue
+
+            offset = base + first
+            for _ in range(count):
+                next_offset, sec, nsec, caplen, wirelen, _, mac = read_frame(ring, offset)
+                on_frame(ring, offset + mac, caplen, wirelen, sec + nsec * 1e-9)
+                offset += next_offset
+            delivered += count
+            BLOCK_STATUS.pack_into(ring, base + 8, TP_STATUS_KERNEL)
+            self.block = (self.block + 1) % self.block_count
+        return delivered
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Offline capture analysis for network_scanner.py
+
+Reads pcap and pcapng files through mmap, one record at a time, so a
+capture of any size is analysed without loading it or needing root.
+Each frame can be handed to the live stream detector (see
+NetworkStreamScanner.analyze_capture_file). Meanwhile, header fields are
+decoded in batches straight from the mapped bytes into NumPy structured
+arrays, and each batch is reduced vectorised into running per-flow
+totals and then dropped, so memory grows with the number of flows, not
+packets. Bitrate, packet rate and inter-arrival statistics come from
+those totals. NumPy is optional: without it frames are still
+classified, only the statistics are skipped.
+
+    python pcap_offline.py capture.pcapng
+"""
+
+import json
+import mmap
+import struct
+import sys
+
+BATCH_SIZE = 65536  # records decoded per NumPy batch
+
+PCAP_MAGICS = {
+    b'\xd4\xc3\xb2\xa1': ('<', 1e-6),
+    b'\xa1\xb2\xc3\xd4': ('>', 1e-6),
+    b'\x4d\x3c\xb2\xa1': ('<', 1e-9),
+    b'\xa1\xb2\x3c\x4d': ('>', 1e-9),
+}
+PCAPNG_SHB = 0x0A0D0D0A
+PCAPNG_IDB = 1
+PCAPNG_SPB = 3
+PCAPNG_EPB = 6
+PCAPNG_BYTE_ORDER = 0x1A2B3C4D
+IF_TSRESOL = 9
+
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+# Offset of the EtherType (None: always IPv4) and of the IP header per link type
+LINK_LAYERS = {
+    LINKTYPE_ETHERNET: (12, 14),
+    LINKTYPE_LINUX_SLL: (14, 16),
+    LINKTYPE_RAW: (None, 0),
+    LINKTYPE_IPV4: (None, 0),
+}
+
+_numpy = None
+
+
+def load_numpy():
+    """Import NumPy on first use; None when it is not installed"""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy or None
+
+
+def packet_dtype(np):
+    return np.dtype([('timestamp', 'f8'), ('size', 'u4'), ('src', 'u4'), ('dst', 'u4'),
+                     ('src_port', 'u2'), ('dst_port', 'u2'), ('protocol', 'u1')])
+
+
+def iter_records(buf):
+    """
+    Yield (data_offset, caplen, wirelen, timestamp, linktype) per packet
+
+    Handles classic pcap (either byte order, micro- or nanosecond) and
+    pcapng (section/interface blocks, enhanced and simple packet blocks).
+    Offsets point into `buf`; nothing is copied.
+    """
+    magic = bytes(buf[:4])
+    if magic in PCAP_MAGICS:
+        yield from _iter_pcap(buf, *PCAP_MAGICS[magic])
+    elif len(buf) >= 12 and struct.unpack_from('<I', buf, 0)[0] == PCAPNG_SHB:
+        yield from _iter_pcapng(buf)
+    else:
+        raise ValueError('not a pcap or pcapng file')
+
+
+def _iter_pcap(buf, order, resolution):
+    linktype = struct.unpack_from(order + 'I', buf, 20)[0]
+    record = struct.Struct(order + 'IIII')
+    offset, end = 24, len(buf)
+    while offset + 16 <= end:
+        seconds, fraction, caplen, wirelen = record.unpack_from(buf, offset)
+        offset += 16
+        if offset + caplen > end:
+            break  # truncated capture
+        yield offset, caplen, wirelen, seconds + fraction * resolution, linktype
+        offset += caplen
+
+
+def _iter_pcapng(buf):
+    order = '<'
+    interfaces = []
+    offset, end = 0, len(buf)
+    while offset + 12 <= end:
+        block_type = struct.unpack_from(order + 'I', buf, offset)[0]
+        if block_type == PCAPNG_SHB:
+            byte_order = struct.unpack_from('<I', buf, offset + 8)[0]
+            order = '<' if byte_order == PCAPNG_BYTE_ORDER else '>'
+            interfaces = []
+        length = struct.unpack_from(order + 'I', buf, offset + 4)[0]
+        if length < 12 or offset + length > end:
+            break
+        if block_type == PCAPNG_IDB:
+            linktype = struct.unpack_from(order + 'H', buf, offset + 8)[0]
+            interfaces.append((linktype, _pcapng_resolution(buf, order, offset + 16, offset + length - 4)))
+        elif block_type == PCAPNG_EPB:
+            interface, high, low, caplen, wirelen = struct.unpack_from(order + 'IIIII', buf, offset + 8)
+            linktype, resolution = interfaces[interface] if interface < len(interfaces) else (-1, 1e-6)
+            yield offset + 28, caplen, wirelen, ((high << 32) | low) * resolution, linktype
+        elif block_type == PCAPNG_SPB and interfaces:
+            wirelen = struct.unpack_from(order + 'I', buf, offset + 8)[0]
+            yield offset + 12, min(wirelen, length - 16), wirelen, 0.0, interfaces[0][0]
+        offset += length
+
+
+def _pcapng_resolution(buf, order, offset, end):
+    """if_tsresol option of an interface block, as seconds per tick"""
+    while offset + 4 <= end:
+        code, length = struct.unpack_from(order + 'HH', buf, offset)
+        if code == 0:
+            break
+        if code == IF_TSRESOL and length >= 1:
+            value = buf[offset + 4]
+            return 2.0 ** -(value & 0x7f) if value & 0x80 else 10.0 ** -value
+        offset += 4 + (length + 3) // 4 * 4
+    return 1e-6
+
+
+def decode_batch(np, data, offsets, caplens, wirelens, timestamps, linktypes):
+    """
+    Decode IPv4/TCP/UDP header fields of a batch of records at once
+
+    `data` is the whole capture as a uint8 array; the other arguments
+    are equally long arrays describing the records. Returns a structured
+    array of packet_dtype for the records that are IPv4.
+    """
+    limit = len(data)
+
+    def field(index, width):
+        index = np.minimum(index, limit - width)
+        value = data[index].astype(np.uint32)
+        for byte in range(1, width):
+            value = (value << 8) | data[index + byte]
+        return value
+
+    ip = offsets.copy()
+    ethertype = np.full(len(offsets), 0x0800, dtype=np.uint32)
+    known = np.zeros(len(offsets), dtype=bool)
+    for linktype, (type_offset, ip_offset) in LINK_LAYERS.items():
+        mask = linktypes == linktype
+        known |= mask
+        ip[mask] += ip_offset
+        if type_offset is not None:
+            ethertype[mask] = field(offsets[mask] + type_offset, 2)
+    vlan = (linktypes == LINKTYPE_ETHERNET) & (ethertype == 0x8100)
+    ethertype[vlan] = field(offsets[vlan] + 16, 2)
+    ip[vlan] += 4
+
+    header_end = offsets + caplens
+    version_ihl = field(ip, 1)
+    valid = known & (ethertype == 0x0800) & (version_ihl >> 4 == 4) & (ip + 20 <= header_end)
+    protocol = field(ip + 9, 1)
+    transport = ip + (version_ihl & 0x0f) * 4
+    has_ports = (valid & (field(ip + 6, 2) & 0x1fff == 0) & ((protocol == 6) | (protocol == 17))
+                 & (transport + 4 <= header_end))
+
+    packets = np.empty(int(valid.sum()), dtype=packet_dtype(np))
+    packets['timestamp'] = timestamps[valid]
+    packets['size'] = wirelens[valid]
+    packets['src'] = field(ip + 12, 4)[valid]
+    packets['dst'] = field(ip + 16, 4)[valid]
+    packets['protocol'] = protocol[valid]
+    packets['src_port'] = np.where(has_ports, field(transport, 2), 0)[valid]
+    packets['dst_port'] = np.where(has_ports, field(transport + 2, 2), 0)[valid]
+    return packets
+
+
+FLOW_KEY = ('protocol', 'src', 'dst', 'src_port', 'dst_port')
+
+
+def flow_dtype(np):
+    """Running totals of one flow: the 5-tuple, counters, time span and inter-arrival sums"""
+    return np.dtype([('protocol', 'u1'), ('src', 'u4'), ('dst', 'u4'), ('src_port', 'u2'),
+                     ('dst_port', 'u2'), ('packets', 'i8'), ('bytes', 'f8'), ('first', 'f8'),
+                     ('last', 'f8'), ('gap_sum', 'f8'), ('gap_square', 'f8'), ('gap_max', 'f8')])
+
+
+def flow_totals(np, packets):
+    """
+    Per-flow totals of a packet array, computed without a Python loop
+
+    Packets are grouped by 5-tuple and ordered by time within each flow
+    to sum their sizes and inter-arrival gaps. Returns an array of
+    flow_dtype, one row per flow.
+    """
+    if len(packets) == 0:
+        return np.empty(0, dtype=flow_dtype(np))
+    keys = np.empty(len(packets), dtype=[(name, packets.dtype[name]) for name in FLOW_KEY])
+    for name in FLOW_KEY:
+        keys[name] = packets[name]
+    flows, flow = np.unique(keys, return_inverse=True)
+    flow = flow.ravel()
+    count = len(flows)
+
+    order = np.lexsort((packets['timestamp'], flow))
+    flow_sorted = flow[order]
+    times = packets['timestamp'][order]
+    totals = np.empty(count, dtype=flow_dtype(np))
+    for name in FLOW_KEY:
+        totals[name] = flows[name]
+    totals['packets'] = np.bincount(flow, minlength=count)
+    totals['bytes'] = np.bincount(flow, weights=packets['size'], minlength=count)
+    starts = np.concatenate(([0], np.cumsum(totals['packets'])[:-1]))
+    totals['first'] = times[starts]
+    totals['last'] = times[starts + totals['packets'] - 1]
+
+    same_flow = flow_sorted[1:] == flow_sorted[:-1]
+    gaps = np.diff(times)[same_flow]
+    gap_flow = flow_sorted[1:][same_flow]
+    totals['gap_sum'] = np.bincount(gap_flow, weights=gaps, minlength=count)
+    totals['gap_square'] = np.bincount(gap_flow, weights=gaps * gaps, minlength=count)
+    gap_max = np.zeros(count)
+    np.maximum.at(gap_max, gap_flow, gaps)
+    totals['gap_max'] = gap_max
+    return totals
+
+
+def merge_flow_totals(np, totals, later):
+    """
+    Fold the flow totals of a later batch into the running totals
+
+    A flow present in both gains one more inter-arrival gap: from its
+    last packet so far to its first packet in the batch.
+    """
+    if len(totals) == 0:
+        return later
+    combined = np.concatenate((totals, later))
+    keys = np.empty(len(combined), dtype=[(name, combined.dtype[name]) for name in FLOW_KEY])
+    for name in FLOW_KEY:
+        keys[name] = combined[name]
+    flows, flow = np.unique(keys, return_inverse=True)
+    flow = flow.ravel()
+    count = len(flows)
+    earlier_flow, later_flow = flow[:len(totals)], flow[len(totals):]
+
+    merged = np.empty(count, dtype=flow_dtype(np))
+    for name in FLOW_KEY:
+        merged[name] = flows[name]
+    for name in ('packets', 'bytes', 'gap_sum', 'gap_square'):
+        merged[name] = np.bincount(flow, weights=combined[name], minlength=count)
+    merged['packets'] = np.rint(merged['packets'])
+    first = np.full(count, np.inf)
+    np.minimum.at(first, flow, combined['first'])
+    last = np.full(count, -np.inf)
+    np.maximum.at(last, flow, combined['last'])
+    gap_max = np.zeros(count)
+    np.maximum.at(gap_max, flow, combined['gap_max'])
+
+    seen = np.zeros(count, dtype=bool)
+    seen[earlier_flow] = True
+    previous_last = np.zeros(count)
+    previous_last[earlier_flow] = totals['last']
+    continued = seen[later_flow]
+    rows = later_flow[continued]
+    gaps = np.maximum(later['first'][continued] - previous_last[rows], 0.0)
+    np.add.at(merged['gap_sum'], rows, gaps)
+    np.add.at(merged['gap_square'], rows, gaps * gaps)
+    np.maximum.at(gap_max, rows, gaps)
+    merged['first'], merged['last'], merged['gap_max'] = first, last, gap_max
+    return merged
+
+
+def flow_statistics(np, packets):
+    """
+    Per-flow rates and inter-arrival statistics for a packet array
+
+    Duration, bitrate, packet rate and the mean, standard deviation and
+    maximum inter-arrival gap per 5-tuple. Returns dicts, busiest flow
+    first.
+    """
+    return flow_results(np, flow_totals(np, packets))
+
+
+def flow_results(np, totals):
+    """flow_statistics' dicts from flow totals, busiest flow first"""
+    if len(totals) == 0:
+        return []
+    packet_counts = totals['packets']
+    byte_counts = totals['bytes']
+    first = totals['first']
+    duration = totals['last'] - first
+    gap_counts = np.maximum(packet_counts - 1, 1)
+    gap_mean = totals['gap_sum'] / gap_counts
+    gap_square = totals['gap_square'] / gap_counts
+    gap_std = np.sqrt(np.maximum(gap_square - gap_mean * gap_mean, 0.0))
+    gap_max = totals['gap_max']
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bitrate = np.where(duration > 0, byte_counts * 8 / duration, 0.0)
+        packet_rate = np.where(duration > 0, (packet_counts - 1) / duration, 0.0)
+
+    results = []
+    for index in np.argsort(-byte_counts, kind='stable'):
+        key = totals[index]
+        results.append({
+            'transport': {6: 'TCP', 17: 'UDP'}.get(int(key['protocol']), str(key['protocol'])),
+            'src_ip': '.'.join(str(int(key['src']) >> shift & 0xff) for shift in (24, 16, 8, 0)),
+            'dst_ip': '.'.join(str(int(key['dst']) >> shift & 0xff) for shift in (24, 16, 8, 0)),
+            'src_port': int(key['src_port']),
+            'dst_port': int(key['dst_port']),
+            'packets': int(packet_counts[index]),
+            'bytes': int(byte_counts[index]),
+            'first_seen': float(first[index]),
+            'duration': round(float(duration[index]), 6),
+            'bitrate_bps': round(float(bitrate[index]), 1),
+            'packet_rate': round(float(packet_rate[index]), 2),
+            'interarrival_mean': round(float(gap_mean[index]), 6),
+            'interarrival_std': round(float(gap_std[index]), 6),
+            'interarrival_max': round(float(gap_max[index]), 6),
+        })
+    return results
+
+
+def analyze(path, on_frame=None, batch_size=BATCH_SIZE):
+    """
+    Analyse a capture file in one streaming pass
+
+    `on_frame(buf, offset, caplen, wirelen, timestamp)` gets every
+    Ethernet frame, as packet_ring.RingCapture would deliver it. Returns
+    {'format', 'packets', 'ethernet_frames', 'flows'}, where flows is
+    flow_statistics over every IPv4 packet (None without NumPy). Gaps
+    between batches assume records are stored in time order, as
+    capture tools write them.
+    """
+    np = load_numpy()
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        data = np.frombuffer(buf, dtype=np.uint8) if np else None
+        totals = np.empty(0, dtype=flow_dtype(np)) if np else None
+        batch = ([], [], [], [], [])
+        packets = frames = 0
+
+        def flush():
+            nonlocal totals
+            if batch[0]:
+                arrays = [np.array(column) for column in batch]
+                totals = merge_flow_totals(np, totals, flow_totals(np, decode_batch(np, data, *arrays)))
+                for column in batch:
+                    column.clear()
+
+        for record in iter_records(buf):
+            offset, caplen, wirelen, timestamp, linktype = record
+            packets += 1
+            if on_frame and linktype == LINKTYPE_ETHERNET:
+                frames += 1
+                on_frame(buf, offset, caplen, wirelen, timestamp)
+            if np:
+                for column, value in zip(batch, record):
+                    column.append(value)
+                if len(batch[0]) >= batch_size:
+                    flush()
+
+        flows = None
+        if np:
+            flush()
+            flows = flow_results(np, totals)
+            del data  # release the exported mmap buffer before closing
+        return {
+            'format': 'pcap' if bytes(buf[:4]) in PCAP_MAGICS else 'pcapng',
+            'packets': packets,
+            'ethernet_frames': frames,
+            'flows': flows
+        }
+
+
+def main():
+    if len(sys.argv) != 2:
+        print(f"usage: {sys.argv[0]} <capture.pcap|capture.pcapng>")
+        return 2
+    result = analyze(sys.argv[1])
+    if result['flows'] is None:
+        print("⚠️  NumPy not installed: per-flow statistics skipped")
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
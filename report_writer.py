@@ -0,0 +1,103 @@
+"""
+Streaming JSON and NDJSON output for network_scanner reports
+
+A report is a sequence of (key, value) sections. Plain values are
+encoded in one go. Iterators are written as arrays and Fields as objects,
+one element at a time, so the output file is the only place the whole
+document ever exists. Values are encoded with orjson when it is
+installed and with the standard json module otherwise.
+"""
+
+import json
+from collections.abc import Iterator
+
+_orjson = None
+
+
+def load_orjson():
+    """orjson if installed, else None (the json module is used instead)"""
+    global _orjson
+    if _orjson is None:
+        try:
+            import orjson
+            _orjson = orjson
+        except ImportError:
+            _orjson = False
+    return _orjson or None
+
+
+class Fields:
+    """A JSON object written field by field from an iterable of (key, value) pairs"""
+
+    __slots__ = ('pairs',)
+
+    def __init__(self, pairs):
+        self.pairs = pairs
+
+
+def dumps(value):
+    """Compact UTF-8 JSON for one value; unknown types are written as strings"""
+    orjson = load_orjson()
+    if orjson:
+        try:
+            return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass  # e.g. integers beyond 64 bits: let json have a go
+    return json.dumps(value, default=str, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def write_value(f, value):
+    if isinstance(value, Fields):
+        f.write(b'{')
+        for index, (key, item) in enumerate(value.pairs):
+            if index:
+                f.write(b',')
+            f.write(dumps(str(key)))
+            f.write(b':')
+            write_value(f, item)
+        f.write(b'}')
+    elif isinstance(value, Iterator):
+        f.write(b'[')
+        for index, item in enumerate(value):
+            f.write(b',\n' if index else b'\n')
+            write_value(f, item)
+        f.write(b']')
+    else:
+        f.write(dumps(value))
+
+
+def write_json(f, sections):
+    """Write the sections as one JSON object to binary file `f`, a line per section"""
+    f.write(b'{')
+    for index, (key, value) in enumerate(sections):
+        f.write(b',\n' if index else b'\n')
+        f.write(dumps(key))
+        f.write(b': ')
+        write_value(f, value)
+    f.write(b'\n}\n')
+
+
+def write_ndjson(f, sections):
+    """
+    Write the sections as NDJSON: one {"section", "data"} line per plain
+    value, and per element of an iterator or field of a Fields
+    """
+    for key, value in sections:
+        if isinstance(value, Fields):
+            items = ({'key': str(field), 'value': materialise(item)} for field, item in value.pairs)
+        elif isinstance(value, Iterator):
+            items = (materialise(item) for item in value)
+        else:
+            items = (value,)
+        for item in items:
+            f.write(dumps({'section': key, 'data': item}))
+            f.write(b'\n')
+
+
+def materialise(value):
+    """The value with every Fields turned into a dict and every iterator into a list"""
+    if isinstance(value, Fields):
+        return {key: materialise(item) for key, item in value.pairs}
+    if isinstance(value, Iterator):
+        return [materialise(item) for item in value]
+    return value
@@ -0,0 +1,271 @@
+"""
+RTP stream tracking for network_scanner.py
+
+Parses the fixed RTP header of UDP payloads and keeps one small record
+per (source address, SSRC). Every update is O(1):
+- sequence numbers are extended across wraps (RFC 3550 A.1) to count
+  expected versus received packets, which gives the loss
+- interarrival jitter follows RFC 3550 6.4.1 (J += (|D| - J) / 16)
+- bitrate comes from byte counts and first/last arrival
+
+Non-RTP UDP is rejected by the header checks in parse_rtp before any
+stream state is looked up. A new SSRC only counts as a stream once a
+second packet arrives with the next sequence number (RFC 3550 A.1
+probation), so the odd random datagram never shows up as a stream.
+Likewise a big sequence jump in an established stream is only taken as
+a restart once the packet after it follows on; a lone stray datagram
+is dropped without touching the loss, byte or jitter accounting.
+
+Sequence numbers belong to the SSRC, so packets of every payload type
+count towards loss. Jitter only follows the stream's own payload type:
+RFC 4733 DTMF events and RED/FEC packets interleaved on the same SSRC
+repeat or reuse timestamps and would distort it. A payload type that
+keeps arriving on its own is taken as a codec change.
+"""
+
+import socket
+import struct
+from collections import OrderedDict
+
+RTP_MAX_STREAMS = 4096       # SSRCs tracked at once
+RTP_IDLE_TIMEOUT = 60.0      # seconds without a packet before a stream is dropped
+RTP_MAX_DROPOUT = 3000       # sequence jump still treated as loss, not a restart
+RTP_MAX_MISORDER = 100       # sequence step back still treated as reordering
+RTP_PAYLOAD_SWITCH = 50      # packets in a row of another payload type that mean a codec change
+RTP_HEADER = struct.Struct('!BBHII')
+
+# Payload types that can never be RTP: these byte values are RTCP packet types
+RTCP_PAYLOAD_TYPES = range(72, 77)
+# UDP ports that carry well-known non-RTP protocols
+NON_RTP_PORTS = frozenset((53, 67, 68, 123, 137, 138, 161, 1900, 3702, 5353))
+
+# RTP clock rates of the static payload types (RFC 3551); dynamic ones assume video
+CLOCK_RATES = {0: 8000, 3: 8000, 4: 8000, 8: 8000, 9: 8000, 10: 44100, 11: 44100,
+               14: 90000, 18: 8000, 26: 90000, 31: 90000, 32: 90000, 33: 90000, 34: 90000}
+PAYLOAD_NAMES = {0: 'PCMU', 8: 'PCMA', 9: 'G722', 14: 'MPA', 18: 'G729', 26: 'JPEG',
+                 31: 'H261', 32: 'MPV', 33: 'MP2T', 34: 'H263'}
+DYNAMIC_CLOCK_RATE = 90000
+
+
+def parse_rtp(buf, start, end):
+    """(payload_type, sequence, timestamp, ssrc) of an RTP header at buf[start:end], or None"""
+    if end - start < 12:
+        return None
+    first, second, sequence, timestamp, ssrc = RTP_HEADER.unpack_from(buf, start)
+    if first >> 6 != 2:
+        return None
+    payload_type = second & 0x7f
+    if payload_type in RTCP_PAYLOAD_TYPES:
+        return None
+    if end - start < 12 + 4 * (first & 0x0f):
+        return None
+    return payload_type, sequence, timestamp, ssrc
+
+
+class RtpStream:
+    """Receiver state for one SSRC"""
+
+    __slots__ = ('source', 'ssrc', 'payload_type', 'clock_rate', 'destination', 'dst_port',
+                 'probation', 'base_seq', 'max_seq', 'cycles', 'received', 'bytes',
+                 'first_seen', 'last_seen', 'last_arrival', 'last_timestamp', 'jitter', 'other_run',
+                 'bad_seq')
+
+    def __init__(self, source, ssrc, payload_type, sequence, destination, dst_port, arrival):
+        self.source = source
+        self.ssrc = ssrc
+        self.payload_type = payload_type
+        self.clock_rate = CLOCK_RATES.get(payload_type, DYNAMIC_CLOCK_RATE)
+        self.destination = destination
+        self.dst_port = dst_port
+        self.probation = 1
+        self.base_seq = sequence
+        self.max_seq = sequence
+        self.cycles = 0
+        self.received = 0
+        self.bytes = 0
+        self.first_seen = arrival
+        self.last_seen = arrival
+        self.last_arrival = None
+        self.last_timestamp = 0
+        self.jitter = 0.0
+        self.other_run = 0  # consecutive packets with another payload type
+        self.bad_seq = None  # sequence after a big jump; a restart only if the next packet follows it
+
+    @property
+    def expected(self):
+        return self.cycles + self.max_seq - self.base_seq + 1
+
+    @property
+    def lost(self):
+        return max(0, self.expected - self.received)
+
+    def summary(self):
+        duration = self.last_seen - self.first_seen
+        expected = self.expected
+        return {
+            'ssrc': f'0x{self.ssrc:08x}',
+            'src_ip': socket.inet_ntoa(struct.pack('!I', self.source)),
+            'dst_ip': socket.inet_ntoa(struct.pack('!I', self.destination)),
+            'dst_port': self.dst_port,
+            'payload_type': self.payload_type,
+            'codec': PAYLOAD_NAMES.get(self.payload_type, 'dynamic' if self.payload_type >= 96 else 'unknown'),
+            'packets': self.received,
+            'bytes': self.bytes,
+            'duration': round(duration, 3),
+            'bitrate_bps': round(self.bytes * 8 / duration, 1) if duration > 0 else 0.0,
+            'packets_expected': expected,
+            'packets_lost': self.lost,
+            'loss_ratio': round(self.lost / expected, 4) if expected > 0 else 0.0,
+            'jitter_ms': round(self.jitter / self.clock_rate * 1000, 3)
+        }
+
+
+class RtpTracker:
+    """
+    (source address, SSRC) -> RtpStream, with idle and size-bound eviction
+
+    `on_confirmed(stream)` fires once per stream when it leaves probation.
+    """
+
+    def __init__(self, max_streams=RTP_MAX_STREAMS, idle_timeout=RTP_IDLE_TIMEOUT, on_confirmed=None):
+        self.max_streams = max_streams
+        self.idle_timeout = idle_timeout
+        self.on_confirmed = on_confirmed
+        self.streams = OrderedDict()
+        self.rejected = 0
+        self.next_expiry = 0.0
+
+    def __len__(self):
+        return len(self.streams)
+
+    def observe(self, buf, start, end, src, dst, src_port, dst_port, arrival):
+        """
+        Account one UDP payload; return True if it is RTP of a confirmed stream
+
+        `buf[start:end]` is the UDP payload and `arrival` its capture
+        time in seconds.
+        """
+        if src_port in NON_RTP_PORTS or dst_port in NON_RTP_PORTS:
+            self.rejected += 1
+            return False
+        header = parse_rtp(buf, start, end)
+        if header is None:
+            self.rejected += 1
+            return False
+        payload_type, sequence, timestamp, ssrc = header
+
+        key = (src, ssrc)
+        stream = self.streams.get(key)
+        if stream is None:
+            if len(self.streams) >= self.max_streams:
+                self.streams.popitem(last=False)
+            stream = self.streams[key] = RtpStream(src, ssrc, payload_type, sequence, dst, dst_port, arrival)
+        else:
+            self.streams.move_to_end(key)
+            if not self._update_sequence(stream, sequence, arrival):
+                return stream.probation == 0
+
+        stream.received += 1
+        stream.bytes += end - start
+        stream.last_seen = arrival
+
+        if payload_type != stream.payload_type:
+            stream.other_run += 1
+            if stream.other_run >= RTP_PAYLOAD_SWITCH:
+                # The sender changed codec: follow the new payload type from here
+                stream.payload_type = payload_type
+                stream.clock_rate = CLOCK_RATES.get(payload_type, DYNAMIC_CLOCK_RATE)
+                stream.last_arrival = None
+                stream.other_run = 0
+        else:
+            stream.other_run = 0
+
+        # RFC 3550 6.4.1 interarrival jitter, in timestamp units
+        if payload_type == stream.payload_type:
+            if stream.last_arrival is not None:
+                elapsed = (timestamp - stream.last_timestamp) & 0xffffffff
+                if elapsed >= 0x80000000:
+                    elapsed -= 0x100000000
+                difference = (arrival - stream.last_arrival) * stream.clock_rate - elapsed
+                stream.jitter += (abs(difference) - stream.jitter) / 16
+            stream.last_arrival = arrival
+            stream.last_timestamp = timestamp
+
+        if arrival >= self.next_expiry:
+            self.expire(arrival)
+        return stream.probation == 0
+
+    def _update_sequence(self, stream, sequence, arrival):
+        """RFC 3550 A.1 sequence bookkeeping; False for duplicates and stray packets"""
+        delta = (sequence - stream.max_seq) & 0xffff
+        if stream.probation:
+            if delta == 1:
+                stream.probation = 0
+                if sequence < stream.max_seq:
+                    stream.cycles += 0x10000
+                stream.max_seq = sequence
+                if self.on_confirmed:
+                    self.on_confirmed(stream)
+                return True
+            # Not sequential: start probation again from this packet
+            self._resync(stream, sequence, arrival)
+            return True
+        if 0 < delta < RTP_MAX_DROPOUT:
+            if sequence < stream.max_seq:
+                stream.cycles += 0x10000
+            stream.max_seq = sequence
+            stream.bad_seq = None
+            return True
+        if delta == 0 or delta > 0x10000 - RTP_MAX_MISORDER:
+            # Duplicate or reordered: counts as received, does not move max_seq
+            stream.received += 1
+            return False
+        if sequence != stream.bad_seq:
+            # A big jump: remember it and drop the packet unless the next one confirms it
+            stream.bad_seq = (sequence + 1) & 0xffff
+            return False
+        # Two sequential packets after the jump: the sender restarted
+        self._resync(stream, sequence, arrival)
+        return True
+
+    @staticmethod
+    def _resync(stream, sequence, arrival):
+        """Restart loss, byte and jitter accounting at this packet"""
+        stream.base_seq = stream.max_seq = sequence
+        stream.cycles = 0
+        stream.received = 0
+        stream.bytes = 0
+        stream.first_seen = arrival
+        stream.last_arrival = None
+        stream.bad_seq = None
+
+    def merge(self, streams):
+        """Adopt RtpStream records tracked elsewhere; the busier one wins a clash"""
+        for stream in sorted(streams, key=lambda stream: stream.last_seen):
+            key = (stream.source, stream.ssrc)
+            current = self.streams.get(key)
+            if current is not None and current.received > stream.received:
+                continue
+            if current is None and len(self.streams) >= self.max_streams:
+                self.streams.popitem(last=False)
+            self.streams[key] = stream
+            self.streams.move_to_end(key)
+
+    def expire(self, now):
+        """Drop streams idle for longer than idle_timeout"""
+        self.next_expiry = now + 1.0
+        cutoff = now - self.idle_timeout
+        while self.streams:
+            stream = next(iter(self.streams.values()))
+            if stream.last_seen >= cutoff:
+                break
+            self.streams.popitem(last=False)
+
+    def summaries(self):
+        """Summaries of the confirmed streams, grouped by source address"""
+        by_source = {}
+        for stream in self.streams.values():
+            if stream.probation == 0:
+                summary = stream.summary()
+                by_source.setdefault(summary['src_ip'], []).append(summary)
+        return by_source
@@ -0,0 +1,167 @@
+"""
+Persistent scan result cache for network_scanner.py
+
+Keeps hosts, open ports, identification results and per-host RTT in a
+local SQLite file, each with its own timestamp. A rescan only re-probes
+what is stale or what changed: ports expire after PORTS_TTL and device
+identities after IDENTITY_TTL. A host whose liveness flipped, or whose
+open ports changed, is always probed again.
+
+Every row is keyed by network as well as address: the caller passes a
+network key (see NetworkStreamScanner.cache_network) that names the
+interface too, so the same private address behind two interfaces or
+VLANs keeps its own ports and identity.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+
+PORTS_TTL = 30 * 60            # seconds before a host's open ports are rescanned
+IDENTITY_TTL = 24 * 60 * 60    # seconds before a device is re-identified
+SCHEMA_VERSION = 2             # PRAGMA user_version; older caches are dropped and rebuilt
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hosts (
+    network TEXT NOT NULL,
+    ip TEXT NOT NULL,
+    mac TEXT,
+    alive INTEGER NOT NULL,
+    last_seen REAL,
+    srtt REAL,
+    rttvar REAL,
+    rtt_samples INTEGER,
+    PRIMARY KEY (network, ip)
+);
+CREATE TABLE IF NOT EXISTS ports (
+    network TEXT NOT NULL,
+    ip TEXT NOT NULL,
+    open_ports TEXT NOT NULL,
+    scanned_at REAL NOT NULL,
+    PRIMARY KEY (network, ip)
+);
+CREATE TABLE IF NOT EXISTS identities (
+    network TEXT NOT NULL,
+    ip TEXT NOT NULL,
+    ports_key TEXT NOT NULL,
+    device_info TEXT NOT NULL,
+    identified_at REAL NOT NULL,
+    PRIMARY KEY (network, ip)
+);
+"""
+
+
+def ports_key(open_ports):
+    return ','.join(str(port) for port in sorted(open_ports))
+
+
+class ScanCache:
+    """SQLite-backed cache shared by every phase of a scan"""
+
+    def __init__(self, path, ports_ttl=PORTS_TTL, identity_ttl=IDENTITY_TTL):
+        self.path = path
+        self.ports_ttl = ports_ttl
+        self.identity_ttl = identity_ttl
+        self.lock = threading.Lock()
+        # Scans may run on a background thread (see device_api.py)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        if self.db.execute('PRAGMA user_version').fetchone()[0] < SCHEMA_VERSION:
+            # Rows keyed by address alone cannot be told apart by network: start over
+            self.db.executescript('DROP TABLE IF EXISTS hosts; DROP TABLE IF EXISTS ports; '
+                                  'DROP TABLE IF EXISTS identities;')
+            self.db.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+    def update_hosts(self, network, alive, macs=None, rtt_state=None, now=None):
+        """
+        Record which hosts of `network` are alive now; return those whose
+        liveness changed since the last scan (new, returned or gone)
+        """
+        now = now or time.time()
+        macs = macs or {}
+        rtt_state = rtt_state or {}
+        alive = set(alive)
+        with self.lock, self.db:
+            previous = dict(self.db.execute(
+                'SELECT ip, alive FROM hosts WHERE network = ?', (network,)))
+            changed = {ip for ip in alive if not previous.get(ip)}
+            changed |= {ip for ip, was_alive in previous.items() if was_alive and ip not in alive}
+
+            for ip in alive:
+                srtt, rttvar, samples = rtt_state.get(ip, (None, None, None))
+                self.db.execute(
+                    'INSERT INTO hosts (network, ip, mac, alive, last_seen, srtt, rttvar, rtt_samples) '
+                    'VALUES (?, ?, ?, 1, ?, ?, ?, ?) '
+                    'ON CONFLICT(network, ip) DO UPDATE SET '
+                    'mac = COALESCE(excluded.mac, hosts.mac), alive = 1, last_seen = excluded.last_seen, '
+                    'srtt = COALESCE(excluded.srtt, hosts.srtt), '
+                    'rttvar = COALESCE(excluded.rttvar, hosts.rttvar), '
+                    'rtt_samples = COALESCE(excluded.rtt_samples, hosts.rtt_samples)',
+                    (network, ip, macs.get(ip), now, srtt, rttvar, samples))
+            gone = [(network, ip) for ip in previous if ip not in alive]
+            self.db.executemany('UPDATE hosts SET alive = 0 WHERE network = ? AND ip = ?', gone)
+        return changed
+
+    def alive_hosts(self, network):
+        """Hosts of `network` that were alive at the end of the last scan"""
+        with self.lock:
+            rows = self.db.execute(
+                'SELECT ip FROM hosts WHERE network = ? AND alive = 1', (network,)).fetchall()
+        return {ip for ip, in rows}
+
+    def rtt_state(self):
+        """{ip: [srtt, rttvar, samples]} to seed the RTT estimator after a restart"""
+        # An address cached under several networks takes its latest sighting
+        with self.lock:
+            rows = self.db.execute(
+                'SELECT ip, srtt, rttvar, rtt_samples FROM hosts WHERE srtt IS NOT NULL '
+                'ORDER BY last_seen').fetchall()
+        return {ip: [srtt, rttvar, samples or 1] for ip, srtt, rttvar, samples in rows}
+
+    def macs(self):
+        with self.lock:
+            return dict(self.db.execute('SELECT ip, mac FROM hosts WHERE mac IS NOT NULL ORDER BY last_seen'))
+
+    def fresh_ports(self, network, ip, now=None):
+        """Cached open ports of `ip` in `network` if scanned within ports_ttl, else None"""
+        now = now or time.time()
+        with self.lock:
+            row = self.db.execute(
+                'SELECT open_ports, scanned_at FROM ports WHERE network = ? AND ip = ?',
+                (network, ip)).fetchone()
+        if row is None or now - row[1] > self.ports_ttl:
+            return None
+        return json.loads(row[0])
+
+    def store_ports(self, network, open_ports_by_host, now=None):
+        now = now or time.time()
+        with self.lock, self.db:
+            self.db.executemany(
+                'INSERT OR REPLACE INTO ports (network, ip, open_ports, scanned_at) VALUES (?, ?, ?, ?)',
+                [(network, ip, json.dumps(ports), now) for ip, ports in open_ports_by_host.items()])
+
+    def fresh_identity(self, network, ip, open_ports, now=None):
+        """Cached device_info if identified within identity_ttl with the same ports"""
+        now = now or time.time()
+        with self.lock:
+            row = self.db.execute(
+                'SELECT ports_key, device_info, identified_at FROM identities WHERE network = ? AND ip = ?',
+                (network, ip)).fetchone()
+        if row is None or row[0] != ports_key(open_ports) or now - row[2] > self.identity_ttl:
+            return None
+        return json.loads(row[1])
+
+    def store_identities(self, network, devices, open_ports_by_host, now=None):
+        now = now or time.time()
+        with self.lock, self.db:
+            self.db.executemany(
+                'INSERT OR REPLACE INTO identities (network, ip, ports_key, device_info, identified_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [(network, ip, ports_key(open_ports_by_host[ip]), json.dumps(dict(info), default=str), now)
+                 for ip, info in devices.items()])
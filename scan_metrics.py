@@ -0,0 +1,180 @@
+"""
+Per-phase scan instrumentation for network_scanner.py
+
+Every probe the scanner makes is timed into the histogram of its phase
+(discovery, port scan, HTTP and RTSP identification, capture) with
+counters for how many succeeded, timed out or failed. Histograms have
+fixed bucket bounds, so recording is O(log buckets) and the metrics of
+shard processes can simply be added together. summary() is what the
+report's performance section and /api/scan/metrics show.
+"""
+
+import bisect
+import threading
+import time
+
+PHASES = ('discovery', 'port_scan', 'http_identify', 'rtsp_identify', 'capture')
+# Upper bounds of the histogram buckets in seconds; one more bucket catches the rest
+METRIC_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def is_timeout(error):
+    """Whether an exception from a probe means the peer did not answer in time"""
+    return isinstance(error, TimeoutError) or 'Timeout' in type(error).__name__
+
+
+class Histogram:
+    """Durations counted into METRIC_BUCKETS, plus their sum, minimum and maximum"""
+
+    __slots__ = ('counts', 'total', 'minimum', 'maximum')
+
+    def __init__(self):
+        self.counts = [0] * (len(METRIC_BUCKETS) + 1)
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = None
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(METRIC_BUCKETS, value)] += 1
+        self.total += value
+        self.minimum = value if self.minimum is None else min(self.minimum, value)
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+
+    def merge(self, other):
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.total += other.total
+        for value in (other.minimum, other.maximum):
+            if value is not None:
+                self.minimum = value if self.minimum is None else min(self.minimum, value)
+                self.maximum = value if self.maximum is None else max(self.maximum, value)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (the maximum for the last one)"""
+        target = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= target:
+                return METRIC_BUCKETS[index] if index < len(METRIC_BUCKETS) else self.maximum
+        return None
+
+    def summary(self):
+        count = self.count
+        milliseconds = lambda value: round(value * 1000, 3) if value is not None else None
+        return {
+            'count': count,
+            'mean_ms': milliseconds(self.total / count) if count else None,
+            'min_ms': milliseconds(self.minimum),
+            'max_ms': milliseconds(self.maximum),
+            'p50_ms': milliseconds(self.quantile(0.5)),
+            'p90_ms': milliseconds(self.quantile(0.9)),
+            'p99_ms': milliseconds(self.quantile(0.99)),
+            'buckets': {f'le_{bound * 1000:g}ms': n for bound, n in zip(METRIC_BUCKETS, self.counts)
+                        if n} | ({'le_inf': self.counts[-1]} if self.counts[-1] else {})
+        }
+
+
+class PhaseMetrics:
+    """Histogram and outcome counters of one scan phase"""
+
+    __slots__ = ('durations', 'ok', 'timeouts', 'errors', 'items', 'first_start', 'last_end')
+
+    def __init__(self):
+        self.durations = Histogram()
+        self.ok = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.items = 0
+        self.first_start = None
+        self.last_end = None
+
+
+class ScanMetrics:
+    """
+    PhaseMetrics for every phase in PHASES, safe to record from threads
+
+        started = time.perf_counter()
+        ok = probe()
+        metrics.observe('port_scan', time.perf_counter() - started, ok)
+
+    An observation that is not ok counts as a timeout unless failed()
+    recorded an error for it. `items` counts what an observation
+    covered, e.g. packets for a capture.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.phases = {phase: PhaseMetrics() for phase in PHASES}
+
+    def __getstate__(self):
+        return self.phases
+
+    def __setstate__(self, phases):
+        self.lock = threading.Lock()
+        self.phases = phases
+
+    def observe(self, phase, duration, ok=True, items=1, timed_out=None):
+        """Record one probe; `timed_out` defaults to `not ok`"""
+        end = time.time()
+        with self.lock:
+            metrics = self.phases[phase]
+            metrics.durations.observe(duration)
+            metrics.items += items
+            if ok:
+                metrics.ok += 1
+            elif timed_out is None or timed_out:
+                metrics.timeouts += 1
+            if metrics.first_start is None or end - duration < metrics.first_start:
+                metrics.first_start = end - duration
+            metrics.last_end = max(metrics.last_end or end, end)
+
+    def failed(self, phase, error):
+        """Count a probe that raised: as a timeout or as an error"""
+        with self.lock:
+            if is_timeout(error):
+                self.phases[phase].timeouts += 1
+            else:
+                self.phases[phase].errors += 1
+
+    def merge(self, other):
+        """Add another ScanMetrics, e.g. from a scan shard, to this one"""
+        with self.lock:
+            for phase, theirs in other.phases.items():
+                mine = self.phases[phase]
+                mine.durations.merge(theirs.durations)
+                mine.ok += theirs.ok
+                mine.timeouts += theirs.timeouts
+                mine.errors += theirs.errors
+                mine.items += theirs.items
+                if theirs.first_start is not None:
+                    mine.first_start = min(mine.first_start or theirs.first_start, theirs.first_start)
+                    mine.last_end = max(mine.last_end or theirs.last_end, theirs.last_end)
+
+    def summary(self):
+        """
+        Per-phase counts, durations and histograms; `busy_s` sums probe
+        durations (overlapping probes all count), `wall_s` spans the
+        first probe's start to the last one's end
+        """
+        with self.lock:
+            phases = {}
+            for phase, metrics in self.phases.items():
+                phases[phase] = {
+                    'probes': metrics.durations.count,
+                    'items': metrics.items,
+                    'ok': metrics.ok,
+                    'timeouts': metrics.timeouts,
+                    'errors': metrics.errors,
+                    'busy_s': round(metrics.durations.total, 3),
+                    'wall_s': round(metrics.last_end - metrics.first_start, 3) if metrics.first_start else 0.0,
+                    'durations': metrics.durations.summary()
+                }
+        busy = sum(phase['busy_s'] for phase in phases.values())
+        for phase in phases.values():
+            phase['busy_share'] = round(phase['busy_s'] / busy, 3) if busy else 0.0
+        dominant = max(phases, key=lambda phase: phases[phase]['busy_s']) if busy else None
+        return {'dominant_phase': dominant, 'phases': phases}
@@ -0,0 +1,16 @@
+"""
+Shared setup for the test suite
+
+The modules under test live flat in the repository root, the responder
+stub in tools/ and the synthetic traffic builders in benchmarks/harness.py;
+all three directories go on sys.path. Run with `python -m pytest` from
+the repository root.
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for directory in (ROOT, os.path.join(ROOT, 'benchmarks'), os.path.join(ROOT, 'tools')):
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
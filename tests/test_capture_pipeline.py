@@ -0,0 +1,91 @@
+import os
+import time
+
+import capture_pipeline
+from capture_pipeline import CapturePipeline, ShardRing
+from harness import frame
+
+
+class PortCounter:
+    """Classifier stand-in: counts frames per UDP destination port"""
+
+    def __init__(self):
+        self.ports = {}
+
+    def analyze_frame(self, buf, offset, caplen, wirelen, timestamp):
+        port = int.from_bytes(buf[offset + 36:offset + 38], 'big')
+        self.ports[port] = self.ports.get(port, 0) + 1
+
+    def capture_results(self):
+        return self.ports
+
+
+class FakeCapture:
+    """Delivers frames in two bursts with an idle gap, like a quiet link"""
+
+    def __init__(self, frames):
+        self.frames = frames
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, on_frame, duration, stop):
+        half = len(self.frames) // 2
+        for burst in (self.frames[:half], self.frames[half:]):
+            for index, data in enumerate(burst):
+                on_frame(data, 0, len(data), len(data), float(index))
+            time.sleep(0.3)
+        return len(self.frames)
+
+    def stats(self):
+        return len(self.frames), 0
+
+
+def test_ring_wraps_and_survives_pickling():
+    import pickle
+
+    producer = ShardRing(4096)
+    try:
+        consumer = pickle.loads(pickle.dumps(producer))
+        data = frame('10.0.0.1', '10.0.0.2', 17, 1, 5004, bytes(100))
+        seen = []
+        for _ in range(200):
+            assert producer.put(data, 0, len(data), len(data), 1.0)
+            assert consumer.drain(lambda buf, offset, caplen, *_: seen.append(buf[offset:offset + caplen])) == 1
+        assert seen == [data] * 200
+        consumer.close()
+    finally:
+        producer.close()
+    assert not os.path.exists(producer.path)
+
+
+def test_full_ring_drops():
+    ring = ShardRing(1024)
+    try:
+        data = bytes(200)
+        results = [ring.put(data, 0, len(data), len(data), 0.0) for _ in range(10)]
+        assert results.count(True) == 4 and ring.dropped == 6
+    finally:
+        ring.close()
+
+
+def test_pipeline_decodes_every_frame():
+    frames = [frame('10.0.0.1', '10.0.0.2', 17, 40000 + index % 7, 5000 + index % 3, bytes(20))
+              for index in range(3000)]
+    pipeline = CapturePipeline(FakeCapture(frames), PortCounter, workers=2, ring_size=1 << 20)
+    stats, results = pipeline.run(duration=5)
+    assert stats['delivered'] == 3000 and stats['queue_dropped'] == 0
+    assert sum(stats['shard_decoded']) == 3000
+    totals = {}
+    for ports in results:
+        for port, count in ports.items():
+            totals[port] = totals.get(port, 0) + count
+    assert totals == {5000: 1000, 5001: 1000, 5002: 1000}
+    assert not any(os.path.exists(shard.path) for shard in pipeline.shards)
+
+
+def test_decoders_start_without_fork():
+    assert capture_pipeline.process_context().get_start_method() in ('forkserver', 'spawn')
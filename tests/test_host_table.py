@@ -0,0 +1,70 @@
+import ipaddress
+import pickle
+
+import pytest
+
+from host_table import DeviceRecord, HostTable
+
+PORTS = (80, 443, 554, 8080)
+
+
+def test_add_contains_and_order():
+    table = HostTable(PORTS)
+    for ip in ('10.0.1.5', '10.0.0.7', '10.0.1.5', '10.0.16.1'):
+        table.add(ip)
+    assert len(table) == 3
+    assert list(table) == ['10.0.0.7', '10.0.1.5', '10.0.16.1']
+    assert '10.0.0.7' in table and '10.0.0.8' not in table
+    assert not table.add('10.0.0.7')
+    assert list(table.hosts_in(ipaddress.IPv4Network('10.0.0.0/24'))) == ['10.0.0.7']
+
+
+def test_ports_keep_only_known_ports():
+    table = HostTable(PORTS)
+    table.set_ports('10.0.0.7', [554, 22, 80])
+    assert table.get_ports('10.0.0.7') == [80, 554]
+    assert table.get_ports('10.0.0.8') == []
+    table.set_ports('10.0.0.7', [])
+    assert table.get_ports('10.0.0.7') == []
+
+
+def test_update_merges_and_recounts():
+    first, second = HostTable(PORTS), HostTable(PORTS)
+    for ip in ('10.0.0.1', '10.0.0.2'):
+        first.add(ip)
+    for ip in ('10.0.0.2', '10.0.0.3', '192.168.0.1'):
+        second.add(ip)
+    first.set_ports('10.0.0.1', [80])
+    second.set_ports('10.0.0.3', [443, 8080])
+    first.update(second)
+    assert len(first) == 4
+    assert list(first) == ['10.0.0.1', '10.0.0.2', '10.0.0.3', '192.168.0.1']
+    assert first.get_ports('10.0.0.1') == [80]
+    assert first.get_ports('10.0.0.3') == [443, 8080]
+    assert len(second) == 3  # the merged-in table is left alone
+
+
+def test_large_sweep_stays_compact_and_pickles():
+    table = HostTable(PORTS)
+    for address in ipaddress.IPv4Network('10.1.0.0/16'):
+        table.add(str(address))
+    assert len(table) == 65536
+    assert table.nbytes() == 65536 // 8
+    clone = pickle.loads(pickle.dumps(table))
+    assert len(clone) == 65536 and '10.1.255.255' in clone
+    assert len(table.copy()) == 65536
+
+
+def test_device_record_reads_like_a_dict():
+    record = DeviceRecord('10.0.0.7', mac='aa:bb:cc:dd:ee:ff')
+    assert dict(record) == {'ip': '10.0.0.7', 'type': 'Unknown', 'manufacturer': 'Unknown', 'model': 'Unknown',
+                            'confidence': 0, 'mac': 'aa:bb:cc:dd:ee:ff', 'services': []}
+    record.update({'type': 'IP Camera', 'confidence': 80})
+    record['oui_vendor'] = 'Axis'
+    assert record['type'] == 'IP Camera' and 'oui_vendor' in record
+    assert record.get('missing', 'default') == 'default'
+    with pytest.raises(KeyError):
+        record['missing'] = 1
+    restored = DeviceRecord.from_dict(dict(dict(record), extra='dropped'))
+    assert dict(restored) == dict(record)
+    assert dict(pickle.loads(pickle.dumps(record))) == dict(record)
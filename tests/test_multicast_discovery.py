@@ -0,0 +1,78 @@
+import asyncio
+import struct
+
+import pytest
+
+import discovery_responder
+import multicast_discovery
+from multicast_discovery import DNS_PTR, parse_mdns_reply, parse_ssdp_reply, parse_wsd_reply
+
+
+def test_wsd_reply_from_responder():
+    reply = discovery_responder.WSD_PROBE_MATCHES.format(name='HIKVISION', model='DS-2CD2143G0-I',
+                                                         ip='192.0.2.10').encode()
+    info = parse_wsd_reply(reply)
+    assert info['device_type'] == 'IP Camera'
+    assert info['manufacturer'] == 'HIKVISION'
+    assert info['model'] == 'DS-2CD2143G0-I'
+    assert info['xaddrs'] == ['http://192.0.2.10/onvif/device_service']
+
+
+def test_wsd_ignores_other_messages():
+    assert parse_wsd_reply(multicast_discovery.build_wsd_probe()) is None
+
+
+def test_ssdp_reply_from_responder():
+    info = parse_ssdp_reply(discovery_responder.SSDP_RESPONSE.format(name='Cam', ip='192.0.2.10').encode())
+    assert info['device_type'] == 'Media Renderer'
+    assert info['location'] == 'http://192.0.2.10:80/description.xml'
+    assert info['server_header'] == 'Linux/3.10 UPnP/1.0 Cam/1.0'
+
+
+def test_ssdp_ignores_requests():
+    assert parse_ssdp_reply(multicast_discovery.build_ssdp_msearch()) is None
+
+
+@pytest.mark.parametrize('name, manufacturer', [('AXIS', 'Axis'), ('HIKVISION', 'Unknown')])
+def test_mdns_answer_from_responder(name, manufacturer):
+    query = multicast_discovery.build_mdns_query()
+    answer = discovery_responder.mdns_answer(query, '192.0.2.10', f'{name} M3045', 'M3045')
+    info = parse_mdns_reply(answer)
+    assert info['device_type'] == 'IP Camera'
+    assert info['manufacturer'] == manufacturer
+    assert info['model'] == 'M3045'
+    assert len(info['instances']) == 1
+
+
+def test_mdns_compressed_names():
+    # Answer name is a pointer to the question name at offset 12
+    question = b'\x04_ndi\x04_tcp\x05local\x00' + struct.pack('!HH', DNS_PTR, 1)
+    target = b'\x03cam\xc0\x0c'
+    answer = b'\xc0\x0c' + struct.pack('!HHIH', DNS_PTR, 1, 120, len(target)) + target
+    info = parse_mdns_reply(struct.pack('!6H', 0, 0x8400, 1, 1, 0, 0) + question + answer)
+    assert info['device_type'] == 'NDI Source'
+    assert info['instances'] == ['cam._ndi._tcp.local']
+
+
+def test_mdns_malformed():
+    header = struct.pack('!6H', 0, 0x8400, 0, 1, 0, 0)
+    assert parse_mdns_reply(header + b'\x05abc') is None           # truncated name
+    assert parse_mdns_reply(header + b'\xc0\x0c') is None          # pointer loop
+    assert parse_mdns_reply(b'\x00\x01') is None
+
+
+def test_discover_against_responder():
+    sockets = discovery_responder.start(wsd_port=0, ssdp_port=0, mdns_port=0)
+    try:
+        targets = {name: sock.getsockname() for name, sock in zip(('wsd', 'ssdp', 'mdns'), sockets)}
+        replies = []
+        asyncio.run(multicast_discovery.discover(lambda ip, info: replies.append((ip, info)),
+                                                 window=0.5, targets=targets))
+    finally:
+        for sock in sockets:
+            sock.close()
+    services = {info['service']: info for _, info in replies}
+    assert set(services) == {'ONVIF (WS-Discovery)', 'UPnP (SSDP)', 'mDNS'}
+    assert {ip for ip, _ in replies} == {'127.0.0.1'}
+    assert services['ONVIF (WS-Discovery)']['model'] == 'DS-2CD2143G0-I'
+    assert services['mDNS']['model'] == 'DS-2CD2143G0-I'
@@ -0,0 +1,35 @@
+import network_scanner
+from network_scanner import OUI_CONFIDENCE, OUI_PATH, OuiIndex
+
+
+def test_bundled_index():
+    index = OuiIndex.load(OUI_PATH)
+    assert len(index) > 0
+    assert index.lookup('18:68:CB:01:02:03') == ('HikVision', 'IP Camera')
+    assert index.lookup('18-68-cb-01-02-03') == ('HikVision', 'IP Camera')
+    assert index.lookup('00:00:00:00:00:01') is None
+    assert index.lookup('1a:68:cb:01:02:03') is None  # locally administered
+    assert index.lookup('') is None and index.lookup(None) is None
+
+
+def test_ieee_registry_lines(tmp_path):
+    path = tmp_path / 'oui.txt'
+    path.write_text('OUI/MA-L                                                    Organization\n'
+                    '00-1B-C5   (hex)\t\tAcme Cameras Ltd\n'
+                    '001BC5     (base 16)\t\tAcme Cameras Ltd\n'
+                    'A4-14-37   (hex)\t\tBolt Systems\n')
+    index = OuiIndex.load(path)
+    assert len(index) == 2
+    assert index.lookup('00:1b:c5:00:00:01') == ('Acme Cameras Ltd', '')
+    assert index.lookup('a4:14:37:ff:ff:ff') == ('Bolt Systems', '')
+
+
+def test_type_hint_needs_agreeing_ports():
+    scanner = network_scanner.NetworkStreamScanner()
+    scanner.mac_addresses['10.0.0.5'] = '18:68:cb:01:02:03'
+    camera = scanner._merge_identification('10.0.0.5', [80, 554], {})
+    assert (camera['manufacturer'], camera['type']) == ('HikVision', 'IP Camera')
+    assert camera['confidence'] >= OUI_CONFIDENCE
+    unrelated = scanner._merge_identification('10.0.0.5', [1234], {})
+    assert unrelated['manufacturer'] == 'HikVision'
+    assert unrelated['confidence'] < OUI_CONFIDENCE
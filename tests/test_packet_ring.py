@@ -0,0 +1,118 @@
+import socket
+import struct
+
+import pytest
+
+import network_scanner
+import packet_ring
+from harness import frame
+from network_scanner import CAPTURE_FILTER_MAX_HOSTS, CAPTURE_TCP_PORTS, CAPTURE_UDP_PORT_RANGES
+
+
+def run_filter(program, packet):
+    """Interpret the classic BPF subset compile_filter emits; the snap length it returns"""
+    instructions = [struct.unpack_from('=HBBI', program, offset) for offset in range(0, len(program), 8)]
+    a = x = pc = 0
+    while True:
+        code, jt, jf, k = instructions[pc]
+        pc += 1
+        if code == packet_ring.BPF_LD_H_ABS:
+            a = struct.unpack_from('!H', packet, k)[0]
+        elif code == packet_ring.BPF_LD_W_ABS:
+            a = struct.unpack_from('!I', packet, k)[0]
+        elif code == packet_ring.BPF_LD_B_ABS:
+            a = packet[k]
+        elif code == packet_ring.BPF_LD_H_IND:
+            a = struct.unpack_from('!H', packet, x + k)[0]
+        elif code == packet_ring.BPF_LDX_B_MSH:
+            x = (packet[k] & 0x0f) * 4
+        elif code == packet_ring.BPF_JA:
+            pc += k
+        elif code == packet_ring.BPF_RET_K:
+            return k
+        else:
+            taken = {packet_ring.BPF_JEQ_K: a == k, packet_ring.BPF_JGT_K: a > k,
+                     packet_ring.BPF_JGE_K: a >= k, packet_ring.BPF_JSET_K: bool(a & k)}[code]
+            pc += jt if taken else jf
+
+
+def hosts(count):
+    return [f'10.1.{index // 250}.{index % 250 + 1}' for index in range(count)]
+
+
+def compile_for(count):
+    return packet_ring.compile_filter(CAPTURE_TCP_PORTS, CAPTURE_UDP_PORT_RANGES, hosts(count))
+
+
+@pytest.mark.parametrize('count', [0, 1, 50, 60, CAPTURE_FILTER_MAX_HOSTS, 300])
+def test_filter_matches_spec(count):
+    program = compile_for(count)
+    assert len(program) // 8 <= packet_ring.BPF_MAXINSNS
+    accepted = [
+        frame('192.0.2.1', '192.0.2.2', 6, 40000, 554, b''),
+        frame('192.0.2.1', '192.0.2.2', 17, 40000, 5005, b''),
+        frame('192.0.2.1', '192.0.2.2', 17, 6985, 40000, b''),
+    ] + [frame(host, '192.0.2.2', 17, 1, 2, b'') for host in hosts(count)[::7]] \
+      + [frame('192.0.2.1', host, 17, 1, 2, b'') for host in hosts(count)[-1:]]
+    dropped = [
+        frame('192.0.2.1', '192.0.2.2', 6, 40000, 555, b''),
+        frame('192.0.2.1', '192.0.2.2', 17, 7000, 5003, b''),
+        frame(hosts(count + 1)[-1], '192.0.2.2', 17, 1, 2, b''),
+        frame(hosts(1)[0], '192.0.2.2', 6, 1, 2, b''),         # hosts only widen UDP
+    ]
+    assert all(run_filter(program, packet) for packet in accepted)
+    assert not any(run_filter(program, packet) for packet in dropped)
+
+
+def tagged(data, vlan=42):
+    return data[:12] + struct.pack('!HH', packet_ring.ETH_P_8021Q, vlan) + data[12:]
+
+
+def test_filter_follows_vlan_tags():
+    program = compile_for(CAPTURE_FILTER_MAX_HOSTS)
+    assert run_filter(program, tagged(frame('192.0.2.1', '192.0.2.2', 17, 40000, 5004, b'')))
+    assert run_filter(program, tagged(frame('192.0.2.1', '192.0.2.2', 6, 554, 40000, b'')))
+    assert run_filter(program, tagged(frame(hosts(1)[0], '192.0.2.2', 17, 1, 2, b'')))
+    assert not run_filter(program, tagged(frame('192.0.2.1', '192.0.2.2', 17, 1, 2, b'')))
+    arp = tagged(b'\x00' * 12 + b'\x08\x06' + bytes(28))
+    assert not run_filter(program, arp)
+
+
+def test_frame_headers_on_tagged_frames():
+    data = tagged(frame('192.0.2.1', '192.0.2.2', 17, 40000, 5004, b'rtp'))
+    protocol, src, dst, src_port, dst_port, start, end = packet_ring.frame_headers(data, 0, len(data))
+    assert (protocol, src_port, dst_port, data[start:end]) == (17, 40000, 5004, b'rtp')
+    # A tagged frame cut short at the end of a buffer is rejected, not read past
+    for caplen in range(34, 38):
+        assert packet_ring.frame_headers(data[:caplen], 0, caplen) is None
+
+
+def test_far_jumps_use_ja():
+    near = compile_for(10)
+    far = compile_for(300)
+    codes = lambda program: {struct.unpack_from('=H', program, offset)[0] for offset in range(0, len(program), 8)}
+    assert packet_ring.BPF_JA not in codes(near)
+    assert packet_ring.BPF_JA in codes(far)
+
+
+def test_oversized_filter_raises():
+    with pytest.raises(ValueError):
+        compile_for(2000)
+
+
+def test_capture_ring_falls_back_to_ports(monkeypatch):
+    monkeypatch.setattr(network_scanner, 'CAPTURE_FILTER_MAX_HOSTS', 2000)
+    scanner = network_scanner.NetworkStreamScanner()
+    scanner.device_info = {host: {} for host in hosts(2000)}
+    ring, filtered = scanner.capture_ring('lo')
+    assert filtered == []
+    assert ring.program == packet_ring.compile_filter(CAPTURE_TCP_PORTS, CAPTURE_UDP_PORT_RANGES)
+
+
+def test_kernel_accepts_filter():
+    try:
+        sock = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, 0)
+    except (AttributeError, PermissionError, OSError):
+        pytest.skip('AF_PACKET sockets unavailable')
+    with sock:
+        packet_ring.attach_filter(sock, compile_for(CAPTURE_FILTER_MAX_HOSTS))
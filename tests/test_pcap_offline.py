@@ -0,0 +1,85 @@
+import struct
+
+import pytest
+
+import pcap_offline
+from harness import frame, write_pcap, write_pcapng
+
+RECORDS = [(1700000000 + index * 0.02, frame('10.0.0.2', '10.0.0.9', 17, 5004, 40000, bytes(172)))
+           for index in range(5)]
+RECORDS += [(1700000000.005 + index * 0.03, frame('10.0.0.3', '10.0.0.9', 6, 554, 41000, bytes(100)))
+            for index in range(4)]
+RECORDS.sort()
+
+
+def records(path):
+    with open(path, 'rb') as f:
+        buf = f.read()
+    return buf, list(pcap_offline.iter_records(buf))
+
+
+@pytest.mark.parametrize('writer', [write_pcap, write_pcapng])
+def test_iter_records(tmp_path, writer):
+    path = tmp_path / 'capture'
+    writer(path, RECORDS)
+    buf, found = records(path)
+    assert len(found) == len(RECORDS)
+    for (offset, caplen, wirelen, timestamp, linktype), (expected_time, data) in zip(found, RECORDS):
+        assert buf[offset:offset + caplen] == data
+        assert caplen == wirelen == len(data)
+        assert timestamp == pytest.approx(expected_time, abs=1e-6)
+        assert linktype == pcap_offline.LINKTYPE_ETHERNET
+
+
+def test_big_endian_nanosecond_pcap(tmp_path):
+    data = frame('10.0.0.2', '10.0.0.9', 17, 1, 2, b'')
+    path = tmp_path / 'be.pcap'
+    path.write_bytes(struct.pack('>IHHiIII', 0xa1b23c4d, 2, 4, 0, 0, 65535, 101)
+                     + struct.pack('>IIII', 12, 345678901, len(data), 1500) + data)
+    _, found = records(path)
+    assert found == [(40, len(data), 1500, pytest.approx(12.345678901), pcap_offline.LINKTYPE_RAW)]
+
+
+@pytest.mark.parametrize('writer', [write_pcap, write_pcapng])
+def test_truncated_capture_stops_at_last_whole_record(tmp_path, writer):
+    path = tmp_path / 'capture'
+    writer(path, RECORDS)
+    path.write_bytes(path.read_bytes()[:-10])
+    _, found = records(path)
+    assert len(found) == len(RECORDS) - 1
+
+
+def test_unknown_format_raises():
+    with pytest.raises(ValueError):
+        list(pcap_offline.iter_records(b'GIF89a' + bytes(30)))
+
+
+def test_analyze_flows(tmp_path):
+    pytest.importorskip('numpy')
+    path = tmp_path / 'capture.pcap'
+    write_pcap(path, RECORDS)
+    frames = []
+    result = pcap_offline.analyze(path, on_frame=lambda buf, offset, caplen, wirelen, timestamp:
+                                  frames.append(bytes(buf[offset:offset + caplen])))
+    assert result['format'] == 'pcap'
+    assert result['packets'] == result['ethernet_frames'] == len(RECORDS)
+    assert frames == [data for _, data in RECORDS]
+    rtp, rtsp = result['flows']
+    assert (rtp['transport'], rtp['src_ip'], rtp['src_port'], rtp['packets']) == ('UDP', '10.0.0.2', 5004, 5)
+    assert rtp['duration'] == pytest.approx(0.08)
+    assert rtp['interarrival_mean'] == pytest.approx(0.02)
+    assert rtp['interarrival_std'] == pytest.approx(0.0, abs=1e-6)
+    assert (rtsp['transport'], rtsp['dst_port'], rtsp['packets']) == ('TCP', 41000, 4)
+    assert rtsp['interarrival_max'] == pytest.approx(0.03)
+
+
+@pytest.mark.parametrize('batch_size', [1, 2, 3, 7])
+def test_batches_match_single_pass(tmp_path, batch_size):
+    pytest.importorskip('numpy')
+    path = tmp_path / 'capture.pcapng'
+    write_pcapng(path, RECORDS)
+    whole = pcap_offline.analyze(path)['flows']
+    batched = pcap_offline.analyze(path, batch_size=batch_size)['flows']
+    assert len(batched) == len(whole)
+    for flow, expected in zip(batched, whole):
+        assert flow == pytest.approx(expected)
@@ -0,0 +1,91 @@
+import io
+import json
+
+import pytest
+
+import network_scanner
+import report_writer
+from report_writer import Fields
+
+
+def sections():
+    return [
+        ('timestamp', '2026-01-01 00:00:00'),
+        ('hosts', iter(['10.0.0.1', '10.0.0.2'])),
+        ('empty', iter([])),
+        ('devices', Fields((ip, {'type': 'IP Camera', 'ports': [554]}) for ip in ('10.0.0.1', '10.0.0.2'))),
+        ('nested', Fields([('inner', Fields([('list', iter([1, Fields([('x', 'ü')])]))]))])),
+        ('summary', {'count': 2, 'ratio': 0.5, 'none': None, 7: 'int key'}),
+    ]
+
+
+EXPECTED = {
+    'timestamp': '2026-01-01 00:00:00',
+    'hosts': ['10.0.0.1', '10.0.0.2'],
+    'empty': [],
+    'devices': {'10.0.0.1': {'type': 'IP Camera', 'ports': [554]}, '10.0.0.2': {'type': 'IP Camera', 'ports': [554]}},
+    'nested': {'inner': {'list': [1, {'x': 'ü'}]}},
+    'summary': {'count': 2, 'ratio': 0.5, 'none': None, '7': 'int key'},
+}
+
+
+@pytest.fixture(params=['orjson', 'json'])
+def encoder(request, monkeypatch):
+    if request.param == 'orjson':
+        pytest.importorskip('orjson')
+        monkeypatch.setattr(report_writer, '_orjson', None)
+    else:
+        monkeypatch.setattr(report_writer, '_orjson', False)
+    return request.param
+
+
+def test_json_document(encoder):
+    out = io.BytesIO()
+    report_writer.write_json(out, sections())
+    assert json.loads(out.getvalue()) == EXPECTED
+
+
+def test_ndjson_parses_line_by_line(encoder):
+    out = io.BytesIO()
+    report_writer.write_ndjson(out, sections())
+    lines = [json.loads(line) for line in out.getvalue().decode().splitlines()]
+    assert all(set(line) == {'section', 'data'} for line in lines)
+    by_section = {}
+    for line in lines:
+        by_section.setdefault(line['section'], []).append(line['data'])
+    assert by_section['hosts'] == ['10.0.0.1', '10.0.0.2']
+    assert 'empty' not in by_section
+    assert by_section['devices'] == [{'key': ip, 'value': {'type': 'IP Camera', 'ports': [554]}}
+                                     for ip in ('10.0.0.1', '10.0.0.2')]
+    assert by_section['nested'] == [{'key': 'inner', 'value': {'list': [1, {'x': 'ü'}]}}]
+    assert by_section['summary'] == [EXPECTED['summary']]
+
+
+def test_materialise_matches_json():
+    assert json.loads(json.dumps(report_writer.materialise(Fields(sections())))) == EXPECTED
+
+
+def test_scanner_report_formats(tmp_path):
+    scanner = network_scanner.NetworkStreamScanner()
+    scanner.active_hosts.add('10.0.0.2')
+    scanner.active_hosts.set_ports('10.0.0.2', [554])
+    scanner.mac_addresses['10.0.0.2'] = 'aa:bb:cc:dd:ee:ff'
+    device_info = scanner._merge_identification('10.0.0.2', [554], {})
+    scanner.streaming_hosts['10.0.0.2'] = scanner.streaming_host('10.0.0.2', [554], device_info)
+
+    expected = scanner.generate_report()
+    scanner.write_report(str(tmp_path / 'report.json'))
+    with open(tmp_path / 'report.json', encoding='utf-8') as f:
+        report = json.load(f)
+    for key in ('scan_timestamp', 'performance'):
+        report.pop(key), expected.pop(key)
+    assert report == json.loads(json.dumps(expected, default=str))
+    assert report['active_hosts'] == ['10.0.0.2']
+    assert report['streaming_hosts'][0]['open_ports'] == [554]
+
+    scanner.write_report(str(tmp_path / 'report.ndjson'))
+    with open(tmp_path / 'report.ndjson', encoding='utf-8') as f:
+        lines = [json.loads(line) for line in f]
+    hosts = [line['data'] for line in lines if line['section'] == 'streaming_hosts']
+    assert [host['host'] for host in hosts] == ['10.0.0.2']
+    assert {line['section'] for line in lines} >= {'scan_timestamp', 'active_hosts', 'device_info', 'traffic_summary'}
@@ -0,0 +1,135 @@
+import pytest
+
+import rtp_streams
+from harness import rtp
+from rtp_streams import RtpTracker
+
+SOURCE, DESTINATION, SSRC = 0x0a000002, 0x0a000009, 0x1234abcd
+
+
+def feed(tracker, packets, port=5004):
+    """Observe (sequence, timestamp, arrival, payload type) packets; the observe() results"""
+    results = []
+    for sequence, timestamp, arrival, payload_type in packets:
+        packet = rtp(sequence, timestamp, SSRC, payload_type=payload_type)
+        results.append(tracker.observe(packet, 0, len(packet), SOURCE, DESTINATION, 40000, port, arrival))
+    return results
+
+
+def steady(sequences, payload_type=0, start=0.0):
+    """20 ms PCMU packets, timed by their sequence number"""
+    return [(sequence, sequence * 160, start + sequence * 0.02, payload_type) for sequence in sequences]
+
+
+def only_stream(tracker):
+    (summary,), = tracker.summaries().values()
+    return summary
+
+
+def test_clean_stream():
+    tracker = RtpTracker()
+    assert feed(tracker, steady(range(100))) == [False] + [True] * 99
+    summary = only_stream(tracker)
+    assert (summary['packets'], summary['packets_expected'], summary['packets_lost']) == (100, 100, 0)
+    assert summary['bytes'] == 100 * 172
+    assert summary['duration'] == pytest.approx(1.98)
+    assert summary['jitter_ms'] == 0.0
+    assert summary['codec'] == 'PCMU'
+
+
+def test_dropped_packets_count_as_lost():
+    tracker = RtpTracker()
+    feed(tracker, steady([sequence for sequence in range(100) if sequence % 10 != 5]))
+    summary = only_stream(tracker)
+    assert (summary['packets'], summary['packets_expected'], summary['packets_lost']) == (90, 100, 10)
+    assert summary['loss_ratio'] == 0.1
+
+
+def test_sequence_wrap():
+    tracker = RtpTracker()
+    feed(tracker, steady([sequence & 0xffff for sequence in range(65500, 65600) if sequence != 65540]))
+    summary = only_stream(tracker)
+    assert (summary['packets_expected'], summary['packets_lost']) == (100, 1)
+
+
+def test_duplicates_and_reordering():
+    tracker = RtpTracker()
+    packets = steady(range(20))
+    packets[10], packets[11] = packets[11], packets[10]
+    feed(tracker, packets + steady([19]))
+    summary = only_stream(tracker)
+    assert (summary['packets'], summary['packets_expected'], summary['packets_lost']) == (21, 20, 0)
+
+
+def test_probation_hides_stray_datagrams():
+    confirmed = []
+    tracker = RtpTracker(on_confirmed=confirmed.append)
+    assert feed(tracker, [(100, 0, 0.0, 0), (5000, 0, 0.1, 0), (9, 0, 0.2, 0)]) == [False] * 3
+    assert tracker.summaries() == {} and confirmed == []
+    assert feed(tracker, [(10, 160, 0.22, 0)]) == [True]
+    assert len(confirmed) == 1
+    assert only_stream(tracker)['packets_expected'] == 2
+
+
+def test_restart_resets_accounting():
+    tracker = RtpTracker()
+    feed(tracker, steady(range(50)))
+    feed(tracker, steady(range(30000, 30010), start=10.0 - 30000 * 0.02))
+    summary = only_stream(tracker)
+    # The first packet after the jump is held back until the second confirms the restart
+    assert (summary['packets'], summary['packets_expected'], summary['packets_lost']) == (9, 9, 0)
+    assert summary['bytes'] == 9 * 172
+    assert summary['duration'] == pytest.approx(0.16)
+
+
+def test_stray_packet_does_not_resync():
+    tracker = RtpTracker()
+    packets = steady(range(100))
+    packets.insert(50, (40000, 0, packets[49][2] + 0.001, 0))
+    assert feed(tracker, packets)[50]
+    summary = only_stream(tracker)
+    assert (summary['packets'], summary['packets_expected'], summary['packets_lost']) == (100, 100, 0)
+    assert summary['bytes'] == 100 * 172
+    assert summary['duration'] == pytest.approx(1.98)
+    assert summary['jitter_ms'] == 0.0
+
+
+def test_stream_starting_at_the_wrap():
+    tracker = RtpTracker()
+    feed(tracker, steady([sequence & 0xffff for sequence in range(65535, 65635) if sequence != 65600]))
+    summary = only_stream(tracker)
+    assert (summary['packets'], summary['packets_expected'], summary['packets_lost']) == (99, 100, 1)
+    assert summary['loss_ratio'] == 0.01
+
+
+def test_interleaved_dtmf_keeps_the_stream():
+    tracker = RtpTracker()
+    packets = steady(range(200))
+    for index in range(60, 90, 3):
+        sequence, _, arrival, _ = packets[index]
+        packets[index] = (sequence, 60 * 160, arrival, 101)  # RFC 4733 events repeat their timestamp
+    feed(tracker, packets)
+    summary = only_stream(tracker)
+    assert (summary['packets'], summary['packets_lost']) == (200, 0)
+    assert summary['codec'] == 'PCMU'
+    assert summary['jitter_ms'] == 0.0
+
+
+def test_codec_change():
+    tracker = RtpTracker()
+    feed(tracker, steady(range(100)) + steady(range(100, 100 + rtp_streams.RTP_PAYLOAD_SWITCH), payload_type=8))
+    summary = only_stream(tracker)
+    assert summary['codec'] == 'PCMA'
+    assert summary['packets'] == 100 + rtp_streams.RTP_PAYLOAD_SWITCH
+
+
+@pytest.mark.parametrize('packet, port', [
+    (rtp(1, 0, SSRC), 53),                            # DNS port
+    (b'\x40' + rtp(1, 0, SSRC)[1:], 5004),           # version 1
+    (rtp(1, 0, SSRC, payload_type=72), 5004),        # RTCP sender report
+    (rtp(1, 0, SSRC)[:11], 5004),                    # shorter than the header
+])
+def test_non_rtp_rejected(packet, port):
+    tracker = RtpTracker()
+    assert not tracker.observe(packet, 0, len(packet), SOURCE, DESTINATION, 40000, port, 0.0)
+    assert tracker.rejected == 1 and len(tracker) == 0
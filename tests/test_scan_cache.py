@@ -0,0 +1,75 @@
+import sqlite3
+
+import pytest
+
+from scan_cache import ScanCache
+
+NOW = 1_700_000_000.0
+LAN = '192.168.1.0/24%eth0'
+VLAN = '192.168.1.0/24%eth0.20'
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ScanCache(str(tmp_path / 'cache.db'), ports_ttl=60, identity_ttl=600)
+    yield cache
+    cache.close()
+
+
+def test_ports_expire_after_ttl(cache):
+    cache.store_ports(LAN, {'192.168.1.10': [80, 554]}, now=NOW)
+    assert cache.fresh_ports(LAN, '192.168.1.10', now=NOW + 59) == [80, 554]
+    assert cache.fresh_ports(LAN, '192.168.1.10', now=NOW + 61) is None
+    assert cache.fresh_ports(LAN, '192.168.1.11', now=NOW) is None
+
+
+def test_identity_expires_after_ttl_or_port_change(cache):
+    info = {'ip': '192.168.1.10', 'type': 'IP Camera', 'manufacturer': 'Axis'}
+    cache.store_identities(LAN, {'192.168.1.10': info}, {'192.168.1.10': [554, 80]}, now=NOW)
+    assert cache.fresh_identity(LAN, '192.168.1.10', [80, 554], now=NOW + 599) == info
+    assert cache.fresh_identity(LAN, '192.168.1.10', [80, 554], now=NOW + 601) is None
+    assert cache.fresh_identity(LAN, '192.168.1.10', [80], now=NOW) is None
+
+
+def test_same_address_in_two_networks(cache):
+    cache.store_ports(LAN, {'192.168.1.10': [554]}, now=NOW)
+    cache.store_ports(VLAN, {'192.168.1.10': [80]}, now=NOW)
+    camera = {'type': 'IP Camera'}
+    router = {'type': 'Router'}
+    cache.store_identities(LAN, {'192.168.1.10': camera}, {'192.168.1.10': [554]}, now=NOW)
+    cache.store_identities(VLAN, {'192.168.1.10': router}, {'192.168.1.10': [80]}, now=NOW)
+    assert cache.fresh_ports(LAN, '192.168.1.10', now=NOW) == [554]
+    assert cache.fresh_ports(VLAN, '192.168.1.10', now=NOW) == [80]
+    assert cache.fresh_identity(LAN, '192.168.1.10', [554], now=NOW) == camera
+    assert cache.fresh_identity(VLAN, '192.168.1.10', [80], now=NOW) == router
+
+
+def test_liveness_is_tracked_per_network(cache):
+    assert cache.update_hosts(LAN, ['192.168.1.10', '192.168.1.11'], now=NOW) == {'192.168.1.10', '192.168.1.11'}
+    assert cache.update_hosts(VLAN, ['192.168.1.10'], now=NOW) == {'192.168.1.10'}
+    assert cache.update_hosts(LAN, ['192.168.1.11'], now=NOW + 1) == {'192.168.1.10'}
+    assert cache.alive_hosts(LAN) == {'192.168.1.11'}
+    assert cache.alive_hosts(VLAN) == {'192.168.1.10'}
+
+
+def test_cache_keyed_by_address_only_is_rebuilt(tmp_path):
+    path = str(tmp_path / 'old.db')
+    db = sqlite3.connect(path)
+    db.executescript('CREATE TABLE ports (ip TEXT PRIMARY KEY, open_ports TEXT NOT NULL, scanned_at REAL NOT NULL);'
+                     "INSERT INTO ports VALUES ('192.168.1.10', '[554]', 0);")
+    db.close()
+    cache = ScanCache(path)
+    try:
+        cache.store_ports(LAN, {'192.168.1.10': [80]}, now=NOW)
+        assert cache.fresh_ports(LAN, '192.168.1.10', now=NOW) == [80]
+    finally:
+        cache.close()
+
+
+def test_scanner_keys_the_cache_by_interface():
+    import network_scanner
+
+    scanner = network_scanner.NetworkStreamScanner()
+    assert scanner.cache_network('10.0.0.0/24') == '10.0.0.0/24'
+    scanner.interface = 'eth1'
+    assert scanner.cache_network('10.0.0.0/24') == '10.0.0.0/24%eth1'
@@ -0,0 +1,81 @@
+import pickle
+import threading
+
+import pytest
+
+from scan_metrics import METRIC_BUCKETS, PHASES, Histogram, ScanMetrics, is_timeout
+
+
+def test_histogram_buckets_and_quantiles():
+    histogram = Histogram()
+    for value in [0.0005] * 50 + [0.02] * 40 + [3.0] * 9 + [120.0]:
+        histogram.observe(value)
+    assert histogram.count == 100
+    assert histogram.quantile(0.5) == 0.001
+    assert histogram.quantile(0.9) == 0.025
+    assert histogram.quantile(0.99) == 5.0
+    assert histogram.quantile(1.0) == 120.0  # the overflow bucket reports the maximum
+    summary = histogram.summary()
+    assert (summary['min_ms'], summary['max_ms']) == (0.5, 120000.0)
+    assert summary['buckets'] == {'le_1ms': 50, 'le_25ms': 40, 'le_5000ms': 9, 'le_inf': 1}
+    assert len(histogram.counts) == len(METRIC_BUCKETS) + 1
+
+
+def test_outcomes_are_counted_per_phase():
+    metrics = ScanMetrics()
+    metrics.observe('port_scan', 0.01)
+    metrics.observe('port_scan', 1.0, ok=False)
+    metrics.observe('http_identify', 0.2, ok=False, timed_out=False)
+    metrics.failed('http_identify', ConnectionResetError())
+    metrics.failed('rtsp_identify', TimeoutError())
+    metrics.observe('capture', 30.0, items=5000)
+    summary = metrics.summary()
+    phases = summary['phases']
+    assert set(phases) == set(PHASES)
+    assert (phases['port_scan']['ok'], phases['port_scan']['timeouts']) == (1, 1)
+    assert (phases['http_identify']['ok'], phases['http_identify']['timeouts'], phases['http_identify']['errors']) == (0, 0, 1)
+    assert phases['rtsp_identify']['timeouts'] == 1
+    assert phases['capture']['items'] == 5000
+    assert summary['dominant_phase'] == 'capture'
+    assert sum(phase['busy_share'] for phase in phases.values()) == pytest.approx(1.0, abs=0.01)
+
+
+def test_is_timeout():
+    class ReadTimeout(Exception):
+        pass
+
+    assert is_timeout(TimeoutError()) and is_timeout(ReadTimeout())
+    assert not is_timeout(ConnectionRefusedError())
+
+
+def test_merge_adds_shards_and_survives_pickling():
+    first, second = ScanMetrics(), ScanMetrics()
+    first.observe('discovery', 0.01)
+    second.observe('discovery', 0.3, ok=False)
+    second.observe('port_scan', 0.002)
+    first.merge(pickle.loads(pickle.dumps(second)))
+    discovery = first.summary()['phases']['discovery']
+    assert (discovery['probes'], discovery['ok'], discovery['timeouts']) == (2, 1, 1)
+    assert discovery['durations']['max_ms'] == 300.0
+    assert first.summary()['phases']['port_scan']['probes'] == 1
+
+
+def test_threads_record_without_losing_counts():
+    metrics = ScanMetrics()
+
+    def record():
+        for _ in range(1000):
+            metrics.observe('port_scan', 0.001)
+
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert metrics.summary()['phases']['port_scan']['probes'] == 8000
+
+
+def test_empty_metrics():
+    summary = ScanMetrics().summary()
+    assert summary['dominant_phase'] is None
+    assert summary['phases']['discovery']['durations']['p50_ms'] is None
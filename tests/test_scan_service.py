@@ -0,0 +1,117 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('flask')
+pytest.importorskip('flask_cors')
+
+import device_api
+from scan_metrics import ScanMetrics
+
+CAMERA = {'host': '10.0.0.2', 'mac': '', 'open_ports': [554], 'device_type': 'IP Camera',
+          'manufacturer': 'Axis', 'model': 'Unknown', 'confidence': 90, 'services': []}
+
+
+class FakeScanner:
+    """Stands in for NetworkStreamScanner: one host, one device, optionally held until cancelled"""
+
+    hold = False
+    targets = []
+
+    def __init__(self, cache_path=None):
+        self.cache = None
+        self.cancelled = threading.Event()
+        self.metrics = ScanMetrics()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def is_identified(self, entry):
+        return entry['confidence'] >= 70
+
+    def scan_networks(self, targets, on_device=None, on_host=None):
+        FakeScanner.targets.append(targets)
+        on_host(CAMERA['host'], 0.001)
+        self.metrics.observe('discovery', 0.001)
+        on_device(dict(CAMERA))
+        if self.hold:
+            self.cancelled.wait(5)
+        return [CAMERA]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(device_api, 'NetworkStreamScanner', FakeScanner)
+    monkeypatch.setattr(FakeScanner, 'hold', False)
+    monkeypatch.setattr(FakeScanner, 'targets', [])
+    service = device_api.ScanService(interval=0.05, deadline=5)
+    monkeypatch.setattr(device_api, 'scan_service', service)
+    yield device_api.app.test_client(), service
+    service.stop()
+    if service.thread:
+        service.thread.join(5)
+
+
+def wait_for(service, *states):
+    deadline = time.monotonic() + 5
+    while service.state not in states:
+        assert time.monotonic() < deadline, service.state
+        time.sleep(0.01)
+
+
+def test_one_off_pass_completes(client):
+    client, service = client
+    assert client.get('/api/scan/status').get_json()['state'] == 'idle'
+    assert client.get('/api/scan/metrics').get_json()['metrics'] is None
+
+    reply = client.post('/api/scan/start', json={'networks': ['10.0.0.0/30'], 'continuous': False}).get_json()
+    assert reply['status'] == 'success'
+    service.thread.join(5)
+
+    status = client.get('/api/scan/status').get_json()
+    assert status['state'] == 'completed' and status['passes'] == 1
+    assert status['progress']['hosts_found'] == 1
+    assert status['progress']['streaming_devices'] == status['progress']['devices_identified'] == 1
+    assert FakeScanner.targets == [['10.0.0.0/30']]
+    assert [device['ip'] for device in service.devices()] == ['10.0.0.2']
+    metrics = client.get('/api/scan/metrics').get_json()['metrics']
+    assert metrics['phases']['discovery']['probes'] == 1
+
+
+def test_stop_cancels_a_running_pass(client, monkeypatch):
+    client, service = client
+    monkeypatch.setattr(FakeScanner, 'hold', True)
+    client.post('/api/scan/start', json={'network_range': '10.0.0.0/30'})
+    wait_for(service, 'running')
+    assert client.post('/api/scan/start', json={}).get_json()['status'] == 'info'
+    assert client.post('/api/rescan').get_json()['status'] == 'info'
+
+    assert client.post('/api/scan/stop').get_json()['status'] == 'success'
+    service.thread.join(5)
+    status = client.get('/api/scan/status').get_json()
+    assert status['state'] == 'cancelled' and not status['is_scanning']
+    assert client.post('/api/scan/stop').get_json()['status'] == 'info'
+
+
+def test_continuous_scanning_waits_and_rescans(client):
+    client, service = client
+    service.interval = 60
+    client.post('/api/scan/start', json={'networks': ['10.0.0.0/30']})
+    wait_for(service, 'waiting')
+    assert client.post('/api/rescan').get_json()['message'] == 'Rescan started'
+    deadline = time.monotonic() + 5
+    while service.passes < 2:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    wait_for(service, 'waiting')
+    assert service.status()['continuous']
+
+
+def test_deadline_times_a_pass_out(client, monkeypatch):
+    client, service = client
+    monkeypatch.setattr(FakeScanner, 'hold', True)
+    service.deadline = 0.1
+    service.start(['10.0.0.0/30'], continuous=False)
+    service.thread.join(5)
+    assert service.state == 'timed_out'
@@ -0,0 +1,78 @@
+import json
+import random
+import re
+
+import pytest
+
+from network_scanner import HTTP_SIGNATURES_PATH, SignatureMatcher, trie_regex
+
+SPEC = {
+    'version': 1, 'content_score': 30, 'header_score': 40, 'threshold': 50,
+    'vendors': [
+        {'id': 'acme', 'patterns': ['acme', 'acme cam', 'ipc'], 'headers': ['server'],
+         'type': 'IP Camera', 'manufacturer': 'Acme', 'model_regex': r'ac-\d+'},
+        {'id': 'bolt', 'patterns': ['bolt', 'ipc-web', 'web'], 'headers': ['server', 'www-authenticate'],
+         'type': 'NVR', 'manufacturer': 'Bolt'},
+    ]
+}
+
+
+def bundled_spec():
+    with open(HTTP_SIGNATURES_PATH, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def baseline(spec, content, headers):
+    """The scoring the signature file describes, one vendor and pattern at a time"""
+    for vendor in spec['vendors']:
+        patterns = set(vendor['patterns'])
+        score = sum(spec['content_score'] for pattern in patterns if pattern in content)
+        for header in vendor['headers']:
+            value = (headers.get(header) or '').lower()
+            score += sum(spec['header_score'] for pattern in patterns if pattern in value)
+        if score > spec['threshold']:
+            return vendor['id'], score
+    return None
+
+
+def matched(matcher, content, headers):
+    result = matcher.match(content, headers)
+    return (result[0]['id'], result[1]) if result else None
+
+
+def test_trie_regex_prefers_the_longest_pattern():
+    regex = re.compile(trie_regex(['ip', 'ipc', 'ipc-web', 'web']))
+    assert regex.match('ipc-web').group() == 'ipc-web'
+    assert regex.match('ipx').group() == 'ip'
+    assert regex.match('xyz') is None
+
+
+def test_overlapping_patterns_all_count():
+    matcher = SignatureMatcher(SPEC)
+    assert matcher.find('the acme camera') == {'acme', 'acme cam'}
+    assert matcher.find('ipc-web') == {'ipc', 'ipc-web', 'web'}
+
+
+def test_model_and_header_scoring():
+    matcher = SignatureMatcher(SPEC)
+    vendor, score, model = matcher.match('<title>acme cam ac-1200</title>', {'server': 'Acme httpd'})
+    assert (vendor['manufacturer'], score, model) == ('Acme', 100, 'AC-1200')
+    assert matcher.match('nothing to see', {}) is None
+
+
+def test_unsupported_version_rejected():
+    with pytest.raises(ValueError):
+        SignatureMatcher(dict(SPEC, version=2))
+
+
+@pytest.mark.parametrize('spec', [SPEC, bundled_spec()], ids=['small', 'bundled'])
+def test_matches_baseline_scoring(spec):
+    matcher = SignatureMatcher(spec)
+    patterns = sorted({pattern for vendor in spec['vendors'] for pattern in vendor['patterns']})
+    noise = ['<html>', ' ', 'login', 'index', '-', 'x', '</div>', 'camera']
+    rng = random.Random(32)
+    for _ in range(500):
+        content = ''.join(rng.choice(patterns if rng.random() < 0.3 else noise) for _ in range(rng.randint(0, 12)))
+        headers = {'server': rng.choice(patterns + noise).title(),
+                   'www-authenticate': rng.choice(['', 'Basic realm="' + rng.choice(patterns) + '"'])}
+        assert matched(matcher, content, headers) == baseline(spec, content, headers), (content, headers)
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Local responder stub for multicast_discovery.py
+
+Answers ONVIF WS-Discovery probes, SSDP M-SEARCHes and mDNS PTR queries
+as a fake camera would, so discovery can be exercised without real
+devices. By default it listens on loopback unicast ports; point the
+scanner at them with
+
+    scanner.multicast_discover(targets={'wsd': ('127.0.0.1', 13702),
+                                        'ssdp': ('127.0.0.1', 11900),
+                                        'mdns': ('127.0.0.1', 15353)})
+
+With --multicast it joins the real groups on the standard ports instead.
+"""
+
+import argparse
+import os
+import socket
+import struct
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from multicast_discovery import (DNS_A, DNS_PTR, DNS_SRV, DNS_TXT, MDNS_ADDR,  # noqa: E402
+                                 SSDP_ADDR, WSD_ADDR, read_dns_name)
+
+WSD_PROBE_MATCHES = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<SOAP-ENV:Envelope xmlns:SOAP-ENV="http://www.w3.org/2003/05/soap-envelope"'
+    ' xmlns:wsa="http://schemas.xmlsoap.org/ws/2004/08/addressing"'
+    ' xmlns:d="http://schemas.xmlsoap.org/ws/2005/04/discovery"'
+    ' xmlns:dn="http://www.onvif.org/ver10/network/wsdl">'
+    '<SOAP-ENV:Header>'
+    '<wsa:Action>http://schemas.xmlsoap.org/ws/2005/04/discovery/ProbeMatches</wsa:Action>'
+    '</SOAP-ENV:Header>'
+    '<SOAP-ENV:Body><d:ProbeMatches><d:ProbeMatch>'
+    '<d:Types>dn:NetworkVideoTransmitter</d:Types>'
+    '<d:Scopes>onvif://www.onvif.org/type/video_encoder onvif://www.onvif.org/name/{name}'
+    ' onvif://www.onvif.org/hardware/{model} onvif://www.onvif.org/Profile/Streaming</d:Scopes>'
+    '<d:XAddrs>http://{ip}/onvif/device_service</d:XAddrs>'
+    '<d:MetadataVersion>1</d:MetadataVersion>'
+    '</d:ProbeMatch></d:ProbeMatches></SOAP-ENV:Body>'
+    '</SOAP-ENV:Envelope>'
+)
+
+SSDP_RESPONSE = (
+    'HTTP/1.1 200 OK\r\n'
+    'CACHE-CONTROL: max-age=1800\r\n'
+    'EXT:\r\n'
+    'LOCATION: http://{ip}:80/description.xml\r\n'
+    'SERVER: Linux/3.10 UPnP/1.0 {name}/1.0\r\n'
+    'ST: urn:schemas-upnp-org:device:MediaRenderer:1\r\n'
+    'USN: uuid:00000000-0000-0000-0000-000000000001::urn:schemas-upnp-org:device:MediaRenderer:1\r\n'
+    '\r\n'
+)
+
+
+def dns_name(name):
+    return b''.join(bytes([len(label)]) + label.encode() for label in name.split('.')) + b'\x00'
+
+
+def dns_record(name, rtype, rdata, ttl=120):
+    return dns_name(name) + struct.pack('!HHIH', rtype, 1, ttl, len(rdata)) + rdata
+
+
+def mdns_answer(query, ip, instance, model):
+    """Legacy-unicast answer: echo the ID and questions, answer PTR + SRV/TXT/A"""
+    query_id, _, questions = struct.unpack('!3H', query[:6])
+    offset, asked = 12, []
+    for _ in range(questions):
+        name, offset = read_dns_name(query, offset)
+        asked.append(name)
+        offset += 4
+    preferred = '_axis-video._tcp.local' if 'axis' in instance.lower() else '_rtsp._tcp.local'
+    service = next((s for s in (preferred, '_rtsp._tcp.local') if s in asked), None)
+    if service is None:
+        return None
+
+    full = f'{instance}.{service}'
+    host = 'camera-stub.local'
+    records = [
+        dns_record(service, DNS_PTR, dns_name(full)),
+        dns_record(full, DNS_SRV, struct.pack('!HHH', 0, 0, 554) + dns_name(host)),
+        dns_record(full, DNS_TXT, bytes([len(f'model={model}')]) + f'model={model}'.encode()),
+        dns_record(host, DNS_A, socket.inet_aton(ip)),
+    ]
+    header = struct.pack('!6H', query_id, 0x8400, 0, 1, 0, 3)
+    return header + b''.join(records)
+
+
+def serve(sock, respond):
+    while True:
+        try:
+            data, addr = sock.recvfrom(9000)
+        except OSError:
+            return
+        reply = respond(data)
+        if reply:
+            sock.sendto(reply, addr)
+
+
+def open_socket(host, port, group=None):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(('' if group else host, port))
+    if group:
+        membership = socket.inet_aton(group) + socket.inet_aton('0.0.0.0')
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+    return sock
+
+
+def start(host='127.0.0.1', wsd_port=13702, ssdp_port=11900, mdns_port=15353,
+          multicast=False, name='HIKVISION', model='DS-2CD2143G0-I', announce_ip=None):
+    """Start the three responders on daemon threads; return their sockets"""
+    announce_ip = announce_ip or host
+
+    def wsd(data):
+        if b'Probe' in data:
+            return WSD_PROBE_MATCHES.format(name=name, model=model, ip=announce_ip).encode()
+
+    def ssdp(data):
+        if data.startswith(b'M-SEARCH'):
+            return SSDP_RESPONSE.format(name=name, ip=announce_ip).encode()
+
+    def mdns(data):
+        try:
+            return mdns_answer(data, announce_ip, f'{name} {model}', model)
+        except (IndexError, ValueError, struct.error):
+            return None
+
+    if multicast:
+        endpoints = [(WSD_ADDR, wsd), (SSDP_ADDR, ssdp), (MDNS_ADDR, mdns)]
+        sockets = [open_socket(host, port, group) for (group, port), _ in endpoints]
+    else:
+        endpoints = [(wsd_port, wsd), (ssdp_port, ssdp), (mdns_port, mdns)]
+        sockets = [open_socket(host, port) for port, _ in endpoints]
+    for sock, (_, respond) in zip(sockets, endpoints):
+        threading.Thread(target=serve, args=(sock, respond), daemon=True).start()
+    return sockets
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake ONVIF/SSDP/mDNS camera for discovery tests')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--multicast', action='store_true',
+                        help='join the real multicast groups on the standard ports')
+    parser.add_argument('--name', default='HIKVISION')
+    parser.add_argument('--model', default='DS-2CD2143G0-I')
+    args = parser.parse_args()
+
+    start(args.host, multicast=args.multicast, name=args.name, model=args.model)
+    print(f"📡 Discovery responder running on {args.host} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()